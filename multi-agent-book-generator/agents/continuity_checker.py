@@ -6,6 +6,8 @@ import logging
 import re
 from typing import Dict, Any, List, Optional
 from core.agent import Agent
+from utils.fix_planning import format_fix_plan, apply_exact_replacements
+from utils.story_bible import BIBLE_DELTA_FORMAT, render_story_bible, format_open_threads
 
 logger = logging.getLogger(__name__)
 
@@ -14,17 +16,22 @@ class ContinuityCheckerAgent(Agent):
     Agent specialized in identifying and resolving continuity issues in narratives.
     """
     
+    PROMPT_VERSION = 2
+    
     def __init__(self, config: Dict[str, Any], llm_provider):
         """Initialize the Continuity Checker Agent"""
         super().__init__(name="Continuity Checker", config=config, llm_provider=llm_provider)
     
-    def quick_check(self, chapters: List[str], character_profiles: str) -> Dict[str, Any]:
+    def quick_check(self, chapters: List[str], character_profiles: str,
+                    story_context: Optional[str] = None) -> Dict[str, Any]:
         """
         Perform a quick continuity check during the writing process
         
         Args:
             chapters: List of chapters written so far
             character_profiles: Character profiles for reference
+            story_context: Story bible view up to the previous chapter, used
+                instead of samples of earlier chapters and the profiles
             
         Returns:
             Dictionary with quick continuity analysis
@@ -38,27 +45,34 @@ class ContinuityCheckerAgent(Agent):
         
         # Get the most recent chapter and a sample from previous chapters
         recent_chapter = chapters[-1]
-        previous_sample = ""
         
-        # Take samples from earlier chapters for context
-        if len(chapters) == 2:
-            previous_sample = chapters[0][:2000]  # First 2000 chars of only previous chapter
+        if story_context:
+            # The story bible covers every earlier chapter in less space than samples of their text
+            reference = f"""Established Story Facts (story bible up to the previous chapter):
+        {story_context}"""
+            profiles_reference = ""
         else:
-            # Sample from first chapter and chapter just before the most recent
-            previous_sample = chapters[0][:1000] + "\n\n...\n\n" + chapters[-2][-1000:]
+            # Take samples from earlier chapters for context
+            if len(chapters) == 2:
+                previous_sample = chapters[0][:2000]  # First 2000 chars of only previous chapter
+            else:
+                # Sample from first chapter and chapter just before the most recent
+                previous_sample = chapters[0][:1000] + "\n\n...\n\n" + chapters[-2][-1000:]
+            reference = f"""Previous Content Sample:
+        {previous_sample}"""
+            profiles_reference = f"""
+        Character Profiles (for reference):
+        {character_profiles[:1500]}... [truncated for length]
+        """
         
         check_prompt = f"""
         Perform a quick continuity check between the most recent chapter and previous content.
         
-        Previous Content Sample:
-        {previous_sample}
+        {reference}
         
         Most Recent Chapter:
         {recent_chapter[:3000]}... [truncated for length]
-        
-        Character Profiles (for reference):
-        {character_profiles[:1500]}... [truncated for length]
-        
+        {profiles_reference}
         Check for these common continuity issues:
         1. Character inconsistencies (traits, knowledge, abilities)
         2. Timeline errors (sequence of events, time passing)
@@ -75,6 +89,74 @@ class ContinuityCheckerAgent(Agent):
         response = self.generate(check_prompt, temperature=0.3)
         return self.parse_json_response(response, default={"issues": [], "suggestions": []})
     
+    def sketch_characters(self, character_profiles: str) -> Dict[str, str]:
+        """
+        Condense the character profiles into one-sentence sketches for the story bible
+        
+        Args:
+            character_profiles: Character profiles
+        
+        Returns:
+            Dictionary mapping character names to sketches
+        """
+        sketch_prompt = f"""
+        Condense these character profiles into a story bible entry for each character.
+        
+        Character Profiles:
+        {character_profiles}
+        
+        For each character, write one sentence of at most 40 words covering their role,
+        defining appearance, personality and way of speaking.
+        
+        Format your response as JSON with this key:
+        - "characters": object mapping each character's name to their sentence
+        """
+        
+        response = self.generate(sketch_prompt, temperature=0.3)
+        parsed = self.parse_json_response(response, default={})
+        sketches = parsed.get("characters") if isinstance(parsed, dict) else None
+        return sketches if isinstance(sketches, dict) else {}
+    
+    def update_story_bible(self, bible: Dict[str, Any], chapter: str, chapter_num: int) -> Dict[str, Any]:
+        """
+        Report what a chapter changes in the story bible
+        
+        Only the changes are requested, so the response stays small however
+        large the bible grows.
+        
+        Args:
+            bible: The story bible up to the previous chapter
+            chapter: The chapter content
+            chapter_num: The chapter number
+        
+        Returns:
+            The changes, to be folded in with apply_bible_delta
+        """
+        logger.info(f"Updating the story bible with chapter {chapter_num}")
+        
+        open_threads = "\n".join(f"- {thread}" for thread in format_open_threads(bible)) or "(none)"
+        delta_prompt = f"""
+        Update the story bible of a book with what happens in Chapter {chapter_num}.
+        
+        Story Bible (up to the previous chapter):
+        {render_story_bible(bible, focus=chapter, max_threads=0) or "(empty)"}
+        
+        Open Plot Threads:
+        {open_threads}
+        
+        Chapter {chapter_num}:
+        {chapter}
+        
+        Report only what this chapter establishes or changes. Use the names already in the
+        story bible for characters who appear in it.
+        
+        {BIBLE_DELTA_FORMAT}
+        """
+        
+        response = self.generate(delta_prompt, temperature=0.2, max_tokens=1000)
+        delta = self.parse_json_response(response, default={})
+        return delta if isinstance(delta, dict) else {}
+    
     def check_story_continuity(self, chapters: List[str], character_profiles: str, 
                               structured_outline: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -238,6 +320,11 @@ class ContinuityCheckerAgent(Agent):
             for i, issue in enumerate(issues)
         ])
         
+        revised = self.revise_with_edits(chapter, "Fix the following continuity issues in this chapter.",
+                                         issues_text, temperature=0.5)
+        if revised is not None:
+            return revised
+        
         fix_prompt = f"""
         Revise the following chapter to fix the specified continuity issues.
         
@@ -254,6 +341,59 @@ class ContinuityCheckerAgent(Agent):
         
         return self.generate(fix_prompt, temperature=0.5)
     
+    def apply_fix_plan(self, chapter: str, plan: List[Dict[str, Any]]) -> str:
+        """
+        Apply the merged fixes of all refinement reviews in a single revision
+        
+        Fixes with an exact replacement for text found in the chapter are applied
+        directly; everything else goes into one rewrite of the chapter.
+        
+        Args:
+            chapter: Chapter content
+            plan: Planned fixes from utils.fix_planning.plan_chapter_fixes
+        
+        Returns:
+            Revised chapter content
+        """
+        chapter, remaining = apply_exact_replacements(chapter, plan)
+        if not remaining:
+            return chapter
+        
+        revised = self.revise_with_edits(
+            chapter,
+            "Fix all of the issues listed below in this chapter. Fix continuity issues first; "
+            "issues without a quoted passage apply to the chapter as a whole.",
+            format_fix_plan(remaining), temperature=0.5)
+        if revised is not None:
+            return revised
+        
+        fix_prompt = f"""
+        Revise the following chapter to fix all of the issues listed below in a single pass.
+        
+        Chapter content:
+        {chapter}
+        
+        Issues to fix, in the order they appear in the chapter:
+        {format_fix_plan(remaining)}
+        
+        Instructions:
+        1. Fix continuity issues first; where fixes overlap, keep the facts consistent
+        2. Apply the dialogue, pacing and style fixes to the passages quoted
+        3. Issues without a quoted passage apply to the chapter as a whole
+        4. Keep transitions smooth and the same overall length, events and content
+        
+        Provide the complete revised chapter.
+        Do not add comments or explanations - just provide the revised chapter text.
+        """
+        
+        revised = self.generate(fix_prompt, temperature=0.5)
+        
+        # A truncated or empty revision would lose most of the chapter
+        if not self.check_response_quality(revised, min_length=len(chapter) // 2):
+            logger.warning("Combined revision was too short; keeping the chapter with direct replacements only")
+            return chapter
+        return revised
+    
     def check_character_consistency(self, character_name: str, chapters: List[str], 
                                    character_profile: str) -> Dict[str, Any]:
         """
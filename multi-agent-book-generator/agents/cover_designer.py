@@ -7,6 +7,7 @@ import logging
 import requests
 from typing import Dict, Any, Optional
 from core.agent import Agent
+from core.deadline import call_timeout
 
 logger = logging.getLogger(__name__)
 
@@ -120,6 +121,9 @@ class CoverDesignerAgent(Agent):
         
         # Call Stability AI API
         try:
+            # Never wait past the run deadline for the image
+            timeout = call_timeout(self.settings.get("image_timeout", 120))
+            
             response = requests.post(
                 "https://api.stability.ai/v2beta/stable-image/generate/core",
                 headers={
@@ -132,7 +136,8 @@ class CoverDesignerAgent(Agent):
                     "model": (None, model),
                     "output_format": (None, "png"),
                     "seed": (None, "0"),  # Use random seed
-                }
+                },
+                timeout=timeout
             )
             
             if response.status_code == 200:
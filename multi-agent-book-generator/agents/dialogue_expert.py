@@ -6,6 +6,7 @@ import logging
 import re
 from typing import Dict, Any, List, Tuple, Optional
 from core.agent import Agent
+from core.usage_tracker import usage_context
 from utils.text_processing import extract_dialogue
 
 logger = logging.getLogger(__name__)
@@ -15,6 +16,8 @@ class DialogueExpertAgent(Agent):
     Agent specialized in improving dialogue quality and character voices.
     """
     
+    PROMPT_VERSION = 2
+    
     def __init__(self, config: Dict[str, Any], llm_provider):
         """Initialize the Dialogue Expert Agent"""
         super().__init__(name="Dialogue Expert", config=config, llm_provider=llm_provider)
@@ -99,7 +102,8 @@ class DialogueExpertAgent(Agent):
             - "quality_score": Overall dialogue quality score (1-10)
             """
             
-            response = self.generate(analysis_prompt, temperature=0.4)
+            with usage_context(chapter=chapter_num):
+                response = self.generate(analysis_prompt, temperature=0.4)
             
             # Parse and store results
             analysis = self.parse_json_response(response, default={
@@ -325,6 +329,14 @@ class DialogueExpertAgent(Agent):
                 for i, issue in enumerate(remaining_issues)
             ])
             
+            revised = self.revise_with_edits(
+                chapter,
+                "Revise the dialogue in this chapter to implement the suggested improvements, "
+                "adapting them to similar dialogue where the original lines are not found.",
+                issues_text, temperature=0.6)
+            if revised is not None:
+                return revised
+            
             fix_prompt = f"""
             Revise the dialogue in this chapter to implement the suggested improvements.
             
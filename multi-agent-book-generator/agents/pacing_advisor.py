@@ -5,7 +5,8 @@ Specializes in analyzing and improving narrative pacing and flow.
 import logging
 from typing import Dict, Any, List, Optional, Tuple  # Added Tuple import here
 from core.agent import Agent
-from utils.text_processing import analyze_pacing, identify_scene_breaks
+from core.usage_tracker import usage_context
+from utils.text_processing import analyze_pacing, identify_scene_breaks, excerpt_text
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +15,8 @@ class PacingAdvisorAgent(Agent):
     Agent specialized in analyzing and improving narrative pacing.
     """
     
+    PROMPT_VERSION = 3
+    
     def __init__(self, config: Dict[str, Any], llm_provider):
         """Initialize the Pacing Advisor Agent"""
         super().__init__(name="Pacing Advisor", config=config, llm_provider=llm_provider)
@@ -53,7 +56,7 @@ class PacingAdvisorAgent(Agent):
             scene_breaks = identify_scene_breaks(chapter)
             
             # Analyze chapter sample
-            excerpt = chapter[:2000] + "..." + chapter[-2000:] if len(chapter) > 4000 else chapter
+            excerpt = excerpt_text(chapter, max_tokens=1000, count_tokens=self.count_tokens)
             
             chapter_prompt = f"""
             Analyze the narrative pacing of this chapter excerpt.
@@ -92,7 +95,8 @@ class PacingAdvisorAgent(Agent):
             - "pacing_score": Number from 1-10 rating the chapter's pacing quality
             """
             
-            response = self.generate(chapter_prompt, temperature=0.4)
+            with usage_context(chapter=chapter_num):
+                response = self.generate(chapter_prompt, temperature=0.4)
             
             # Parse and store results
             analysis = self.parse_json_response(response, default={
@@ -272,6 +276,14 @@ class PacingAdvisorAgent(Agent):
             for i, issue in enumerate(issues)
         ])
         
+        revised = self.revise_with_edits(
+            chapter,
+            "Fix the following pacing issues in this chapter, improving narrative flow, scene transitions "
+            "and the balance of action, dialogue and description.",
+            issues_text, temperature=0.6)
+        if revised is not None:
+            return revised
+        
         fix_prompt = f"""
         Revise the following chapter to fix the specified pacing issues.
         
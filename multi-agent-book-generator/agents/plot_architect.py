@@ -213,4 +213,73 @@ class PlotArchitectAgent(Agent):
         established world and character motivations, even if readers didn't see it coming.
         """
         
-        return self.generate(twist_prompt, temperature=0.8)
\ No newline at end of file
+        return self.generate(twist_prompt, temperature=0.8)
+    
+    def plan_chapter_states(self, structured_outline: List[Dict[str, Any]], character_profiles: str,
+                            chapter_nums: List[int]) -> Dict[int, str]:
+        """
+        Describe the expected state of the story at the start of each chapter
+        
+        The summaries are derived from the outline alone, so chapters can be
+        written without waiting for the text of the chapters before them.
+        
+        Args:
+            structured_outline: Structured chapter outline
+            character_profiles: Character profiles
+            chapter_nums: Chapter numbers (1-based) to describe
+        
+        Returns:
+            Dictionary mapping chapter numbers to state summaries
+        """
+        logger.info(f"Planning story state for chapters {chapter_nums[0]}-{chapter_nums[-1]}")
+        
+        outline_text = ""
+        for i, outline_item in enumerate(structured_outline):
+            outline_text += f"Chapter {i+1}: {outline_item.get('title', '')}\n"
+            outline_text += f"Summary: {outline_item.get('summary', '')}\n\n"
+        
+        states_prompt = f"""
+        Based on the following book outline and characters, describe the state of the story
+        at the START of each of these chapters: {", ".join(f"Chapter {num}" for num in chapter_nums)}
+        
+        Book Outline:
+        {outline_text}
+        
+        Character Information:
+        {character_profiles[:2000]}...
+        
+        For each chapter, summarize in 100-150 words what a writer needs to know to begin it:
+        - Where the main characters are and what they know at this point
+        - Relationships, injuries, possessions and secrets established so far
+        - Unresolved threads and the emotional tone carried over from the previous chapter
+        - How the previous chapter ended
+        
+        Only include events from earlier chapters - nothing that happens in the chapter itself.
+        
+        Format your response as JSON with chapter numbers as keys and the summary text as each value.
+        """
+        
+        response = self.generate(states_prompt, temperature=0.3)
+        planned = self.parse_json_response(response, default={})
+        if not isinstance(planned, dict):
+            planned = {}
+        
+        states = {}
+        for chapter_num in chapter_nums:
+            state = planned.get(str(chapter_num))
+            if not isinstance(state, str) or not state.strip():
+                # Fall back to the outline of the preceding chapters
+                state = self._outline_state(structured_outline, chapter_num)
+            states[chapter_num] = state.strip()
+        return states
+    
+    @staticmethod
+    def _outline_state(structured_outline: List[Dict[str, Any]], chapter_num: int) -> str:
+        """Summarize the story so far from the outline summaries of earlier chapters"""
+        if chapter_num <= 1:
+            return "This is the opening chapter; nothing has happened yet."
+        
+        recent = structured_outline[max(0, chapter_num - 4):chapter_num - 1]
+        first = chapter_num - len(recent)
+        lines = [f"Chapter {first + i}: {item.get('summary', '')}" for i, item in enumerate(recent)]
+        return "Events of the most recent chapters:\n" + "\n".join(lines)
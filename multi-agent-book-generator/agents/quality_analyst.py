@@ -14,6 +14,8 @@ class QualityAnalystAgent(Agent):
     Agent specialized in evaluating overall book quality and making final improvements.
     """
     
+    PROMPT_VERSION = 2
+    
     def __init__(self, config: Dict[str, Any], llm_provider):
         """Initialize the Quality Analyst Agent"""
         super().__init__(name="Quality Analyst", config=config, llm_provider=llm_provider)
@@ -212,6 +214,13 @@ class QualityAnalystAgent(Agent):
             for i, issue in enumerate(issues)
         ])
         
+        revised = self.revise_with_edits(
+            chapter,
+            "Fix the following critical quality issues in this chapter while preserving the story elements.",
+            issues_text, temperature=0.6)
+        if revised is not None:
+            return revised
+        
         fix_prompt = f"""
         Revise this chapter to fix the following critical quality issues.
         
@@ -5,7 +5,8 @@ Specializes in analyzing and improving writing style consistency.
 import logging
 from typing import Dict, Any, List, Optional
 from core.agent import Agent
-from utils.text_processing import find_repeated_phrases, remove_adverbs
+from core.usage_tracker import usage_context
+from utils.text_processing import find_repeated_phrases, remove_adverbs, excerpt_text
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +15,8 @@ class StyleReviewerAgent(Agent):
     Agent specialized in analyzing and improving writing style.
     """
     
+    PROMPT_VERSION = 3
+    
     def __init__(self, config: Dict[str, Any], llm_provider):
         """Initialize the Style Reviewer Agent"""
         super().__init__(name="Style Reviewer", config=config, llm_provider=llm_provider)
@@ -44,7 +47,7 @@ class StyleReviewerAgent(Agent):
             logger.info(f"Analyzing style for Chapter {chapter_num}")
             
             # Analyze chapter excerpt 
-            excerpt = chapter[:2000] + "..." + chapter[-2000:] if len(chapter) > 4000 else chapter
+            excerpt = excerpt_text(chapter, max_tokens=1000, count_tokens=self.count_tokens)
             
             chapter_prompt = f"""
             Analyze the writing style of this chapter excerpt, comparing it to the target style of "{writing_style}".
@@ -75,7 +78,8 @@ class StyleReviewerAgent(Agent):
             - "consistency_score": Number from 1-10 rating overall style consistency
             """
             
-            response = self.generate(chapter_prompt, temperature=0.4)
+            with usage_context(chapter=chapter_num):
+                response = self.generate(chapter_prompt, temperature=0.4)
             
             # Parse and store results
             analysis = self.parse_json_response(response, default={
@@ -171,6 +175,11 @@ class StyleReviewerAgent(Agent):
             for i, issue in enumerate(issues)
         ])
         
+        revised = self.revise_with_edits(chapter, "Fix the following style issues in this chapter.",
+                                         issues_text, temperature=0.5)
+        if revised is not None:
+            return revised
+        
         fix_prompt = f"""
         Revise the following chapter to fix the specified style issues.
         
@@ -2,9 +2,12 @@
 Writer Agent
 Specializes in generating creative content based on outlines and character profiles.
 """
+import os
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, TextIO
 from core.agent import Agent
+from core.deadline import DeadlineExceeded
+from core.usage_tracker import CallRefused
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +21,10 @@ class WriterAgent(Agent):
         super().__init__(name="Writer", config=config, llm_provider=llm_provider)
     
     def write_chapter(self, chapter_info: Dict[str, Any], previous_chapters: List[str], 
-                     character_profiles: str, writing_style: str) -> str:
+                     character_profiles: str, writing_style: str,
+                     output_path: Optional[str] = None,
+                     chapter_context: Optional[str] = None,
+                     story_context: Optional[str] = None) -> str:
         """
         Write a chapter based on the outline and previous chapters
         
@@ -27,6 +33,11 @@ class WriterAgent(Agent):
             previous_chapters: Content of previous chapters
             character_profiles: Character profiles
             writing_style: The desired writing style
+            output_path: If given, stream the chapter into this file as it is generated
+            chapter_context: Expected story state at the start of the chapter, used
+                instead of previous chapter text when chapters are written in parallel
+            story_context: Story bible view, used instead of the character profiles
+                and excerpts of the previous chapters
             
         Returns:
             The written chapter
@@ -40,7 +51,13 @@ class WriterAgent(Agent):
         
         # Create context based on previous chapters
         prev_chapters_context = ""
-        if previous_chapters:
+        if story_context:
+            # The story bible already covers the earlier chapters; only the previous
+            # chapter's last lines are kept so the new chapter picks up where it ended
+            if previous_chapters:
+                prev_ending = " ".join(previous_chapters[-1].split()[-150:])
+                prev_chapters_context = f"\n\nThe previous chapter ends:\n{prev_ending}\n"
+        elif previous_chapters:
             # For token efficiency, summarize previous chapters instead of including full text
             prev_chapters_context = "\n\nContext from previous chapters (for continuity):\n"
             for i, prev_chapter in enumerate(previous_chapters[-2:]):  # Only include last 2 chapters
@@ -54,6 +71,16 @@ class WriterAgent(Agent):
                 if end_context:
                     prev_chapters_context += f"Chapter {prev_idx} ending: {end_context}\n\n"
         
+        if chapter_context:
+            prev_chapters_context += f"\n\nStory state at the start of this chapter (for continuity):\n{chapter_context}\n"
+        
+        if story_context:
+            reference_context = f"""Story Bible (the story so far; stay consistent with it):
+        {story_context}"""
+        else:
+            reference_context = f"""Character Information (reference for consistency):
+        {character_profiles[:2000]}..."""
+        
         # Create a prompt for the chapter
         chapter_prompt = f"""
         Write Chapter {chapter_num}: "{chapter_title}" for a story in the {writing_style} style.
@@ -61,8 +88,7 @@ class WriterAgent(Agent):
         Chapter Summary:
         {chapter_summary}
         
-        Character Information (reference for consistency):
-        {character_profiles[:2000]}...
+        {reference_context}
         {prev_chapters_context}
         
         Guidelines:
@@ -77,13 +103,74 @@ class WriterAgent(Agent):
         Begin the chapter directly with the narrative, without including the chapter number or title.
         """
         
+        # Stream into the chapter file when requested so progress is visible
+        # and a dropped connection does not lose the text generated so far
+        if output_path and self.settings.get("stream", True):
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+            with open(output_path, "w") as output_file:
+                if target_word_count > 3000:
+                    return self._write_long_chapter(chapter_prompt, target_word_count, output_file=output_file)
+                return self._stream_chunk(chapter_prompt, output_file)
+        
         # If the target word count is large, we might need to chunk the generation
         if target_word_count > 3000:
             return self._write_long_chapter(chapter_prompt, target_word_count)
         else:
             return self.generate(chapter_prompt, temperature=0.7)
     
-    def _write_long_chapter(self, initial_prompt: str, target_word_count: int, max_chunks: int = 3) -> str:
+    def _stream_chunk(self, prompt: str, output_file: TextIO, max_resumes: int = 2) -> str:
+        """
+        Stream one generation into an open file, resuming from partial output on failure
+        
+        Args:
+            prompt: The generation prompt
+            output_file: File to append the text to as it arrives
+            max_resumes: Maximum number of continuation requests after interruptions
+        
+        Returns:
+            The generated text
+        """
+        parts = []
+        current_prompt = prompt
+        resumes = 0
+        
+        while True:
+            try:
+                for chunk in self.stream(current_prompt, temperature=0.7):
+                    parts.append(chunk)
+                    output_file.write(chunk)
+                    output_file.flush()
+                return "".join(parts).strip()
+            except (DeadlineExceeded, CallRefused):
+                # The run was stopped, not the connection; resuming would keep spending
+                raise
+            except Exception as e:
+                partial = "".join(parts)
+                if not partial.strip() or resumes >= max_resumes:
+                    raise
+                
+                resumes += 1
+                logger.warning(f"Generation interrupted after {len(partial.split())} words, "
+                               f"resuming from partial output ({resumes}/{max_resumes}): {e}")
+                
+                current_prompt = f"""
+                You were writing text according to these instructions:
+                {prompt}
+                
+                The text was cut off. Here is the end of what was written so far:
+                {partial[-1500:]}
+                
+                Continue exactly where the text stops, without repeating or recapping anything.
+                Do not add comments or explanations - just continue the text.
+                """
+                
+                # Keep the file and the returned text aligned on a clean word boundary
+                if not partial[-1:].isspace():
+                    parts.append(" ")
+                    output_file.write(" ")
+    
+    def _write_long_chapter(self, initial_prompt: str, target_word_count: int, max_chunks: int = 3,
+                            output_file: Optional[TextIO] = None) -> str:
         """
         Write a long chapter by generating it in chunks
         
@@ -91,6 +178,7 @@ class WriterAgent(Agent):
             initial_prompt: The prompt for the first chunk
             target_word_count: Target word count for the chapter
             max_chunks: Maximum number of chunks to generate
+            output_file: If given, stream each chunk into this file as it is generated
             
         Returns:
             The complete chapter
@@ -101,7 +189,10 @@ class WriterAgent(Agent):
         
         # Generate the first chunk
         logger.info(f"Generating chunk 1/{max_chunks} for long chapter")
-        first_chunk = self.generate(initial_prompt, temperature=0.7)
+        if output_file is not None:
+            first_chunk = self._stream_chunk(initial_prompt, output_file)
+        else:
+            first_chunk = self.generate(initial_prompt, temperature=0.7)
         chunks.append(first_chunk)
         
         # Count words
@@ -133,7 +224,11 @@ class WriterAgent(Agent):
             Continue directly from this point:
             """
             
-            next_chunk = self.generate(continuation_prompt, temperature=0.7)
+            if output_file is not None:
+                output_file.write("\n\n")
+                next_chunk = self._stream_chunk(continuation_prompt, output_file)
+            else:
+                next_chunk = self.generate(continuation_prompt, temperature=0.7)
             chunks.append(next_chunk)
             
             chunk_words = len(next_chunk.split())
@@ -172,6 +267,56 @@ class WriterAgent(Agent):
         
         return self.generate(revision_prompt, temperature=0.7)
     
+    def smooth_chapter_opening(self, chapter: str, previous_ending: str, chapter_summary: str,
+                               num_paragraphs: int = 2) -> str:
+        """
+        Rewrite the opening of a chapter so it follows on from the previous chapter
+        
+        Used after chapters have been drafted in parallel, when each chapter was
+        written without seeing how the one before it actually ended.
+        
+        Args:
+            chapter: The chapter content
+            previous_ending: The end of the previous chapter
+            chapter_summary: Outline summary of this chapter
+            num_paragraphs: Number of opening paragraphs that may be rewritten
+        
+        Returns:
+            The chapter with its opening smoothed
+        """
+        paragraphs = chapter.split("\n\n")
+        # Short chapters are left alone so the rewrite cannot swallow the whole text
+        if len(paragraphs) <= num_paragraphs * 2:
+            return chapter
+        
+        opening = "\n\n".join(paragraphs[:num_paragraphs])
+        seam_prompt = f"""
+        The following chapter was drafted without seeing the end of the previous chapter.
+        Revise its opening paragraphs so the transition is seamless.
+        
+        End of the previous chapter:
+        {previous_ending}
+        
+        Summary of this chapter:
+        {chapter_summary}
+        
+        Opening paragraphs of this chapter:
+        {opening}
+        
+        Fix any contradictions with how the previous chapter ended (locations, time of day,
+        who is present, what the characters know) and avoid repeating events already shown.
+        Keep the same events, style and approximate length.
+        
+        Provide ONLY the revised opening paragraphs, nothing else.
+        """
+        
+        revised = self.generate(seam_prompt, temperature=0.5).strip()
+        if not self.check_response_quality(revised, min_length=len(opening) // 3):
+            logger.warning("Seam revision was unusable, keeping the original opening")
+            return chapter
+        
+        return "\n\n".join([revised] + paragraphs[num_paragraphs:])
+    
     def generate_chapter_title(self, chapter_content: str) -> str:
         """
         Generate a title for a chapter based on its content
@@ -0,0 +1,10 @@
+"""
+Throughput benchmarks for the multi-agent book generation system.
+"""
+
+from benchmarks.runner import run_benchmark, run_suite
+
+__all__ = [
+    'run_benchmark',
+    'run_suite'
+]
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+Benchmark Runner
+Runs BookGenerationOrchestrator end to end against the offline mock provider
+and records wall time per phase, calls per agent, token usage and peak RSS.
+"""
+import os
+import sys
+import copy
+import json
+import time
+import logging
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [5, 20, 100]
+
+# Fast enough that a 100-chapter book finishes in minutes, slow enough that
+# latency and concurrency still dominate the measurements
+DEFAULT_MOCK_SETTINGS = {
+    "latency_seconds": 0.05,
+    "latency_jitter": 0.05,
+    "tokens_per_second": 5000,
+    "rate_limit_error_rate": 0.0,
+    "server_error_rate": 0.0,
+    "seed": 0
+}
+
+def build_config(num_chapters: int, output_dir: str,
+                 base_config: Optional[Dict[str, Any]] = None,
+                 mock_settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build a benchmark configuration that uses the mock provider
+    
+    Args:
+        num_chapters: Number of chapters to generate
+        output_dir: Directory for the generated book
+        base_config: Optional configuration to start from (e.g. concurrency settings)
+        mock_settings: Overrides for the mock provider's latency and failure model
+    
+    Returns:
+        Configuration dictionary
+    """
+    config = copy.deepcopy(base_config or {})
+    config.setdefault("writing_style", "descriptive")
+    config.setdefault("description", "A benchmark novel about a lighthouse keeper who finds a message in a bottle.")
+    config.setdefault("genre", "mystery")
+    config["num_chapters"] = num_chapters
+    
+    output_settings = config.setdefault("output_settings", {})
+    output_settings["output_directory"] = output_dir
+    output_settings.setdefault("formats", ["txt"])
+    
+    config.setdefault("system_settings", {})["interactive_mode"] = False
+    
+    llm_settings = config.setdefault("llm_settings", {})
+    llm_settings["default_provider"] = "mock"
+    providers = llm_settings.setdefault("providers", {})
+    providers["mock"] = {**DEFAULT_MOCK_SETTINGS, **providers.get("mock", {}), **(mock_settings or {})}
+    return config
+
+def _peak_rss_mb() -> Optional[float]:
+    """Return this process's peak resident set size in MB, if available"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+def run_benchmark(num_chapters: int, output_dir: str,
+                  base_config: Optional[Dict[str, Any]] = None,
+                  mock_settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Generate one book and summarize its performance
+    
+    Peak RSS covers the whole process, so run_suite executes each benchmark
+    in a fresh process.
+    
+    Args:
+        num_chapters: Number of chapters to generate
+        output_dir: Directory for the generated book
+        base_config: Optional configuration to start from
+        mock_settings: Overrides for the mock provider settings
+    
+    Returns:
+        Dictionary of measurements
+    """
+    from core.orchestrator import BookGenerationOrchestrator
+    
+    config = build_config(num_chapters, output_dir, base_config, mock_settings)
+    orchestrator = BookGenerationOrchestrator(config)
+    
+    started = time.perf_counter()
+    success = orchestrator.run()
+    wall_time = time.perf_counter() - started
+    orchestrator.llm_provider.close()
+    
+    usage = orchestrator.usage_tracker.to_dict()
+    result = {
+        "chapters": num_chapters,
+        "success": success,
+        "wall_time_seconds": round(wall_time, 3),
+        "phase_times": {phase: round(seconds, 3) for phase, seconds in orchestrator.metrics["phase_times"].items()},
+        "calls": usage["calls"],
+        "calls_by_agent": {agent: stats["calls"] for agent, stats in usage["by_agent"].items()},
+        "calls_by_phase": {phase: stats["calls"] for phase, stats in usage["by_phase"].items()},
+        "prompt_tokens": usage["prompt_tokens"],
+        "completion_tokens": usage["completion_tokens"],
+        "total_tokens": usage["total_tokens"],
+        "retries": usage["retries"],
+        "words": sum(len(chapter.split()) for chapter in orchestrator.book_data["chapters"]),
+        "peak_rss_mb": _peak_rss_mb()
+    }
+    orchestrator.close()
+    return result
+
+def _run_in_subprocess(num_chapters: int, output_dir: str,
+                       base_config: Optional[Dict[str, Any]],
+                       mock_settings: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Entry point for a benchmark worker process"""
+    # Keep per-call INFO logs out of the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+    return run_benchmark(num_chapters, output_dir, base_config, mock_settings)
+
+def _git_commit() -> Optional[str]:
+    """Return the current git commit, if the code is in a git checkout"""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=10
+        )
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run_suite(sizes: List[int] = None, output_path: Optional[str] = None,
+              base_config: Optional[Dict[str, Any]] = None,
+              mock_settings: Optional[Dict[str, Any]] = None,
+              keep_output: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run benchmarks for several book sizes and write the results as JSON
+    
+    Args:
+        sizes: Chapter counts to benchmark (defaults to 5, 20 and 100)
+        output_path: Where to write the results JSON
+        base_config: Optional configuration to start from
+        mock_settings: Overrides for the mock provider settings
+        keep_output: Directory to keep the generated books in (a temporary
+            directory is used and removed otherwise)
+    
+    Returns:
+        The results dictionary
+    """
+    sizes = sizes or DEFAULT_SIZES
+    commit = _git_commit()
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mock_settings": {**DEFAULT_MOCK_SETTINGS, **(mock_settings or {})},
+        "runs": []
+    }
+    
+    with tempfile.TemporaryDirectory(prefix="book_bench_") as temp_dir:
+        books_dir = keep_output or temp_dir
+        for num_chapters in sizes:
+            logger.info(f"Benchmarking a {num_chapters}-chapter book")
+            output_dir = os.path.join(books_dir, f"chapters_{num_chapters}")
+            
+            # A fresh process per size so peak RSS is not inherited from earlier runs
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                run = executor.submit(_run_in_subprocess, num_chapters, output_dir, base_config, mock_settings).result()
+            
+            results["runs"].append(run)
+            logger.info(f"{num_chapters} chapters: {run['wall_time_seconds']:.1f}s wall, "
+                         f"{run['calls']} calls, {run['total_tokens']} tokens, "
+                         f"peak RSS {run['peak_rss_mb']} MB")
+    
+    if output_path is None:
+        results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_path = os.path.join(results_dir, f"bench_{commit or 'nogit'}_{stamp}.json")
+    
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Benchmark results saved to {output_path}")
+    
+    results["output_path"] = output_path
+    return results
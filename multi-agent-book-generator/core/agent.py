@@ -5,14 +5,21 @@ Defines the core functionality for all specialized agents in the system.
 import os
 import json
 import logging
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Union, Iterator
 from datetime import datetime
+from .usage_tracker import usage_context
+from utils.patching import EDIT_INSTRUCTIONS, parse_edit_operations, apply_edit_operations
+from utils.text_processing import get_token_counter
 
 logger = logging.getLogger(__name__)
 
 class Agent:
     """Base class for all specialized agents in the system"""
     
+    # Version of the agent's prompt templates. Bump it when a prompt changes so
+    # incremental rebuilds regenerate everything the agent produced
+    PROMPT_VERSION = 1
+    
     def __init__(self, name: str, config: Dict[str, Any], llm_provider=None):
         """
         Initialize the agent
@@ -29,8 +36,14 @@ class Agent:
         
         # Get agent-specific settings
         agent_key = name.lower().replace(' ', '_')
+        self.agent_key = agent_key
         self.settings = config.get("agent_settings", {}).get(agent_key, {})
         
+        # Counts tokens when packing text into prompts; a local tokenizer can be
+        # configured per agent or in llm_settings, otherwise counts are estimated
+        self.count_tokens = get_token_counter(self.settings.get("tokenizer") or
+                                              config.get("llm_settings", {}).get("tokenizer"))
+        
         # Set up logging for this agent
         self.prompt_log = []
         self.save_prompts = config.get("system_settings", {}).get("save_agent_prompts", True)
@@ -38,7 +51,8 @@ class Agent:
     def generate(self, prompt: str, 
                  max_tokens: Optional[int] = None,
                  temperature: Optional[float] = None,
-                 provider: Optional[str] = None) -> str:
+                 provider: Optional[str] = None,
+                 timeout: Optional[float] = None) -> str:
         """
         Generate text using the agent's assigned LLM
         
@@ -47,6 +61,7 @@ class Agent:
             max_tokens: Maximum number of tokens to generate
             temperature: Controls randomness in generation
             provider: Specific provider to use
+            timeout: Per-attempt timeout in seconds (the run deadline still applies)
             
         Returns:
             The generated text
@@ -58,17 +73,100 @@ class Agent:
         if provider is None:
             provider = self.settings.get("provider", "default")
         
+        if timeout is None:
+            timeout = self.settings.get("timeout")
+        
         # Log the prompt if enabled
         if self.save_prompts:
             self._log_prompt(prompt)
         
         # Generate text using the LLM provider
-        return self.llm_provider.generate_text(
-            prompt=prompt,
-            max_tokens=max_tokens,
-            temperature=temperature,
-            provider=provider
-        )
+        with usage_context(agent=self.agent_key):
+            return self.llm_provider.generate_text(
+                prompt=prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                provider=provider,
+                timeout=timeout
+            )
+    
+    async def agenerate(self, prompt: str,
+                        max_tokens: Optional[int] = None,
+                        temperature: Optional[float] = None,
+                        provider: Optional[str] = None,
+                        timeout: Optional[float] = None) -> str:
+        """
+        Generate text asynchronously using the agent's assigned LLM
+        
+        Args:
+            prompt: The input prompt for text generation
+            max_tokens: Maximum number of tokens to generate
+            temperature: Controls randomness in generation
+            provider: Specific provider to use
+            timeout: Per-attempt timeout in seconds (the run deadline still applies)
+        
+        Returns:
+            The generated text
+        """
+        if temperature is None:
+            temperature = self.settings.get("temperature")
+        
+        if provider is None:
+            provider = self.settings.get("provider", "default")
+        
+        if timeout is None:
+            timeout = self.settings.get("timeout")
+        
+        if self.save_prompts:
+            self._log_prompt(prompt)
+        
+        with usage_context(agent=self.agent_key):
+            return await self.llm_provider.agenerate_text(
+                prompt=prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                provider=provider,
+                timeout=timeout
+            )
+    
+    def stream(self, prompt: str,
+               max_tokens: Optional[int] = None,
+               temperature: Optional[float] = None,
+               provider: Optional[str] = None,
+               timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Stream text from the agent's assigned LLM as it is generated
+        
+        Args:
+            prompt: The input prompt for text generation
+            max_tokens: Maximum number of tokens to generate
+            temperature: Controls randomness in generation
+            provider: Specific provider to use
+            timeout: Per-attempt timeout in seconds (the run deadline still applies)
+        
+        Returns:
+            Iterator over generated text chunks
+        """
+        if temperature is None:
+            temperature = self.settings.get("temperature")
+        
+        if provider is None:
+            provider = self.settings.get("provider", "default")
+        
+        if timeout is None:
+            timeout = self.settings.get("timeout")
+        
+        if self.save_prompts:
+            self._log_prompt(prompt)
+        
+        with usage_context(agent=self.agent_key):
+            return self.llm_provider.stream_text(
+                prompt=prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                provider=provider,
+                timeout=timeout
+            )
     
     def _log_prompt(self, prompt: str) -> None:
         """Log the prompt for debugging and analysis"""
@@ -149,6 +247,59 @@ class Agent:
             logger.error(f"Error parsing JSON response: {e}")
             return default
     
+    def revise_with_edits(self, text: str, request: str, issues_text: str,
+                          temperature: Optional[float] = None) -> Optional[str]:
+        """
+        Revise text by asking the model for search/replace edits instead of the full revised text
+        
+        Output then grows with the size of the changes rather than the length
+        of the text, and texts longer than the model's output limit can be
+        revised. Edits whose anchors are missing, ambiguous or overlapping are
+        skipped.
+        
+        Args:
+            text: The text to revise
+            request: What the revision should achieve
+            issues_text: The issues to fix, formatted for the prompt
+            temperature: Controls randomness in generation
+        
+        Returns:
+            The revised text, or None if patch edits are disabled for this agent
+            or the model's edits could not be used (callers then fall back to a
+            full rewrite)
+        """
+        if self.settings.get("edit_mode", "patch") != "patch":
+            return None
+        
+        edit_prompt = f"""
+        {request}
+        
+        Text:
+        {text}
+        
+        Issues to fix:
+        {issues_text}
+        
+        {EDIT_INSTRUCTIONS}
+        """
+        
+        response = self.generate(edit_prompt, temperature=temperature)
+        operations = parse_edit_operations(response)
+        if operations is None:
+            logger.warning(f"{self.name} returned no usable edits; falling back to a full revision")
+            return None
+        if not operations:
+            return text
+        
+        revised, applied, rejected = apply_edit_operations(text, operations)
+        if not applied:
+            logger.warning(f"None of the {len(operations)} edits from {self.name} matched the text; "
+                           f"falling back to a full revision")
+            return None
+        if rejected:
+            logger.info(f"Applied {len(applied)} of {len(operations)} edits from {self.name}")
+        return revised
+    
     def check_response_quality(self, response: str, min_length: int = 10) -> bool:
         """
         Check if a response meets basic quality criteria
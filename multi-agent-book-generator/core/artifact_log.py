@@ -0,0 +1,210 @@
+"""
+Artifact Log
+Append-only store of a run's intermediate files. Saving an artifact only
+queues it; a background thread appends it to a single log file, and the
+files themselves are materialised from the log on demand.
+"""
+import os
+import json
+import queue
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+class ArtifactLog:
+    """Appends intermediate artifacts to a log file from a background thread"""
+    
+    FILENAME = "artifacts.log"
+    
+    # Parts at least this long are stored once and referenced by their hash,
+    # so a chapter that appears in several artifacts is only written once
+    BLOB_THRESHOLD = 256
+    
+    def __init__(self, directory: str):
+        """
+        Initialize the log
+        
+        Args:
+            directory: Directory that holds the log and the materialised files
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, self.FILENAME)
+        # Artifacts saved through this instance, by name
+        self.written: Set[str] = set()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # Hashes of the blobs in the log; loaded by the writer thread
+        self._blobs: Set[str] = set()
+    
+    def write(self, name: str, content: Union[str, List[str]]) -> None:
+        """
+        Queue a text artifact
+        
+        Args:
+            name: Path of the artifact relative to the log's directory
+            content: The text, or a list of parts to concatenate
+        """
+        self._put(name, [content] if isinstance(content, str) else list(content), None)
+    
+    def write_json(self, name: str, data: Any) -> None:
+        """
+        Queue a JSON artifact
+        
+        The data is serialized by the writer thread, so it must not be
+        modified after it is queued.
+        
+        Args:
+            name: Path of the artifact relative to the log's directory
+            data: JSON-serializable data
+        """
+        self._put(name, None, data)
+    
+    def _put(self, name: str, parts: Optional[List[str]], data: Any) -> None:
+        """Queue an artifact, starting the writer thread if needed"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="artifact-writer", daemon=True)
+                self._thread.start()
+            self.written.add(name)
+        self._queue.put((name, parts, data, datetime.now().isoformat()))
+    
+    def flush(self) -> None:
+        """Wait until every queued artifact has been appended to the log"""
+        with self._lock:
+            if self._thread is None:
+                return
+        self._queue.join()
+    
+    def close(self) -> None:
+        """Append the queued artifacts and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+    
+    def _run(self) -> None:
+        """Writer thread: append queued artifacts, flushing whenever the queue runs empty"""
+        try:
+            log = self._open()
+        except Exception as e:
+            logger.error(f"Could not open the artifact log {self.path}: {e}")
+            log = None
+        
+        try:
+            while True:
+                item = self._queue.get()
+                try:
+                    if item is None:
+                        return
+                    if log is not None:
+                        log.write(self._encode(*item))
+                        if self._queue.empty():
+                            log.flush()
+                except Exception as e:
+                    logger.error(f"Could not save artifact {item[0]}: {e}")
+                finally:
+                    self._queue.task_done()
+        finally:
+            if log is not None:
+                log.close()
+    
+    def _open(self):
+        """Open the log for appending and load the hashes of the blobs already in it"""
+        os.makedirs(self.directory, exist_ok=True)
+        blobs, _, valid_size = self._scan()
+        self._blobs = set(blobs)
+        if os.path.exists(self.path) and os.path.getsize(self.path) > valid_size:
+            # Drop a record torn by a crash so the next one starts on its own line
+            os.truncate(self.path, valid_size)
+        return open(self.path, "ab")
+    
+    def _encode(self, name: str, parts: Optional[List[str]], data: Any, time: str) -> bytes:
+        """Return the log records of an artifact: new blobs, then the file record"""
+        if parts is None:
+            parts = [json.dumps(data, indent=2)]
+        
+        lines = []
+        references = []
+        for part in parts:
+            if len(part) < self.BLOB_THRESHOLD:
+                references.append(part)
+                continue
+            digest = hashlib.sha1(part.encode("utf-8")).hexdigest()
+            if digest not in self._blobs:
+                lines.append(json.dumps({"blob": digest, "text": part}))
+                self._blobs.add(digest)
+            references.append({"blob": digest})
+        lines.append(json.dumps({"file": name, "parts": references, "time": time}))
+        return ("\n".join(lines) + "\n").encode("utf-8")
+    
+    def _scan(self) -> Tuple[Dict[str, int], Dict[str, Dict[str, Any]], int]:
+        """
+        Index the log in one pass without loading the blobs
+        
+        Returns:
+            Offset of each blob by hash, the latest record of each artifact by
+            name, and the size of the log up to its last complete record
+        """
+        blobs = {}
+        files = {}
+        offset = 0
+        if not os.path.exists(self.path):
+            return blobs, files, offset
+        
+        blob_prefix = b'{"blob": "'
+        with open(self.path, "rb") as log:
+            for line in log:
+                if not line.endswith(b"\n"):
+                    # Torn by a crash while it was being appended
+                    break
+                if line.startswith(blob_prefix):
+                    digest = line[len(blob_prefix):line.index(b'"', len(blob_prefix))].decode("ascii")
+                    blobs[digest] = offset
+                else:
+                    record = json.loads(line)
+                    files[record["file"]] = record
+                offset += len(line)
+        return blobs, files, offset
+    
+    def materialize(self, names: Optional[Set[str]] = None, directory: Optional[str] = None) -> List[str]:
+        """
+        Write the latest version of artifacts as files
+        
+        Blobs are read from the log one at a time, so memory use does not
+        grow with the size of the log.
+        
+        Args:
+            names: Artifacts to write (all of them by default)
+            directory: Where to write them (the log's directory by default)
+        
+        Returns:
+            Paths of the written files
+        """
+        self.flush()
+        blobs, files, _ = self._scan()
+        directory = directory or self.directory
+        
+        paths = []
+        if not files:
+            return paths
+        with open(self.path, "rb") as log:
+            for name, record in files.items():
+                if names is not None and name not in names:
+                    continue
+                path = os.path.join(directory, *name.split("/"))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as f:
+                    for part in record["parts"]:
+                        if isinstance(part, dict):
+                            log.seek(blobs[part["blob"]])
+                            part = json.loads(log.readline())["text"]
+                        f.write(part)
+                paths.append(path)
+        logger.info(f"Materialised {len(paths)} intermediate files in {directory}")
+        return paths
@@ -0,0 +1,221 @@
+"""
+Batch Runner
+Generates many books concurrently in one process. The books share a single
+LLMProvider, so its concurrency limits, rate limiter, response cache and
+provider health tracking apply to the whole batch.
+"""
+import os
+import copy
+import json
+import time
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from .llm_provider import LLMProvider
+from .orchestrator import BookGenerationOrchestrator
+from .usage_tracker import UsageTracker, usage_context
+from .task_graph import submit_in_context
+
+logger = logging.getLogger(__name__)
+
+def load_manifest(manifest_path: str) -> List[Dict[str, Any]]:
+    """
+    Read a batch manifest
+    
+    Each non-empty line is a JSON object with the settings of one book
+    (description, genre, num_chapters, ...) and an optional "id".
+    
+    Args:
+        manifest_path: Path to the JSONL manifest
+    
+    Returns:
+        List of book entries
+    
+    Raises:
+        ValueError: If a line is not a JSON object or repeats an earlier id
+    """
+    entries = []
+    id_lines = {}
+    with open(manifest_path, "r") as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{manifest_path}:{line_num}: invalid JSON ({e})")
+            if not isinstance(entry, dict):
+                raise ValueError(f"{manifest_path}:{line_num}: expected a JSON object")
+            if "id" in entry:
+                book_id = str(entry["id"])
+                if book_id in id_lines:
+                    raise ValueError(f"{manifest_path}:{line_num}: duplicate book id {book_id!r} "
+                                     f"(first used on line {id_lines[book_id]})")
+                id_lines[book_id] = line_num
+            entries.append(entry)
+    return entries
+
+def merge_book_config(base_config: Dict[str, Any], entry: Dict[str, Any],
+                      output_directory: str) -> Dict[str, Any]:
+    """
+    Build the configuration of one book of a batch or service
+    
+    Args:
+        base_config: Configuration shared by every book
+        entry: The book's settings; dictionaries are merged one level deep
+        output_directory: Output directory, unless the entry sets its own
+    
+    Returns:
+        The book's configuration
+    """
+    config = copy.deepcopy(base_config)
+    for key, value in entry.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            config[key] = {**config[key], **value}
+        else:
+            config[key] = value
+    
+    config["output_settings"] = config.get("output_settings", {})
+    if "output_directory" not in entry.get("output_settings", {}):
+        config["output_settings"]["output_directory"] = output_directory
+    # Prompts cannot be answered while several books run unattended
+    config["system_settings"] = {**config.get("system_settings", {}), "interactive_mode": False}
+    return config
+
+class BatchRunner:
+    """Runs the books of a manifest with a bounded number of books active at once"""
+    
+    def __init__(self, base_config: Dict[str, Any], entries: List[Dict[str, Any]],
+                 output_root: str, max_active_books: Optional[int] = None):
+        """
+        Initialize the batch
+        
+        Args:
+            base_config: Configuration shared by every book; its llm_settings
+                configure the shared provider
+            entries: Book entries from the manifest; their settings override
+                the base configuration
+            output_root: Directory that holds one output directory per book
+            max_active_books: Maximum number of books generated at the same time
+        
+        Raises:
+            ValueError: If two books have the same id, since they would share
+                an output directory
+        """
+        self.base_config = base_config
+        self.output_root = output_root
+        self.max_active_books = max(1, max_active_books or
+                                    base_config.get("system_settings", {}).get("max_active_books", 2))
+        self.books = [self._book_config(entry, i) for i, entry in enumerate(entries)]
+        book_ids = [book["id"] for book in self.books]
+        duplicates = sorted({book_id for book_id in book_ids if book_ids.count(book_id) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate book ids in the batch: {', '.join(duplicates)}")
+        
+        self.llm_provider = LLMProvider(base_config)
+        self.usage_tracker = UsageTracker()
+        self.results: List[Dict[str, Any]] = []
+    
+    def _book_config(self, entry: Dict[str, Any], index: int) -> Dict[str, Any]:
+        """Merge a manifest entry over the base configuration and assign its output directory"""
+        entry = dict(entry)
+        book_id = str(entry.pop("id", f"book_{index + 1:03d}"))
+        config = merge_book_config(self.base_config, entry, os.path.join(self.output_root, book_id))
+        return {"id": book_id, "config": config}
+    
+    def _run_book(self, book: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate one book with the shared provider"""
+        config = book["config"]
+        started = time.time()
+        logger.info(f"Starting book {book['id']} in {config['output_settings']['output_directory']}")
+        
+        success = False
+        orchestrator = None
+        error = None
+        try:
+            orchestrator = BookGenerationOrchestrator(config, llm_provider=self.llm_provider)
+            with usage_context(tracker=self.usage_tracker):
+                success = orchestrator.run()
+        except Exception as e:
+            logger.error(f"Book {book['id']} failed: {e}", exc_info=True)
+            error = str(e)
+        
+        wall_time = time.time() - started
+        usage = orchestrator.usage_tracker.to_dict() if orchestrator else {}
+        chapters = orchestrator.book_data["chapters"] if orchestrator else []
+        logger.info(f"Finished book {book['id']} in {wall_time:.1f} seconds "
+                    f"({'success' if success else 'failed'})")
+        try:
+            return {
+                "id": book["id"],
+                "success": success,
+                "error": error,
+                "output_directory": config["output_settings"]["output_directory"],
+                "title": orchestrator.book_data["metadata"]["title"] if orchestrator else "",
+                "wall_time_seconds": round(wall_time, 3),
+                "chapters": len(chapters),
+                "words": sum(len(chapter.split()) for chapter in chapters),
+                "calls": usage.get("calls", 0),
+                "total_tokens": usage.get("total_tokens", 0),
+                "reused_tasks": len(orchestrator.metrics.get("reused_tasks", [])) if orchestrator else 0
+            }
+        finally:
+            if orchestrator is not None:
+                orchestrator.close()
+    
+    def run(self) -> Dict[str, Any]:
+        """
+        Generate every book in the batch
+        
+        Returns:
+            Batch report with per-book results and aggregate throughput
+        """
+        started_at = datetime.now().isoformat()
+        started = time.time()
+        logger.info(f"Running a batch of {len(self.books)} books, {self.max_active_books} at a time")
+        
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_active_books, thread_name_prefix="book") as executor:
+                futures = [submit_in_context(executor, self._run_book, book) for book in self.books]
+                self.results = [future.result() for future in futures]
+        finally:
+            self.llm_provider.close()
+        
+        report = self._report(started_at, time.time() - started)
+        os.makedirs(self.output_root, exist_ok=True)
+        report_path = os.path.join(self.output_root, "batch_report.json")
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        report["report_path"] = report_path
+        logger.info(f"Saved batch report to {report_path}")
+        return report
+    
+    def _report(self, started_at: str, wall_time: float) -> Dict[str, Any]:
+        """Build the batch report with aggregate throughput"""
+        usage = self.usage_tracker.to_dict()
+        completed = [result for result in self.results if result["success"]]
+        hours = wall_time / 3600 if wall_time > 0 else 0
+        book_time = sum(result["wall_time_seconds"] for result in self.results)
+        
+        return {
+            "started_at": started_at,
+            "finished_at": datetime.now().isoformat(),
+            "wall_time_seconds": round(wall_time, 3),
+            "max_active_books": self.max_active_books,
+            "books": len(self.results),
+            "completed": len(completed),
+            "failed": len(self.results) - len(completed),
+            "throughput": {
+                "books_per_hour": round(len(completed) / hours, 2) if hours else None,
+                "chapters_per_hour": round(sum(r["chapters"] for r in completed) / hours, 2) if hours else None,
+                "words_per_minute": round(sum(r["words"] for r in completed) / (wall_time / 60), 1) if wall_time else None,
+                "tokens_per_second": round(usage["total_tokens"] / wall_time, 1) if wall_time else None,
+                # Sum of per-book times over batch wall time: the speedup from running books concurrently
+                "concurrency_gain": round(book_time / wall_time, 2) if wall_time else None
+            },
+            "token_usage": usage,
+            "provider_health": self.llm_provider.router.stats(),
+            "results": self.results
+        }
@@ -0,0 +1,313 @@
+"""
+Budget Controller
+Tracks a run's token and currency spend live from provider usage data,
+degrades the run in defined steps when it is projected to exceed its budget,
+and refuses calls that could take it over the budget.
+"""
+import math
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from .usage_tracker import UsageTracker, CallRefused
+
+logger = logging.getLogger(__name__)
+
+# Degradation steps, cheapest in quality first
+DEGRADATION_STEPS = ["skip_interim_checks", "economy_models", "fewer_reviews"]
+
+# Share of a typical run's spend and time in each phase, used to project the total
+DEFAULT_PHASE_WEIGHTS = {
+    "planning": 0.05,
+    "creation": 0.45,
+    "refinement": 0.35,
+    "qa": 0.10,
+    "publishing": 0.05
+}
+
+class BudgetExceeded(CallRefused):
+    """Raised when a call could take the run over its token or cost budget"""
+    pass
+
+class BudgetController(UsageTracker):
+    """
+    Usage tracker that enforces a token and currency budget
+    
+    Every call of the run is recorded here. Before a call is sent, its worst
+    case (prompt estimate plus max_tokens) is reserved, and the call is
+    refused if the spend plus all reservations could exceed the budget, so
+    the budget is never silently overshot.
+    """
+    
+    def __init__(self, settings: Dict[str, Any], model_name: Optional[Callable[[str], str]] = None,
+                 on_degrade: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the controller
+        
+        Args:
+            settings: system_settings.budget (max_tokens, max_cost, target_minutes,
+                prices, economy_provider, degrade_at, phase_weights, steps)
+            model_name: Returns the model a provider uses, for looking up prices
+            on_degrade: Called with each degradation step as it is applied
+        """
+        super().__init__()
+        self.max_tokens = settings.get("max_tokens")
+        self.max_cost = settings.get("max_cost")
+        self.currency = settings.get("currency", "USD")
+        self.target_seconds = settings["target_minutes"] * 60 if settings.get("target_minutes") else None
+        # Prices per 1,000 tokens keyed by "provider/model" or "provider"
+        self.prices = settings.get("prices", {})
+        self.economy_provider = settings.get("economy_provider")
+        # Reviews dropped by the fewer_reviews step
+        self.optional_reviews = settings.get("optional_reviews", ["style", "pacing"])
+        # Degrade once the projection exceeds this share of the budget
+        self.degrade_at = settings.get("degrade_at", 0.9)
+        self.phase_weights = {**DEFAULT_PHASE_WEIGHTS, **settings.get("phase_weights", {})}
+        self.steps = [step for step in settings.get("steps", DEGRADATION_STEPS) if step in DEGRADATION_STEPS]
+        if not self.economy_provider and "economy_models" in self.steps:
+            self.steps.remove("economy_models")
+        
+        self.model_name = model_name or (lambda provider: provider)
+        self.on_degrade = on_degrade
+        self.cost = 0.0
+        self.refused_calls = 0
+        # Calls that used more tokens than they reserved
+        self.overruns = 0
+        self.applied: List[Dict[str, Any]] = []
+        self._reserved_tokens = 0
+        self._reserved_cost = 0.0
+        # Reservations of calls in flight, released in the amount they reserved
+        self._reservations: Dict[Tuple[str, int, int], List[Tuple[int, float]]] = {}
+        # Largest ratio of used to reserved tokens seen so far; later
+        # reservations are scaled by it so they cover similar overruns
+        self._margin = 1.0
+        self._progress: Dict[str, float] = {}
+        self._started = time.monotonic()
+        self._budget_lock = threading.RLock()
+        
+        if self.max_cost is not None and not self.prices:
+            logger.warning("A cost budget is set without prices; cost is counted as 0")
+    
+    @staticmethod
+    def from_config(config: Dict[str, Any], model_name: Optional[Callable[[str], str]] = None,
+                    on_degrade: Optional[Callable[[str], None]] = None) -> Optional["BudgetController"]:
+        """
+        Create a controller if the configuration declares a budget
+        
+        Args:
+            config: Configuration dictionary
+            model_name: Returns the model a provider uses
+            on_degrade: Called with each degradation step as it is applied
+        
+        Returns:
+            The controller, or None without a budget
+        """
+        settings = config.get("system_settings", {}).get("budget", {})
+        if not any(settings.get(key) for key in ("max_tokens", "max_cost", "target_minutes")):
+            return None
+        return BudgetController(settings, model_name, on_degrade)
+    
+    def _price(self, provider: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """Return the cost of a call"""
+        price = self.prices.get(f"{provider}/{self.model_name(provider)}", self.prices.get(provider, {}))
+        return (prompt_tokens * price.get("prompt", 0) + completion_tokens * price.get("completion", 0)) / 1000
+    
+    def reserve(self, provider: str, prompt_tokens: int, max_tokens: int) -> None:
+        """
+        Reserve the worst-case usage of a call before it is sent
+        
+        The worst case is scaled up by the largest overrun seen so far, so
+        calls that used more than they reserved do not let later calls take
+        the run over its budget.
+        
+        Args:
+            provider: Provider the call goes to
+            prompt_tokens: Estimated prompt tokens
+            max_tokens: Maximum completion tokens
+        
+        Raises:
+            BudgetExceeded: If the call could take the run over its budget
+        """
+        with self._budget_lock:
+            tokens = math.ceil((prompt_tokens + max_tokens) * self._margin)
+            cost = self._price(provider, prompt_tokens, max_tokens) * self._margin
+            error = None
+            spent_tokens = self.totals["total_tokens"] + self._reserved_tokens
+            spent_cost = self.cost + self._reserved_cost
+            if self.max_tokens is not None and spent_tokens + tokens > self.max_tokens:
+                error = (f"Token budget of {self.max_tokens} would be exceeded: {self.totals['total_tokens']} used, "
+                         f"{self._reserved_tokens} reserved by calls in flight, next call may need {tokens}")
+            elif self.max_cost is not None and spent_cost + cost > self.max_cost:
+                error = (f"Cost budget of {self.max_cost:.2f} {self.currency} would be exceeded: "
+                         f"{self.cost:.4f} spent, {self._reserved_cost:.4f} reserved, next call may cost {cost:.4f}")
+            if error is not None:
+                self.refused_calls += 1
+                logger.error(f"Budget: refusing {provider} call. {error}")
+                raise BudgetExceeded(error)
+            self._reserved_tokens += tokens
+            self._reserved_cost += cost
+            self._reservations.setdefault((provider, prompt_tokens, max_tokens), []).append((tokens, cost))
+    
+    def release(self, provider: str, prompt_tokens: int, max_tokens: int) -> None:
+        """Release a reservation once its call has finished or failed"""
+        with self._budget_lock:
+            key = (provider, prompt_tokens, max_tokens)
+            tokens, cost = self._reservations[key].pop()
+            if not self._reservations[key]:
+                del self._reservations[key]
+            self._reserved_tokens -= tokens
+            self._reserved_cost -= cost
+    
+    def record(self, usage: Dict[str, Any], tags: Dict[str, Any]) -> None:
+        """
+        Record a call's usage and its cost, then re-evaluate the projection
+        
+        A call that used more tokens than it reserved means the prompt was
+        underestimated, so concurrent calls may have been let through past
+        the budget; this is logged and later reservations are enlarged to
+        match. A budget that has been overshot is logged as well.
+        """
+        super().record(usage, tags)
+        provider = tags.get("provider", "")
+        cost = self._price(provider, usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0)
+        used = usage.get("total_tokens", 0) or 0
+        reserved = usage.get("reserved_tokens")
+        with self._budget_lock:
+            self.cost += cost
+            if reserved is not None and used > reserved:
+                self.overruns += 1
+                self._margin = max(self._margin, used / reserved)
+                logger.warning(f"Budget: {provider} call used {used} tokens, {used - reserved} more than it reserved")
+            if self.max_tokens is not None and self.totals["total_tokens"] > self.max_tokens:
+                logger.error(f"Budget: token budget of {self.max_tokens} exceeded, "
+                             f"{self.totals['total_tokens']} tokens used")
+            elif self.max_cost is not None and self.cost > self.max_cost:
+                logger.error(f"Budget: cost budget of {self.max_cost:.2f} {self.currency} exceeded, "
+                             f"{self.cost:.4f} spent")
+        self._evaluate()
+    
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        """
+        Continue from the report of an earlier attempt of the run
+        
+        Args:
+            state: Output of report()
+        """
+        applied = []
+        with self._budget_lock:
+            self.cost = state.get("cost", 0.0)
+            self._progress.update(state.get("phase_progress", {}))
+            for entry in state.get("applied", []):
+                if entry["step"] not in self.active_steps():
+                    self._apply(entry["step"], entry.get("reason", "restored"))
+                    applied.append(entry["step"])
+        self._notify(applied)
+    
+    def update_progress(self, phase: str, fraction: float) -> None:
+        """
+        Report how far a phase has progressed
+        
+        Args:
+            phase: Workflow phase
+            fraction: Completed share of the phase (0 to 1)
+        """
+        with self._budget_lock:
+            self._progress[phase] = max(self._progress.get(phase, 0.0), min(fraction, 1.0))
+        self._evaluate()
+    
+    def progress(self) -> float:
+        """Return the estimated completed share of the run"""
+        with self._budget_lock:
+            total_weight = sum(self.phase_weights.values()) or 1.0
+            done = sum(weight * self._progress.get(phase, 0.0) for phase, weight in self.phase_weights.items())
+            return done / total_weight
+    
+    def projection(self) -> Dict[str, Optional[float]]:
+        """
+        Project the run's total tokens, cost and duration from its progress so far
+        
+        Returns:
+            Dictionary with projected tokens, cost and seconds (None until
+            enough of the run is done to extrapolate)
+        """
+        progress = self.progress()
+        if progress < 0.05:
+            return {"tokens": None, "cost": None, "seconds": None}
+        return {
+            "tokens": self.totals["total_tokens"] / progress,
+            "cost": self.cost / progress,
+            "seconds": (time.monotonic() - self._started) / progress
+        }
+    
+    def _evaluate(self) -> None:
+        """Apply the next degradation step if the run is projected to exceed its budget"""
+        projection = self.projection()
+        reasons = []
+        if self.max_tokens and projection["tokens"] and projection["tokens"] > self.max_tokens * self.degrade_at:
+            reasons.append(f"projected {projection['tokens']:.0f} of {self.max_tokens} tokens")
+        if self.max_cost and projection["cost"] and projection["cost"] > self.max_cost * self.degrade_at:
+            reasons.append(f"projected {projection['cost']:.2f} of {self.max_cost:.2f} {self.currency}")
+        if self.target_seconds and projection["seconds"] and projection["seconds"] > self.target_seconds:
+            reasons.append(f"projected {projection['seconds'] / 60:.1f} of {self.target_seconds / 60:.1f} minutes")
+        if not reasons:
+            return
+        
+        with self._budget_lock:
+            # One step per progress update, so each step has a chance to take effect
+            progress = self.progress()
+            if self.applied and self.applied[-1]["progress"] >= progress:
+                return
+            remaining = [step for step in self.steps if step not in self.active_steps()]
+            if not remaining:
+                return
+            self._apply(remaining[0], "; ".join(reasons))
+        self._notify(remaining[:1])
+    
+    def _apply(self, step: str, reason: str) -> None:
+        """Record a degradation step"""
+        self.applied.append({
+            "step": step,
+            "reason": reason,
+            "progress": round(self.progress(), 3),
+            "time": datetime.now().isoformat()
+        })
+        logger.warning(f"Budget: applying '{step}' ({reason})")
+    
+    def _notify(self, steps: List[str]) -> None:
+        """
+        Tell the run about newly applied steps
+        
+        Called without holding the budget lock, since the run takes its own
+        locks to apply a step and reads the budget while holding them.
+        """
+        if self.on_degrade is not None:
+            for step in steps:
+                self.on_degrade(step)
+    
+    def active_steps(self) -> List[str]:
+        """Return the degradation steps applied so far"""
+        return [entry["step"] for entry in self.applied]
+    
+    def is_active(self, step: str) -> bool:
+        """Check whether a degradation step has been applied"""
+        return step in self.active_steps()
+    
+    def report(self) -> Dict[str, Any]:
+        """Return a JSON-serializable summary of the budget and the spend against it"""
+        projection = self.projection()
+        return {
+            "max_tokens": self.max_tokens,
+            "max_cost": self.max_cost,
+            "currency": self.currency,
+            "target_minutes": self.target_seconds / 60 if self.target_seconds else None,
+            "tokens": self.totals["total_tokens"],
+            "cost": round(self.cost, 6),
+            "refused_calls": self.refused_calls,
+            "overruns": self.overruns,
+            "progress": round(self.progress(), 3),
+            "phase_progress": dict(self._progress),
+            "projected_tokens": round(projection["tokens"]) if projection["tokens"] else None,
+            "projected_cost": round(projection["cost"], 6) if projection["cost"] else None,
+            "applied": list(self.applied)
+        }
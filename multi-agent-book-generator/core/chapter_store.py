@@ -0,0 +1,298 @@
+"""
+Chapter Store
+Versioned on-disk storage of chapter text backed by SQLite. Every revision of
+a chapter is kept, stored as a compressed diff against the revision before it,
+and only a bounded number of recently used chapters is held in memory.
+"""
+import os
+import json
+import zlib
+import sqlite3
+import difflib
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable, Union
+
+logger = logging.getLogger(__name__)
+
+class ChapterStore:
+    """SQLite-backed store of chapter revisions with an LRU cache of chapter text"""
+    
+    # At most this many revisions in a row are stored as diffs before one is
+    # stored in full, which bounds the work of loading a revision
+    SNAPSHOT_INTERVAL = 8
+    
+    def __init__(self, path: str, cache_size: int = 16):
+        """
+        Open or create the store
+        
+        Args:
+            path: Path of the SQLite database file, or ":memory:"
+            cache_size: Number of chapter texts kept in memory
+        """
+        self.path = path
+        self.cache_size = max(1, cache_size)
+        self._cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS revisions (
+                chapter INTEGER NOT NULL,
+                revision INTEGER NOT NULL,
+                stage TEXT,
+                digest TEXT NOT NULL,
+                base INTEGER,
+                depth INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                length INTEGER NOT NULL,
+                created TEXT NOT NULL,
+                PRIMARY KEY (chapter, revision)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS revisions_digest ON revisions (chapter, digest)")
+    
+    def save(self, chapter_num: int, text: str, stage: Optional[str] = None) -> int:
+        """
+        Store a revision of a chapter
+        
+        Text identical to an earlier revision of the chapter is not stored
+        again; that revision is returned instead, so equal text always maps
+        to the same revision.
+        
+        Args:
+            chapter_num: Chapter number (1-based)
+            text: The chapter text
+            stage: What produced the revision (e.g. "draft", "refinement")
+        
+        Returns:
+            The revision number
+        """
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT revision FROM revisions WHERE chapter = ? AND digest = ? ORDER BY revision LIMIT 1",
+                (chapter_num, digest)
+            ).fetchone()
+            if row is not None:
+                return row[0]
+            
+            latest = self._conn.execute(
+                "SELECT revision, depth FROM revisions WHERE chapter = ? ORDER BY revision DESC LIMIT 1",
+                (chapter_num,)
+            ).fetchone()
+            revision = latest[0] + 1 if latest else 1
+            base, depth = None, 0
+            data = zlib.compress(text.encode("utf-8"))
+            if latest is not None and latest[1] < self.SNAPSHOT_INTERVAL:
+                # Store a diff against the latest revision when it is smaller
+                diff = zlib.compress(json.dumps(_diff(self._load(chapter_num, latest[0]), text)).encode("utf-8"))
+                if len(diff) < len(data):
+                    base, depth, data = latest[0], latest[1] + 1, diff
+            
+            self._conn.execute(
+                "INSERT INTO revisions (chapter, revision, stage, digest, base, depth, data, length, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (chapter_num, revision, stage, digest, base, depth, data, len(text), datetime.now().isoformat())
+            )
+            self._remember((chapter_num, revision), text)
+            return revision
+    
+    def load(self, chapter_num: int, revision: Optional[int] = None) -> str:
+        """
+        Return the text of a chapter revision
+        
+        Args:
+            chapter_num: Chapter number (1-based)
+            revision: Revision number (the latest if omitted)
+        
+        Returns:
+            The chapter text
+        
+        Raises:
+            KeyError: If the chapter or revision does not exist
+        """
+        with self._lock:
+            if revision is None:
+                row = self._conn.execute("SELECT MAX(revision) FROM revisions WHERE chapter = ?",
+                                         (chapter_num,)).fetchone()
+                revision = row[0]
+                if revision is None:
+                    raise KeyError(f"Chapter {chapter_num} has no revisions")
+            return self._load(chapter_num, revision)
+    
+    def has(self, chapter_num: int, revision: int) -> bool:
+        """Check whether a chapter revision exists"""
+        with self._lock:
+            if (chapter_num, revision) in self._cache:
+                return True
+            return self._conn.execute("SELECT 1 FROM revisions WHERE chapter = ? AND revision = ?",
+                                      (chapter_num, revision)).fetchone() is not None
+    
+    def _load(self, chapter_num: int, revision: int) -> str:
+        """Return a revision's text from the cache or by replaying diffs from the nearest full revision"""
+        key = (chapter_num, revision)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        
+        row = self._conn.execute("SELECT base, data FROM revisions WHERE chapter = ? AND revision = ?",
+                                 key).fetchone()
+        if row is None:
+            raise KeyError(f"Chapter {chapter_num} has no revision {revision}")
+        base, data = row
+        if base is None:
+            text = zlib.decompress(data).decode("utf-8")
+        else:
+            text = _patch(self._load(chapter_num, base), json.loads(zlib.decompress(data)))
+        self._remember(key, text)
+        return text
+    
+    def _remember(self, key: tuple, text: str) -> None:
+        """Add a chapter text to the cache, evicting the least recently used one"""
+        self._cache[key] = text
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    def history(self, chapter_num: int) -> List[Dict[str, Any]]:
+        """
+        List the revisions of a chapter, oldest first
+        
+        Args:
+            chapter_num: Chapter number (1-based)
+        
+        Returns:
+            Revision number, stage, creation time, length of the text and
+            stored size of each revision
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT revision, stage, created, length, LENGTH(data) FROM revisions "
+                "WHERE chapter = ? ORDER BY revision", (chapter_num,)
+            ).fetchall()
+        return [{"revision": revision, "stage": stage, "created": created, "length": length, "stored_bytes": stored}
+                for revision, stage, created, length, stored in rows]
+    
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+def _diff(old: str, new: str) -> List[Any]:
+    """
+    Compute line-level edit operations that turn one text into another
+    
+    Returns:
+        A list of operations: a number keeps that many lines of the old text,
+        a negative number skips them, and a list of strings inserts lines
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    operations = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes():
+        if tag == "equal":
+            operations.append(i2 - i1)
+            continue
+        if i2 > i1:
+            operations.append(i1 - i2)
+        if j2 > j1:
+            operations.append(new_lines[j1:j2])
+    return operations
+
+def _patch(old: str, operations: List[Any]) -> str:
+    """Apply operations from _diff to the old text"""
+    old_lines = old.splitlines(keepends=True)
+    position = 0
+    parts = []
+    for operation in operations:
+        if isinstance(operation, list):
+            parts.extend(operation)
+        elif operation >= 0:
+            parts.extend(old_lines[position:position + operation])
+            position += operation
+        else:
+            position -= operation
+    return "".join(parts)
+
+class ChapterSequence(Sequence):
+    """
+    The chapters of a book as references to revisions in a ChapterStore
+    
+    Behaves like a read-only list of chapter texts, loading each chapter from
+    the store when it is accessed. Slices are sequences too, so passing part
+    of a book around does not load it. Chapters are changed with append()
+    and set(), which store a new revision.
+    """
+    
+    def __init__(self, store: ChapterStore, refs: Iterable[Iterable[int]] = ()):
+        """
+        Initialize the sequence
+        
+        Args:
+            store: Store holding the chapter revisions
+            refs: [chapter number, revision] of each chapter, in order
+        """
+        self.store = store
+        self.refs = [[int(chapter_num), int(revision)] for chapter_num, revision in refs]
+    
+    @classmethod
+    def from_texts(cls, store: ChapterStore, chapters: Iterable[str], stage: Optional[str] = None) -> "ChapterSequence":
+        """
+        Store a list of chapter texts as a sequence
+        
+        Args:
+            store: Store to save the chapters in
+            chapters: Chapter texts, in order
+            stage: What produced the texts
+        
+        Returns:
+            The sequence
+        """
+        sequence = cls(store)
+        for chapter in chapters:
+            sequence.append(chapter, stage)
+        return sequence
+    
+    def __len__(self) -> int:
+        return len(self.refs)
+    
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, "ChapterSequence"]:
+        if isinstance(index, slice):
+            return ChapterSequence(self.store, self.refs[index])
+        chapter_num, revision = self.refs[index]
+        return self.store.load(chapter_num, revision)
+    
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, ChapterSequence):
+            return self.store is other.store and self.refs == other.refs
+        if isinstance(other, list):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+    
+    def __repr__(self) -> str:
+        # Equal text maps to the same revision, so this also identifies the
+        # content, e.g. in task fingerprints
+        return f"ChapterSequence({self.refs})"
+    
+    def append(self, text: str, stage: Optional[str] = None) -> None:
+        """Add the next chapter of the book"""
+        chapter_num = self.refs[-1][0] + 1 if self.refs else 1
+        self.refs.append([chapter_num, self.store.save(chapter_num, text, stage)])
+    
+    def set(self, index: int, text: str, stage: Optional[str] = None) -> None:
+        """Replace a chapter with a new revision"""
+        chapter_num = self.refs[index][0]
+        self.refs[index] = [chapter_num, self.store.save(chapter_num, text, stage)]
+    
+    def copy(self) -> "ChapterSequence":
+        """Return a sequence that keeps the current revisions when this one changes"""
+        return ChapterSequence(self.store, self.refs)
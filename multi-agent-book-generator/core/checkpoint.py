@@ -0,0 +1,85 @@
+"""
+Checkpoint Store
+Crash-safe persistence of a book run's state, so an interrupted run can be
+resumed from its last completed chapter or review step.
+"""
+import os
+import json
+import logging
+import tempfile
+import threading
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+class CheckpointStore:
+    """Atomically writes and reads the checkpoint file of a run directory"""
+    
+    FILENAME = "checkpoint.json"
+    
+    def __init__(self, run_dir: str):
+        """
+        Initialize the store
+        
+        Args:
+            run_dir: Output directory of the run
+        """
+        self.run_dir = run_dir
+        self.path = os.path.join(run_dir, self.FILENAME)
+        self._lock = threading.Lock()
+    
+    def save(self, state: Dict[str, Any]) -> None:
+        """
+        Write the checkpoint atomically
+        
+        The state is written to a temporary file in the same directory, flushed
+        to disk and then renamed over the previous checkpoint, so a crash at any
+        point leaves either the old or the new checkpoint intact.
+        
+        The dictionaries and lists in the state are copied before it is
+        encoded, so task threads may keep changing them while it is written.
+        
+        Args:
+            state: JSON-serializable run state
+        """
+        with self._lock:
+            data = json.dumps(_snapshot(state), indent=2)
+            os.makedirs(self.run_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(prefix=".checkpoint_", suffix=".tmp", dir=self.run_dir)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+    
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Read the checkpoint
+        
+        Returns:
+            The saved state, or None if the run directory has no checkpoint
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r") as f:
+            state = json.load(f)
+        logger.info(f"Loaded checkpoint from {self.path}")
+        return state
+
+def _snapshot(value: Any) -> Any:
+    """
+    Copy the dictionaries and lists nested in a value
+    
+    Each container is copied in one step before it is walked, so a key added
+    by another thread cannot change it during the walk.
+    """
+    if isinstance(value, dict):
+        return {key: _snapshot(item) for key, item in value.copy().items()}
+    if isinstance(value, list):
+        return [_snapshot(item) for item in value.copy()]
+    return value
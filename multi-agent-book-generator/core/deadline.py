@@ -0,0 +1,76 @@
+"""
+Deadline
+Run-level deadlines that bound every LLM and HTTP call made while they are active.
+"""
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+# Absolute time.monotonic() deadline for the code currently running
+_deadline = contextvars.ContextVar("run_deadline", default=None)
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call cannot start or finish before the run deadline"""
+    pass
+
+@contextmanager
+def deadline_context(seconds: Optional[float]):
+    """
+    Bound everything inside this block by a deadline
+    
+    Nested deadlines can only shorten the enclosing one.
+    
+    Args:
+        seconds: Time budget from now, or None for no additional limit
+    """
+    deadline = _deadline.get()
+    if seconds is not None:
+        new_deadline = time.monotonic() + seconds
+        deadline = new_deadline if deadline is None else min(deadline, new_deadline)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def current_deadline() -> Optional[float]:
+    """Return the active deadline as a time.monotonic() value, or None"""
+    return _deadline.get()
+
+def remaining_time(deadline: Optional[float] = None) -> Optional[float]:
+    """
+    Return the seconds left before a deadline
+    
+    Args:
+        deadline: Absolute monotonic deadline (defaults to the active one)
+    
+    Returns:
+        Seconds remaining (may be negative), or None without a deadline
+    """
+    if deadline is None:
+        deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def call_timeout(timeout: Optional[float], deadline: Optional[float] = None) -> Optional[float]:
+    """
+    Clamp a per-call timeout to the time left before the deadline
+    
+    Args:
+        timeout: The call's own timeout in seconds, or None for no limit
+        deadline: Absolute monotonic deadline (defaults to the active one)
+    
+    Returns:
+        The timeout to use, or None if neither limit applies
+    
+    Raises:
+        DeadlineExceeded: If the deadline has already passed
+    """
+    remaining = remaining_time(deadline)
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceeded("Run deadline exceeded")
+    return remaining if timeout is None else min(timeout, remaining)
@@ -0,0 +1,215 @@
+"""
+Job Queue
+Persistent queue of book jobs in a SQLite database, shared by the workers of
+the book generation service. Jobs survive restarts of the service.
+"""
+import json
+import uuid
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job states; queued and running jobs are active, the others are final
+JOB_STATES = ("queued", "running", "completed", "failed", "cancelled")
+
+class JobExistsError(ValueError):
+    """Raised when a job is submitted with the ID of an existing job"""
+    pass
+
+class JobQueue:
+    """SQLite-backed queue of book jobs"""
+    
+    def __init__(self, db_path: str):
+        """
+        Open or create the queue
+        
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                output_directory TEXT NOT NULL,
+                submitted TEXT NOT NULL,
+                started TEXT,
+                finished TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                result TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submitted)")
+    
+    def _row(self, row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        """Convert a database row to a job dictionary"""
+        if row is None:
+            return None
+        job = dict(row)
+        job["settings"] = json.loads(job["settings"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+    
+    def submit(self, settings: Dict[str, Any], output_directory: str, job_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Add a job to the end of the queue
+        
+        Args:
+            settings: The book's settings, merged over the service configuration
+            output_directory: Output directory of the book
+            job_id: Job ID (generated if omitted)
+        
+        Returns:
+            The queued job
+        
+        Raises:
+            JobExistsError: If a job with this ID already exists
+        """
+        job_id = job_id or uuid.uuid4().hex[:12]
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO jobs (id, status, settings, output_directory, submitted) VALUES (?, 'queued', ?, ?, ?)",
+                    (job_id, json.dumps(settings), output_directory, datetime.now().isoformat())
+                )
+            except sqlite3.IntegrityError:
+                raise JobExistsError(f"Job {job_id} already exists")
+            return self._row(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job, or None if it does not exist"""
+        with self._lock:
+            return self._row(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+    
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        List jobs, most recently submitted first
+        
+        Args:
+            status: Only list jobs in this state
+            limit: Maximum number of jobs
+        
+        Returns:
+            List of jobs
+        """
+        query = "SELECT * FROM jobs"
+        params: List[Any] = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY submitted DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [self._row(row) for row in self._conn.execute(query, params).fetchall()]
+    
+    def counts(self) -> Dict[str, int]:
+        """Return the number of jobs in each state"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {state: 0 for state in JOB_STATES}
+        counts.update({status: count for status, count in rows})
+        return counts
+    
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Take the oldest queued job and mark it running
+        
+        Returns:
+            The claimed job, or None if the queue is empty
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY submitted LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', started = ?, attempts = attempts + 1 WHERE id = ?",
+                    (datetime.now().isoformat(), row["id"])
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._row(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+    
+    def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None) -> None:
+        """
+        Record the outcome of a running job
+        
+        Args:
+            job_id: Job ID
+            status: "completed", "failed" or "cancelled"
+            result: Summary of the generated book
+            error: Error message of a failed job
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished = ?, result = ?, error = ? WHERE id = ?",
+                (status, datetime.now().isoformat(), json.dumps(result) if result is not None else None, error, job_id)
+            )
+    
+    def request_cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a job
+        
+        A queued job is cancelled at once; a running job is flagged and stops
+        before its next LLM call.
+        
+        Args:
+            job_id: Job ID
+        
+        Returns:
+            The updated job, or None if it does not exist
+        """
+        with self._lock:
+            now = datetime.now().isoformat()
+            self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ?, cancel_requested = 1 "
+                "WHERE id = ? AND status = 'queued'", (now, job_id)
+            )
+            self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,)
+            )
+            return self._row(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+    
+    def requeue_interrupted(self) -> int:
+        """
+        Put jobs left running by a stopped service back in the queue
+        
+        Their runs continue from the checkpoint in their output directory.
+        Jobs whose cancellation was requested are marked cancelled instead.
+        
+        Returns:
+            Number of requeued jobs
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ? WHERE status = 'running' AND cancel_requested = 1",
+                (datetime.now().isoformat(),)
+            )
+            requeued = self._conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'").rowcount
+        if requeued:
+            logger.info(f"Requeued {requeued} jobs interrupted by a previous shutdown")
+        return requeued
+    
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
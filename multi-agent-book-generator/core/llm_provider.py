@@ -6,13 +6,28 @@ with rate limiting and error handling.
 import os
 import time
 import random
+import asyncio
 import logging
-from typing import Dict, Any, Optional, Union
+import threading
+import queue
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Any, Optional, Union, Callable, Iterator, Tuple
+from .response_cache import ResponseCache
+from .rate_limiter import RateLimiter
+from .usage_tracker import UsageTracker, CallRefused, capture_usage_context, empty_usage
+from .provider_router import ProviderRouter
+from .deadline import DeadlineExceeded, current_deadline, remaining_time, call_timeout
+from .mock_provider import MockLLMClient
+from utils.text_processing import get_token_counter
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+class ProviderUnavailableError(Exception):
+    """Raised when a provider cannot serve a request without being called"""
+    pass
+
 class LLMProvider:
     """Interface for LLM providers with unified API access"""
     
@@ -25,6 +40,38 @@ class LLMProvider:
         """
         self.config = config
         self.providers = {}
+        
+        # All provider calls run on a private event loop so that sync and async
+        # callers from any thread share the same clients and concurrency limits
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+        self._global_semaphore = None
+        self._provider_semaphores = {}
+        
+        concurrency_config = config.get("llm_settings", {}).get("concurrency", {})
+        self.max_concurrent_requests = concurrency_config.get("max_concurrent_requests", 16)
+        self.per_provider_limits = concurrency_config.get("per_provider", {})
+        
+        # Optional persistent response cache
+        self.cache = ResponseCache.from_config(config)
+        
+        # Counts prompt tokens for budget and rate limit reservations
+        self.count_tokens = get_token_counter(config.get("llm_settings", {}).get("tokenizer"))
+        
+        # Proactive RPM/TPM limits shared by every caller of this provider
+        self.rate_limiter = RateLimiter(config, self.count_tokens)
+        
+        # Token usage across every call made through this provider
+        self.usage_tracker = UsageTracker()
+        
+        # Rolling provider health used for circuit breaking and hedged requests
+        self.router = ProviderRouter(config)
+        
+        # Identical requests in flight at the same time share one upstream call
+        self.coalesce_requests = config.get("llm_settings", {}).get("coalesce_requests", True)
+        self._inflight = {}
+        
         self._setup_providers()
         
     def _setup_providers(self):
@@ -32,9 +79,9 @@ class LLMProvider:
         # Check for OpenAI
         if os.getenv("OPENAI_API_KEY"):
             try:
-                from openai import OpenAI
+                from openai import AsyncOpenAI
                 self.providers["openai"] = {
-                    "client": OpenAI(api_key=os.getenv("OPENAI_API_KEY")),
+                    "client": AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")),
                     "initialized": True
                 }
                 logger.info("OpenAI provider initialized")
@@ -74,117 +121,806 @@ class LLMProvider:
         else:
             logger.warning("GOOGLE_GEMINI_API_KEY environment variable not found")
             self.providers["gemini"] = {"initialized": False}
+        
+        # Offline mock provider, only set up when explicitly requested so it can
+        # never become a silent fallback for a real provider
+        llm_settings = self.config.get("llm_settings", {})
+        mock_config = llm_settings.get("providers", {}).get("mock", {})
+        if llm_settings.get("default_provider") == "mock" or mock_config.get("enabled", False):
+            self.providers["mock"] = {
+                "client": MockLLMClient(mock_config),
+                "initialized": True
+            }
+            logger.info("Mock provider initialized (no network calls will be made by it)")
     
     def generate_text(self, prompt: str, 
                       provider: Optional[str] = None, 
                       max_tokens: Optional[int] = None, 
-                      temperature: Optional[float] = None) -> str:
+                      temperature: Optional[float] = None,
+                      timeout: Optional[float] = None) -> str:
         """
         Generate text using the specified or default LLM provider
         
+        Blocking wrapper around agenerate_text; safe to call from any thread
+        that is not the provider's own event loop.
+        
         Args:
             prompt: The input prompt for text generation
-            provider: The LLM provider to use ('openai' or 'gemini')
+            provider: The LLM provider to use ('openai', 'gemini' or 'mock')
             max_tokens: Maximum number of tokens to generate
             temperature: Controls randomness in generation
+            timeout: Per-attempt timeout in seconds (defaults to llm_settings.timeouts)
             
         Returns:
             The generated text
             
         Raises:
+            DeadlineExceeded: If the active run deadline passes first
+            Exception: If all providers fail or none are available
+        """
+        return self._run_sync(self._agenerate_text(
+            prompt=prompt,
+            provider=provider,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=timeout,
+            deadline=current_deadline(),
+            attribution=capture_usage_context()
+        ))
+    
+    async def agenerate_text(self, prompt: str,
+                             provider: Optional[str] = None,
+                             max_tokens: Optional[int] = None,
+                             temperature: Optional[float] = None,
+                             timeout: Optional[float] = None) -> str:
+        """
+        Generate text asynchronously using the specified or default LLM provider
+        
+        Calls are bounded by the global and per-provider concurrency limits
+        configured in llm_settings.concurrency, so callers may issue many
+        requests at once with asyncio.gather.
+        
+        Args:
+            prompt: The input prompt for text generation
+            provider: The LLM provider to use ('openai', 'gemini' or 'mock')
+            max_tokens: Maximum number of tokens to generate
+            temperature: Controls randomness in generation
+            timeout: Per-attempt timeout in seconds (defaults to llm_settings.timeouts)
+        
+        Returns:
+            The generated text
+        
+        Raises:
+            DeadlineExceeded: If the active run deadline passes first
             Exception: If all providers fail or none are available
         """
+        return await self._run_async(self._agenerate_text(
+            prompt=prompt,
+            provider=provider,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=timeout,
+            deadline=current_deadline(),
+            attribution=capture_usage_context()
+        ))
+    
+    def stream_text(self, prompt: str,
+                    provider: Optional[str] = None,
+                    max_tokens: Optional[int] = None,
+                    temperature: Optional[float] = None,
+                    timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Stream generated text as it arrives from the provider
+        
+        Retries and provider fallback apply until the first chunk has been
+        delivered; an error after that is raised to the consumer, which already
+        holds the partial output and can continue from it.
+        
+        Args:
+            prompt: The input prompt for text generation
+            provider: The LLM provider to use ('openai', 'gemini' or 'mock')
+            max_tokens: Maximum number of tokens to generate
+            temperature: Controls randomness in generation
+            timeout: Per-attempt timeout in seconds (defaults to llm_settings.timeouts)
+        
+        Returns:
+            Iterator over text chunks in generation order
+        
+        Raises:
+            Exception: If all providers fail or the stream is interrupted
+        """
+        # Start the request now so usage is attributed to the caller's context
+        chunks = queue.Queue()
+        future = self._submit(self._agenerate_text(
+            prompt=prompt,
+            provider=provider,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            on_chunk=chunks.put,
+            timeout=timeout,
+            deadline=current_deadline(),
+            attribution=capture_usage_context()
+        ))
+        future.add_done_callback(lambda _: chunks.put(None))
+        return self._iterate_stream(chunks, future)
+        
+    def _iterate_stream(self, chunks: queue.Queue, future) -> Iterator[str]:
+        """Yield chunks produced on the provider loop until the request finishes"""
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    break
+                yield chunk
+            # Surface any error raised by the producer
+            future.result()
+        finally:
+            if not future.done():
+                future.cancel()
+    
+    async def _agenerate_text(self, prompt: str,
+                              provider: Optional[str] = None,
+                              max_tokens: Optional[int] = None,
+                              temperature: Optional[float] = None,
+                              on_chunk: Optional[Callable[[str], None]] = None,
+                              timeout: Optional[float] = None,
+                              deadline: Optional[float] = None,
+                              attribution: Optional[Tuple[Dict[str, Any], tuple]] = None) -> str:
+        """
+        Generate text on the provider event loop, coalescing identical requests
+        
+        A request with the same provider, prompt, max_tokens and temperature as
+        one already in flight waits for that call's result instead of issuing
+        its own, also across the books of a batch or the jobs of the service.
+        The shared call runs without any one caller's deadline or trackers:
+        each caller reserves against its own trackers, waits under its own
+        deadline and records the shared response's usage with its own trackers,
+        so one book's budget or cancellation never fails another's request.
+        Streams are never coalesced, and neither are requests in deterministic
+        rerun mode, where each repeat of a prompt is meant to be sampled separately.
+        """
         # Get default provider if not specified
         if provider is None or provider == "default":
             provider = self.config.get("llm_settings", {}).get("default_provider", "openai")
         
-        # Fallback chain: try specified provider, then others if it fails
+        deterministic = self.cache is not None and self.cache.deterministic_reruns
+        if on_chunk is not None or not self.coalesce_requests or deterministic:
+            return await self._agenerate_with_fallback(
+                prompt=prompt,
+                provider=provider,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                on_chunk=on_chunk,
+                timeout=timeout,
+                deadline=deadline,
+                attribution=attribution
+            )
+        
+        wait_timeout = call_timeout(None, deadline)
+        tags, trackers = attribution or ({}, ())
+        key = (provider, prompt, max_tokens, temperature)
+        entry = self._inflight.get(key)
+        owner = entry is None
+        if owner:
+            # A cached response is served directly, so it is never refused by a budget
+            _, cached_response = self._lookup_cache(provider, prompt, max_tokens, temperature, attribution)
+            if cached_response is not None:
+                self._serve_from_cache(provider, cached_response, attribution)
+                return cached_response
+        
+        with self._reservation(provider, prompt, max_tokens, trackers) as reserved_tokens:
+            if owner:
+                # The upstream call runs as its own task so that one caller giving
+                # up does not cancel it for the others; its usage is collected
+                # here and recorded by each caller
+                collector = UsageTracker()
+                task = asyncio.ensure_future(self._agenerate_with_fallback(
+                    prompt=prompt,
+                    provider=provider,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    timeout=timeout,
+                    attribution=(tags, (collector,))
+                ))
+                entry = {"task": task, "usage": collector, "waiters": 0, "claimed": False}
+                self._inflight[key] = entry
+                task.add_done_callback(lambda _, entry=entry: self._forget_inflight(key, entry))
+            else:
+                logger.info(f"Coalescing identical {provider} request with one already in flight")
+            
+            entry["waiters"] += 1
+            try:
+                text = await asyncio.wait_for(asyncio.shield(entry["task"]), wait_timeout)
+            except asyncio.TimeoutError as e:
+                if isinstance(e, DeadlineExceeded):
+                    raise
+                if owner:
+                    raise DeadlineExceeded(f"Run deadline exceeded during {provider} request")
+                raise DeadlineExceeded("Run deadline exceeded while waiting for an identical in-flight request")
+            finally:
+                entry["waiters"] -= 1
+                if entry["waiters"] == 0 and not entry["task"].done():
+                    # Unregister it now so a new caller does not join a cancelled call
+                    self._forget_inflight(key, entry)
+                    entry["task"].cancel()
+            
+            # The first caller to receive the response is charged with the call;
+            # the others record it as coalesced
+            collector = entry["usage"]
+            usage = {name: value for name, value in collector.totals.items() if name != "calls"}
+            usage["reserved_tokens"] = reserved_tokens
+            served_by = next(iter(collector.by_provider), provider)
+            tags = {**tags, "provider": served_by}
+            if entry["claimed"]:
+                usage.update({"cache_hits": 0, "coalesced": 1})
+                self.usage_tracker.record({**empty_usage(), "coalesced": 1}, tags)
+            entry["claimed"] = True
+            for tracker in trackers:
+                tracker.record(usage, tags)
+            return text
+    
+    def _forget_inflight(self, key: tuple, entry: Dict[str, Any]) -> None:
+        """Unregister an in-flight request unless a newer call has replaced it"""
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+    
+    async def _agenerate_with_fallback(self, prompt: str,
+                                       provider: str,
+                                       max_tokens: Optional[int] = None,
+                                       temperature: Optional[float] = None,
+                                       on_chunk: Optional[Callable[[str], None]] = None,
+                                       timeout: Optional[float] = None,
+                                       deadline: Optional[float] = None,
+                                       attribution: Optional[Tuple[Dict[str, Any], tuple]] = None) -> str:
+        """
+        Generate text with retries and provider fallback
+        
+        When on_chunk is given the response is streamed and each chunk is passed
+        to it as it arrives. Usage is recorded against the attribution tags and
+        trackers captured from the caller. The deadline is the caller's run
+        deadline (a time.monotonic() value), captured before switching threads.
+        """
+        # Fallback chain: try specified provider, then others if it fails,
+        # skipping ahead of providers whose circuit breaker is open
         providers_to_try = [provider]
         for p in self.providers:
             if p not in providers_to_try and self.providers[p].get("initialized", False):
                 providers_to_try.append(p)
+        providers_to_try = self.router.order(providers_to_try)
+        
+        # Remember whether any streamed text reached the consumer
+        delivered = []
+        def deliver(chunk: str) -> None:
+            delivered.append(chunk)
+            on_chunk(chunk)
         
+        request = {
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "on_chunk": deliver if on_chunk is not None else None,
+            "timeout": timeout,
+            "deadline": deadline,
+            "attribution": attribution
+        }
+        
+        # Try each provider
+        last_error = None
+        while providers_to_try:
+            remaining = remaining_time(deadline)
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceeded(f"Run deadline exceeded before any provider responded. Last error: {last_error}")
+            
+            current_provider = providers_to_try.pop(0)
+            tasks = {asyncio.ensure_future(self._generate_within_budget(current_provider, **request))}
+            
+            # Hedge a slow request with a duplicate on the next provider, keeping
+            # whichever finishes first. Streams are never hedged since their
+            # chunks are already being delivered.
+            hedge_delay = self.router.hedge_delay(current_provider) if providers_to_try and on_chunk is None else None
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done and self.router.is_available(providers_to_try[0]):
+                    hedge_provider = providers_to_try.pop(0)
+                    logger.info(f"{current_provider} exceeded its p{self.router.hedge_percentile} latency "
+                                f"of {hedge_delay:.1f}s, hedging with {hedge_provider}")
+                    tasks.add(asyncio.ensure_future(self._generate_within_budget(hedge_provider, **request)))
+            
+            try:
+                while tasks:
+                    done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        error = task.exception()
+                        if error is None:
+                            return task.result()
+                        # Falling back would duplicate text the consumer already received,
+                        # no provider can finish after the deadline, and a refused call
+                        # (budget, cancelled job) would be refused for every provider
+                        if delivered or isinstance(error, (DeadlineExceeded, CallRefused)):
+                            raise error
+                        if not isinstance(error, ProviderUnavailableError) or last_error is None:
+                            last_error = error
+            finally:
+                # Cancel the losing request of a hedged pair
+                for task in tasks:
+                    task.cancel()
+        
+        # If we get here, all providers have failed
+        raise Exception(f"All providers failed to generate text. Last error: {last_error}")
+    
+    async def _generate_within_budget(self, current_provider: str, prompt: str,
+                                      max_tokens: Optional[int], **request) -> str:
+        """
+        Serve a call from the cache, or reserve its worst-case usage with the
+        caller's trackers and generate
+        
+        A cached response costs nothing, so it is served without a reservation
+        and cannot be refused. Otherwise a tracker may refuse the call with
+        CallRefused, e.g. a budget that the call could take over its limit.
+        The reservation is released when the call finishes, since the actual
+        usage is recorded separately. Prompt tokens are counted with the
+        configured tokenizer, whose estimate errs high when no local tokenizer is set.
+        """
+        attribution = request.get("attribution")
+        cache_key, cached_response = self._lookup_cache(current_provider, prompt, max_tokens,
+                                                        request.get("temperature"), attribution)
+        if cached_response is not None:
+            self._serve_from_cache(current_provider, cached_response, attribution, request.get("on_chunk"))
+            return cached_response
+        if cache_key is not None and self.cache.replay_only:
+            raise ProviderUnavailableError(f"No cached {current_provider} response and cache is in replay-only mode")
+        
+        _, trackers = attribution or ({}, ())
+        with self._reservation(current_provider, prompt, max_tokens, trackers) as reserved_tokens:
+            return await self._generate_from_provider(current_provider, prompt, max_tokens, cache_key=cache_key,
+                                                      reserved_tokens=reserved_tokens, **request)
+    
+    @contextmanager
+    def _reservation(self, current_provider: str, prompt: str, max_tokens: Optional[int], trackers: tuple):
+        """Reserve a call's worst-case usage with each tracker for the block, yielding the reserved tokens"""
+        provider_config = self.config.get("llm_settings", {}).get("providers", {}).get(current_provider, {})
+        prompt_tokens = self.count_tokens(prompt)
+        completion_tokens = max_tokens or provider_config.get("max_tokens", 4000)
+        
+        reserved = []
+        try:
+            for tracker in trackers:
+                tracker.reserve(current_provider, prompt_tokens, completion_tokens)
+                reserved.append(tracker)
+            yield prompt_tokens + completion_tokens
+        finally:
+            for tracker in reserved:
+                tracker.release(current_provider, prompt_tokens, completion_tokens)
+    
+    def _serve_from_cache(self, current_provider: str, response: str,
+                          attribution: Optional[Tuple[Dict[str, Any], tuple]],
+                          on_chunk: Optional[Callable[[str], None]] = None) -> None:
+        """Record a cache hit and pass a cached response to the stream consumer"""
+        logger.info(f"Serving {current_provider} response from cache")
+        usage = empty_usage()
+        usage["cache_hits"] = 1
+        self._record_usage(usage, current_provider, attribution)
+        if on_chunk is not None:
+            on_chunk(response)
+    
+    def _lookup_cache(self, current_provider: str, prompt: str, max_tokens: Optional[int],
+                      temperature: Optional[float],
+                      attribution: Optional[Tuple[Dict[str, Any], tuple]]) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Look a call up in the response cache
+        
+        Returns:
+            The cache key for the call and the cached response, or (None, None)
+            without a cache
+        """
+        if self.cache is None:
+            return None, None
+        
+        provider_config = self.config.get("llm_settings", {}).get("providers", {}).get(current_provider, {})
+        # The innermost tracker belongs to the run that made the request
+        _, trackers = attribution or ({}, ())
+        cache_key = self.cache.resolve_key(self.cache.make_key(
+            current_provider,
+            self._get_model_name(current_provider),
+            prompt,
+            temperature or provider_config.get("default_temperature", 0.7),
+            max_tokens or provider_config.get("max_tokens", 4000)
+        ), trackers[-1] if trackers else None)
+        return cache_key, self.cache.get(cache_key)
+    
+    async def _generate_from_provider(self, current_provider: str, prompt: str,
+                                      max_tokens: Optional[int],
+                                      temperature: Optional[float],
+                                      on_chunk: Optional[Callable[[str], None]],
+                                      timeout: Optional[float],
+                                      deadline: Optional[float],
+                                      attribution: Optional[Tuple[Dict[str, Any], tuple]],
+                                      cache_key: Optional[str] = None,
+                                      reserved_tokens: Optional[int] = None) -> str:
+        """
+        Generate text with one provider, retrying with exponential backoff
+        
+        Retries stop early once the provider's circuit breaker opens, or when a
+        retry could not finish before the deadline, so the caller can move on
+        to the next provider.
+        
+        The response is stored in the cache under cache_key when one is given.
+        
+        Raises:
+            DeadlineExceeded: If the deadline passes
+            ProviderUnavailableError: If the provider is not initialized
+            Exception: The last error once retries are exhausted
+        """
         # Get rate limiting settings
         rate_limit_config = self.config.get("llm_settings", {}).get("rate_limit", {})
         initial_delay = rate_limit_config.get("initial_delay", 1)
         max_retries = rate_limit_config.get("max_retries", 5)
         max_delay = rate_limit_config.get("max_delay", 60)
         
-        # Try each provider
-        last_error = None
-        for current_provider in providers_to_try:
-            if not self.providers.get(current_provider, {}).get("initialized", False):
-                logger.warning(f"Provider {current_provider} not initialized, skipping")
-                continue
-                
-            # Get provider-specific settings
-            provider_config = self.config.get("llm_settings", {}).get("providers", {}).get(current_provider, {})
-            current_max_tokens = max_tokens or provider_config.get("max_tokens", 4000)
-            current_temperature = temperature or provider_config.get("default_temperature", 0.7)
-            
-            # Try with retries and exponential backoff
-            retries = 0
-            delay = initial_delay
+        # Get provider-specific settings
+        provider_config = self.config.get("llm_settings", {}).get("providers", {}).get(current_provider, {})
+        current_max_tokens = max_tokens or provider_config.get("max_tokens", 4000)
+        current_temperature = temperature or provider_config.get("default_temperature", 0.7)
+        
+        # Streams are bounded by their total duration, so they get a longer default
+        timeout_config = self.config.get("llm_settings", {}).get("timeouts", {})
+        if on_chunk is not None:
+            request_timeout = timeout or provider_config.get("stream_timeout") or timeout_config.get("stream_seconds", 600)
+        else:
+            request_timeout = timeout or provider_config.get("timeout") or timeout_config.get("request_seconds", 120)
             
-            while retries < max_retries:
+        if not self.providers.get(current_provider, {}).get("initialized", False):
+            logger.warning(f"Provider {current_provider} not initialized, skipping")
+            raise ProviderUnavailableError(f"Provider {current_provider} not initialized")
+        
+        model_name = self._get_model_name(current_provider)
+        estimated_tokens = self.rate_limiter.estimate_tokens(prompt, current_max_tokens)
+        
+        # Try with retries and exponential backoff
+        retries = 0
+        delay = initial_delay
+        
+        while True:
+            delivered = []
+            try:
+                # Queue for rate limit capacity before taking a concurrency slot
                 try:
-                    logger.info(f"Generating text with {current_provider} (attempt {retries+1}/{max_retries})")
-                    
-                    if current_provider == "openai":
-                        return self._generate_with_openai(prompt, current_max_tokens, current_temperature)
+                    await asyncio.wait_for(
+                        self.rate_limiter.acquire(current_provider, model_name, estimated_tokens),
+                        call_timeout(None, deadline)
+                    )
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(f"Run deadline exceeded while waiting for {current_provider} rate limit capacity")
+                
+                logger.info(f"Generating text with {current_provider} (attempt {retries+1}/{max_retries})")
+                
+                started = time.monotonic()
+                async with self._request_slot(current_provider):
+                    attempt_timeout = call_timeout(request_timeout, deadline)
+                    if on_chunk is not None:
+                        def deliver(chunk: str) -> None:
+                            delivered.append(chunk)
+                            on_chunk(chunk)
+            
+                        if current_provider == "openai":
+                            call = self._stream_with_openai(prompt, current_max_tokens, current_temperature, deliver, attempt_timeout)
+                        elif current_provider == "gemini":
+                            call = self._stream_with_gemini(prompt, current_max_tokens, current_temperature, deliver, attempt_timeout)
+                        elif current_provider == "mock":
+                            call = self._stream_with_mock(prompt, current_max_tokens, current_temperature, deliver)
+                        else:
+                            raise ValueError(f"Unknown provider: {current_provider}")
+                    elif current_provider == "openai":
+                        call = self._generate_with_openai(prompt, current_max_tokens, current_temperature, attempt_timeout)
                     elif current_provider == "gemini":
-                        return self._generate_with_gemini(prompt, current_max_tokens, current_temperature)
+                        call = self._generate_with_gemini(prompt, current_max_tokens, current_temperature, attempt_timeout)
+                    elif current_provider == "mock":
+                        call = self._generate_with_mock(prompt, current_max_tokens, current_temperature)
                     else:
                         raise ValueError(f"Unknown provider: {current_provider}")
+                    
+                    # Enforce the timeout here as well, since client-level timeouts
+                    # apply per socket read rather than to the whole call
+                    try:
+                        text, usage = await asyncio.wait_for(call, attempt_timeout)
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(f"{current_provider} request timed out after {attempt_timeout:.1f} seconds")
+                    
+                latency = time.monotonic() - started
+                usage["latency_seconds"] = latency
+                usage["retries"] = retries
+                # Lets budget trackers notice a call that used more than it reserved
+                if reserved_tokens is not None:
+                    usage["reserved_tokens"] = reserved_tokens
+                self._record_usage(usage, current_provider, attribution)
+                    
+                # Streamed latency scales with output length, so only plain
+                # calls feed the hedging percentile
+                self.router.record_success(current_provider, latency if on_chunk is None else None)
+                    
+                # Give back TPM capacity reserved beyond what the call used
+                if usage["total_tokens"]:
+                    self.rate_limiter.refund(current_provider, model_name, estimated_tokens - usage["total_tokens"])
                         
-                except Exception as e:
-                    retries += 1
-                    last_error = e
+                if cache_key is not None:
+                    self.cache.put(cache_key, text)
+                return text
+                    
+            except Exception as e:
+                if isinstance(e, DeadlineExceeded):
+                    raise
+                
+                # A call cut short by the run deadline says nothing about provider health
+                remaining = remaining_time(deadline)
+                if remaining is not None and remaining <= 0:
+                    raise DeadlineExceeded(f"Run deadline exceeded during {current_provider} request") from e
+                
+                self.router.record_failure(current_provider, e)
                     
-                    if retries == max_retries:
-                        logger.error(f"All attempts with provider {current_provider} failed: {e}")
-                        break
+                # A retry would duplicate text the consumer already received
+                if delivered:
+                    logger.error(f"Stream from {current_provider} interrupted after {len(delivered)} chunks: {e}")
+                    raise
                     
-                    logger.warning(f"Attempt {retries}/{max_retries} failed: {e}")
-                    logger.info(f"Retrying in {delay:.2f} seconds...")
+                retries += 1
                     
-                    # Add jitter to avoid synchronized retries
-                    jitter = random.uniform(0, 0.1 * delay) 
-                    time.sleep(delay + jitter)
+                # Make every queued caller back off, not just this one
+                if RateLimiter.is_rate_limit_error(e):
+                    self.rate_limiter.penalize(current_provider, model_name)
                     
-                    # Exponential backoff with a maximum delay
-                    delay = min(delay * 2, max_delay)
+                if retries == max_retries:
+                    logger.error(f"All attempts with provider {current_provider} failed: {e}")
+                    raise
+                    
+                if not self.router.is_available(current_provider):
+                    logger.error(f"Circuit for {current_provider} is open, giving up on it: {e}")
+                    raise
         
-        # If we get here, all providers have failed
-        raise Exception(f"All providers failed to generate text. Last error: {last_error}")
+                # Leave the remaining time to other providers if a backoff plus a
+                # typical request would overrun the deadline
+                typical_latency = self.router.health(current_provider).percentile(50) or 0
+                if remaining is not None and remaining < delay + typical_latency:
+                    logger.warning(f"Skipping further retries with {current_provider}: "
+                                   f"{remaining:.1f} seconds left before the deadline")
+                    raise
+                
+                logger.warning(f"Attempt {retries}/{max_retries} failed: {e}")
+                logger.info(f"Retrying in {delay:.2f} seconds...")
+                
+                # Add jitter to avoid synchronized retries
+                jitter = random.uniform(0, 0.1 * delay)
+                await asyncio.sleep(delay + jitter)
+                
+                # Exponential backoff with a maximum delay
+                delay = min(delay * 2, max_delay)
+    
+    def _get_model_name(self, provider: str) -> str:
+        """Return the configured model name for a provider"""
+        default_models = {"openai": "gpt-4o", "gemini": "gemini-1.5-pro", "mock": "mock"}
+        provider_config = self.config.get("llm_settings", {}).get("providers", {}).get(provider, {})
+        return provider_config.get("model", default_models.get(provider, provider))
     
-    def _generate_with_openai(self, prompt: str, max_tokens: int, temperature: float) -> str:
-        """Generate text using OpenAI"""
+    async def _generate_with_openai(self, prompt: str, max_tokens: int, temperature: float,
+                                    timeout: Optional[float] = None) -> Tuple[str, Dict[str, Any]]:
+        """Generate text using OpenAI, returning the text and its usage"""
         client = self.providers["openai"]["client"]
-        model = self.config.get("llm_settings", {}).get("providers", {}).get("openai", {}).get("model", "gpt-4o")
+        model = self._get_model_name("openai")
         
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model=model,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=max_tokens,
-            temperature=temperature
+            temperature=temperature,
+            timeout=timeout
         )
         
-        return response.choices[0].message.content.strip()
+        return response.choices[0].message.content.strip(), self._openai_usage(response.usage)
     
-    def _generate_with_gemini(self, prompt: str, max_tokens: int, temperature: float) -> str:
-        """Generate text using Google Gemini"""
+    async def _generate_with_gemini(self, prompt: str, max_tokens: int, temperature: float,
+                                    timeout: Optional[float] = None) -> Tuple[str, Dict[str, Any]]:
+        """Generate text using Google Gemini, returning the text and its usage"""
         import google.generativeai as genai
         from google.api_core.exceptions import ResourceExhausted
         
         model = self.providers["gemini"]["client"]
         
-        response = model.generate_content(
+        response = await model.generate_content_async(
             prompt,
             generation_config=genai.types.GenerationConfig(
                 max_output_tokens=max_tokens,
                 temperature=temperature
-            )
+            ),
+            request_options={"timeout": timeout} if timeout else None
+        )
+        
+        return response.text.strip(), self._gemini_usage(getattr(response, "usage_metadata", None))
+    
+    async def _stream_with_openai(self, prompt: str, max_tokens: int, temperature: float,
+                                  on_chunk: Callable[[str], None],
+                                  timeout: Optional[float] = None) -> Tuple[str, Dict[str, Any]]:
+        """Stream text using OpenAI, returning the full text and its usage"""
+        client = self.providers["openai"]["client"]
+        model = self._get_model_name("openai")
+        
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=timeout
         )
         
-        return response.text.strip()
\ No newline at end of file
+        parts = []
+        usage = empty_usage()
+        async for chunk in stream:
+            # The final chunk carries usage and no choices
+            if getattr(chunk, "usage", None):
+                usage = self._openai_usage(chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                on_chunk(delta)
+        
+        return "".join(parts).strip(), usage
+    
+    async def _stream_with_gemini(self, prompt: str, max_tokens: int, temperature: float,
+                                  on_chunk: Callable[[str], None],
+                                  timeout: Optional[float] = None) -> Tuple[str, Dict[str, Any]]:
+        """Stream text using Google Gemini, returning the full text and its usage"""
+        import google.generativeai as genai
+        
+        model = self.providers["gemini"]["client"]
+        
+        response = await model.generate_content_async(
+            prompt,
+            generation_config=genai.types.GenerationConfig(
+                max_output_tokens=max_tokens,
+                temperature=temperature
+            ),
+            stream=True,
+            request_options={"timeout": timeout} if timeout else None
+        )
+        
+        parts = []
+        usage = empty_usage()
+        async for chunk in response:
+            if getattr(chunk, "usage_metadata", None):
+                usage = self._gemini_usage(chunk.usage_metadata)
+            # Finish and safety chunks carry no parts, and reading .text on
+            # them raises
+            if not chunk.candidates or not chunk.candidates[0].content.parts:
+                continue
+            text = "".join(getattr(part, "text", "") or "" for part in chunk.candidates[0].content.parts)
+            if text:
+                parts.append(text)
+                on_chunk(text)
+        
+        return "".join(parts).strip(), usage
+    
+    async def _generate_with_mock(self, prompt: str, max_tokens: int, temperature: float) -> Tuple[str, Dict[str, Any]]:
+        """Generate synthetic text with the offline mock provider"""
+        client = self.providers["mock"]["client"]
+        text, counts = await client.generate(prompt, max_tokens, temperature)
+        return text, {**empty_usage(), **counts}
+    
+    async def _stream_with_mock(self, prompt: str, max_tokens: int, temperature: float,
+                                on_chunk: Callable[[str], None]) -> Tuple[str, Dict[str, Any]]:
+        """Stream synthetic text with the offline mock provider"""
+        client = self.providers["mock"]["client"]
+        text, counts = await client.stream(prompt, max_tokens, temperature, on_chunk)
+        return text, {**empty_usage(), **counts}
+    
+    @staticmethod
+    def _openai_usage(usage_data) -> Dict[str, Any]:
+        """Convert an OpenAI usage object to a usage record"""
+        usage = empty_usage()
+        if usage_data is None:
+            return usage
+        details = getattr(usage_data, "prompt_tokens_details", None)
+        usage["prompt_tokens"] = getattr(usage_data, "prompt_tokens", 0) or 0
+        usage["completion_tokens"] = getattr(usage_data, "completion_tokens", 0) or 0
+        usage["cached_tokens"] = getattr(details, "cached_tokens", 0) or 0
+        usage["total_tokens"] = getattr(usage_data, "total_tokens", 0) or usage["prompt_tokens"] + usage["completion_tokens"]
+        return usage
+    
+    @staticmethod
+    def _gemini_usage(usage_metadata) -> Dict[str, Any]:
+        """Convert Gemini usage metadata to a usage record"""
+        usage = empty_usage()
+        if usage_metadata is None:
+            return usage
+        usage["prompt_tokens"] = getattr(usage_metadata, "prompt_token_count", 0) or 0
+        usage["completion_tokens"] = getattr(usage_metadata, "candidates_token_count", 0) or 0
+        usage["cached_tokens"] = getattr(usage_metadata, "cached_content_token_count", 0) or 0
+        usage["total_tokens"] = getattr(usage_metadata, "total_token_count", 0) or usage["prompt_tokens"] + usage["completion_tokens"]
+        return usage
+    
+    def _record_usage(self, usage: Dict[str, Any], provider: str,
+                      attribution: Optional[Tuple[Dict[str, Any], tuple]]) -> None:
+        """Record one call's usage with the provider tracker and any caller trackers"""
+        tags, trackers = attribution or ({}, ())
+        tags = {**tags, "provider": provider}
+        self.usage_tracker.record(usage, tags)
+        for tracker in trackers:
+            tracker.record(usage, tags)
+    
+    @asynccontextmanager
+    async def _request_slot(self, provider: str):
+        """Hold one global and one per-provider concurrency slot for a single request"""
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        if provider not in self._provider_semaphores:
+            limit = self.per_provider_limits.get(provider, self.max_concurrent_requests)
+            self._provider_semaphores[provider] = asyncio.Semaphore(limit)
+        
+        async with self._global_semaphore:
+            async with self._provider_semaphores[provider]:
+                yield
+    
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Return the provider event loop, starting its thread on first use"""
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="llm-provider-loop",
+                    daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+    
+    def _in_provider_loop(self) -> bool:
+        """Check whether the caller is running on the provider event loop"""
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+    
+    def _run_sync(self, coro):
+        """Run a coroutine on the provider loop and block until it completes"""
+        return self._submit(coro).result()
+    
+    def _submit(self, coro):
+        """Schedule a coroutine on the provider loop and return a concurrent future"""
+        if self._in_provider_loop():
+            coro.close()
+            raise RuntimeError("Blocking LLMProvider calls cannot be made from the provider event loop; "
+                               "await the async API instead")
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop())
+    
+    async def _run_async(self, coro):
+        """Await a coroutine on the provider loop from any event loop"""
+        if self._in_provider_loop():
+            return await coro
+        future = asyncio.run_coroutine_threadsafe(coro, self._get_loop())
+        return await asyncio.wrap_future(future)
+    
+    def close(self) -> None:
+        """Stop the provider event loop and release its resources"""
+        with self._loop_lock:
+            loop, thread = self._loop, self._loop_thread
+            self._loop, self._loop_thread = None, None
+            self._global_semaphore = None
+            self._provider_semaphores = {}
+            self._inflight = {}
+            # The buckets' locks belong to the old loop; a recreated loop needs new ones
+            self.rate_limiter.reset_locks()
+        try:
+            if loop is not None:
+                loop.call_soon_threadsafe(loop.stop)
+                if thread is not None and thread is not threading.current_thread():
+                    thread.join(timeout=5)
+                if thread is None or not thread.is_alive():
+                    loop.close()
+                else:
+                    # Closing a running loop raises; the daemon thread ends with the process
+                    logger.warning("Provider event loop is still running; leaving it to exit with its thread")
+        finally:
+            if self.cache is not None:
+                self.cache.close()
+                self.cache = None
@@ -0,0 +1,299 @@
+"""
+Mock Provider
+Offline stand-in for an LLM API with a configurable latency and failure model.
+Returns synthetic but structurally valid output for the prompts used by the
+agents, so the orchestrator can be run and benchmarked without network access.
+"""
+import re
+import json
+import random
+import asyncio
+import hashlib
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+_WORDS = (
+    "the light fell across the old harbor while she waited for an answer that "
+    "never came and somewhere beyond the hills a bell rang twice as the wind "
+    "carried the smell of rain through narrow streets where nobody spoke of "
+    "what had happened the night before"
+).split()
+
+_NAMES = ["Mara Quill", "Tobias Fenn", "Ilse Varga", "Corin Ash", "Wren Hollis"]
+
+class MockProviderError(Exception):
+    """Simulated provider error carrying an HTTP status code"""
+    
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"{status_code} {message}")
+        self.status_code = status_code
+
+class MockLLMClient:
+    """Generates synthetic responses after a simulated delay"""
+    
+    def __init__(self, settings: Dict[str, Any]):
+        """
+        Initialize the mock client from llm_settings.providers.mock
+        
+        Args:
+            settings: Mock provider settings
+        """
+        self.latency_seconds = settings.get("latency_seconds", 0.2)
+        self.latency_jitter = settings.get("latency_jitter", 0.1)
+        self.tokens_per_second = settings.get("tokens_per_second", 200)
+        self.rate_limit_error_rate = settings.get("rate_limit_error_rate", 0.0)
+        self.server_error_rate = settings.get("server_error_rate", 0.0)
+        self.issue_rate = settings.get("issue_rate", 0.5)
+        self.seed = settings.get("seed", 0)
+        
+        # Latency and failures follow one seeded sequence; response content is
+        # derived from the prompt so identical prompts give identical output
+        self._rng = random.Random(self.seed)
+    
+    async def generate(self, prompt: str, max_tokens: int, temperature: float) -> Tuple[str, Dict[str, int]]:
+        """
+        Return a synthetic response after the simulated latency
+        
+        Args:
+            prompt: The input prompt
+            max_tokens: Maximum output tokens
+            temperature: Ignored; output depends only on the prompt and seed
+        
+        Returns:
+            Tuple of (text, usage counts)
+        """
+        text = self._truncate(self._respond(prompt, max_tokens), max_tokens)
+        usage = self._usage(prompt, text)
+        await self._simulate_request(usage["completion_tokens"])
+        return text, usage
+    
+    async def stream(self, prompt: str, max_tokens: int, temperature: float,
+                     on_chunk: Callable[[str], None]) -> Tuple[str, Dict[str, int]]:
+        """
+        Deliver a synthetic response in chunks paced by the simulated throughput
+        
+        Args:
+            prompt: The input prompt
+            max_tokens: Maximum output tokens
+            temperature: Ignored; output depends only on the prompt and seed
+            on_chunk: Callback receiving each chunk
+        
+        Returns:
+            Tuple of (text, usage counts)
+        """
+        text = self._truncate(self._respond(prompt, max_tokens), max_tokens)
+        usage = self._usage(prompt, text)
+        await self._simulate_request(0)
+        
+        words = text.split(" ")
+        for start in range(0, len(words), 20):
+            chunk = " ".join(words[start:start + 20])
+            if start + 20 < len(words):
+                chunk += " "
+            await asyncio.sleep(len(chunk) / 4 / self.tokens_per_second)
+            on_chunk(chunk)
+        return text, usage
+    
+    async def _simulate_request(self, completion_tokens: int) -> None:
+        """Sleep for time-to-first-token plus generation time, then maybe fail"""
+        delay = self.latency_seconds + self._rng.uniform(0, self.latency_jitter)
+        await asyncio.sleep(delay + completion_tokens / self.tokens_per_second)
+        
+        roll = self._rng.random()
+        if roll < self.rate_limit_error_rate:
+            raise MockProviderError(429, "Rate limit exceeded (simulated)")
+        if roll < self.rate_limit_error_rate + self.server_error_rate:
+            raise MockProviderError(self._rng.choice([500, 502, 503]), "Server error (simulated)")
+    
+    @staticmethod
+    def _truncate(text: str, max_tokens: int) -> str:
+        """Cut a response off at max_tokens, on a word boundary, as a real provider would"""
+        limit = max_tokens * 4
+        if len(text) <= limit:
+            return text
+        cut = text.rfind(" ", 0, limit + 1)
+        return text[:cut if cut > 0 else limit]
+    
+    @staticmethod
+    def _usage(prompt: str, text: str) -> Dict[str, int]:
+        """Approximate token counts at about 4 characters per token"""
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(text) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    
+    def _respond(self, prompt: str, max_tokens: int) -> str:
+        """Pick a response shape from the prompt's format instructions"""
+        digest = hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).hexdigest()
+        rng = random.Random(int(digest[:16], 16))
+        max_words = max(1, int(max_tokens * 0.75))
+        
+        # Only prompts that ask for an outline; many others quote one
+        task = prompt.strip().split("\n")[0].lower()
+        if "Estimated word count: [number]" in prompt or ("outline" in task and "Estimated word count:" in prompt):
+            return self._outline(prompt, rng)
+        if '"edits"' in prompt and '"find"' in prompt:
+            return json.dumps(self._edits(prompt, rng), indent=2)
+        if "story bible" in task and "JSON" in prompt:
+            return json.dumps(self._story_bible(prompt, rng), indent=2)
+        if "JSON" in prompt:
+            return json.dumps(self._json(prompt, rng), indent=2)
+        if re.search(r'\brevised?\b', prompt, re.IGNORECASE) and self._source_text(prompt):
+            # Revisions return the original text, as a light edit would
+            return self._source_text(prompt)[:max_words * 6]
+        
+        match = (re.search(r'[Aa]pproximately (\d[\d,]*) (?:more )?words', prompt) or
+                 re.search(r'(\d[\d,]*)\s*(?:-\s*\d[\d,]*\s*)?words', prompt))
+        words = int(match.group(1).replace(",", "")) if match else 300
+        return self._prose(min(words, max_words), rng)
+    
+    def _outline(self, prompt: str, rng: random.Random) -> str:
+        """Build an outline in the format parse_outline expects"""
+        match = re.search(r'(\d+)-chapter', prompt)
+        existing = [int(n) for n in re.findall(r'Chapter (\d+):', prompt)]
+        num_chapters = int(match.group(1)) if match else max(existing, default=10)
+        
+        blocks = []
+        for chapter_num in range(1, num_chapters + 1):
+            blocks.append(
+                f"Chapter {chapter_num}: The {rng.choice(_WORDS).title()} {rng.choice(_WORDS).title()}\n"
+                f"Summary: {self._prose(60, rng)}\n"
+                f"Estimated word count: {rng.randrange(2000, 5001, 250)}"
+            )
+        return "\n\n".join(blocks)
+    
+    def _json(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        """Build a JSON object with the keys the prompt asks for"""
+        instructions = prompt[prompt.find("JSON"):]
+        snippets = self._sentences(prompt) or ["The light fell across the old harbor."]
+        
+        def issue_list():
+            count = rng.choice([1, 2]) if rng.random() < self.issue_rate else 0
+            return [f"Simulated issue {i + 1}" for i in range(count)]
+        
+        # Continuity batches are keyed by chapter number
+        if "chapter numbers as keys" in instructions:
+            result = {}
+            for chapter_num in sorted(set(re.findall(r'Chapter (\d+)', prompt)), key=int):
+                if rng.random() < self.issue_rate:
+                    result[chapter_num] = [{
+                        "description": "Simulated continuity issue",
+                        "text": rng.choice(snippets),
+                        "fix": "Make the detail consistent with earlier chapters"
+                    }]
+            return result
+        
+        keys = re.findall(r'"([a-z_]+)"', instructions)
+        if not keys:
+            # Categories given as a numbered list, e.g. "1. Plot and Structure:"
+            headings = re.findall(r'^\s*\d+\.\s*([A-Za-z][A-Za-z /&-]*?)\s*[:(]', prompt, re.MULTILINE)
+            keys = [re.sub(r'[^a-z]+', '_', heading.lower()).strip('_') for heading in headings]
+            if "score" in prompt:
+                result = {key: {"score": rng.randint(5, 9), "assessment": self._prose(20, rng)} for key in keys}
+            else:
+                result = {key: self._prose(12, rng) for key in keys}
+            if "critical issues" in prompt:
+                result["critical_issues"] = [
+                    {"chapter": 1, "description": issue, "fix": "Clarify the scene"} for issue in issue_list()
+                ]
+            return result
+        
+        issues = issue_list()
+        result = {}
+        for key in dict.fromkeys(keys):
+            if "score" in key:
+                result[key] = rng.randint(5, 9)
+            elif "count" in key:
+                result[key] = rng.randint(1, 10)
+            elif key == "examples":
+                result[key] = [rng.choice(snippets) for _ in issues]
+            elif key == "specific_locations":
+                # "start ... end" excerpts, the form the pacing advisor searches for
+                locations = []
+                for _ in issues:
+                    words = rng.choice(snippets).split()
+                    locations.append(f"{' '.join(words[:4])} ... {' '.join(words[-4:])}")
+                result[key] = locations
+            elif key in ("fixes", "improved_versions", "suggestions"):
+                result[key] = [f"Simulated improvement {i + 1}" for i in range(len(issues))]
+            elif key.endswith("s"):
+                result[key] = issues or [self._prose(8, rng)]
+            elif "title" in key:
+                result[key] = f"The {rng.choice(_WORDS).title()} {rng.choice(_WORDS).title()}"
+            else:
+                result[key] = self._prose(20, rng)
+        return result
+    
+    def _story_bible(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        """Build character sketches, or the changes a chapter makes to the story bible"""
+        if '"story_so_far"' not in prompt:
+            return {"characters": {name: self._prose(25, rng) for name in _NAMES[:rng.randint(3, 5)]}}
+        
+        open_threads = re.findall(r'^\s*- (.+)$', prompt.split("Open Plot Threads:")[-1].split("Chapter ")[0], re.MULTILINE)
+        return {
+            "characters": {name: self._prose(15, rng) for name in rng.sample(_NAMES, rng.randint(1, 3))},
+            "threads_opened": [self._prose(10, rng) for _ in range(rng.randint(0, 2))],
+            "threads_resolved": [thread for thread in open_threads if rng.random() < 0.3],
+            "locations": {f"The {rng.choice(_WORDS).title()}": self._prose(10, rng) for _ in range(rng.randint(0, 1))},
+            "events": [self._prose(10, rng) for _ in range(rng.randint(2, 3))],
+            "chapter_summary": self._prose(45, rng),
+            "story_so_far": self._prose(120, rng)
+        }
+    
+    def _edits(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        """Build search/replace edits that rewrite a few sentences of the text being revised"""
+        source = self._source_text(prompt) or ""
+        sentences = [s for s in dict.fromkeys(self._sentences(source)) if source.count(s) == 1]
+        edits = []
+        for sentence in rng.sample(sentences, min(len(sentences), rng.randint(1, 3))):
+            edits.append({"find": sentence, "replace": self._prose(len(sentence.split()), rng)})
+        return {"edits": edits}
+    
+    @staticmethod
+    def _prose(num_words: int, rng: random.Random) -> str:
+        """Generate sentences totalling the requested number of words"""
+        sentences = []
+        remaining = num_words
+        while remaining > 0:
+            length = min(remaining, rng.randint(8, 18))
+            words = [rng.choice(_WORDS) for _ in range(length)]
+            sentence = " ".join(words).capitalize()
+            # Some lines of dialogue for the dialogue expert to analyze
+            if len(sentences) % 4 == 3:
+                sentences.append(f'"{sentence}," she said.')
+            else:
+                sentences.append(sentence + ".")
+            remaining -= length
+        
+        # Group sentences into paragraphs of about five
+        paragraphs = [" ".join(sentences[i:i + 5]) for i in range(0, len(sentences), 5)]
+        return "\n\n".join(paragraphs)
+    
+    @staticmethod
+    def _sentences(prompt: str) -> List[str]:
+        """Return sentences from the prompt that can serve as quoted examples"""
+        return [s for s in re.findall(r'[A-Z][^.!?\n]{30,200}[.!?]', prompt)][:50]
+    
+    @staticmethod
+    def _source_text(prompt: str) -> Optional[str]:
+        """
+        Return the longest run of prose paragraphs in the prompt
+        
+        Instruction blocks (headings ending in a colon, numbered or bulleted
+        lists) break a run, so the result is the text being revised.
+        """
+        best, run = [], []
+        for block in re.split(r'\n\s*\n', prompt):
+            block = block.strip()
+            lines = block.splitlines()
+            is_prose = bool(block) and not any(
+                line.strip().endswith(":") or re.match(r'\s*(?:\d+\.|-)\s', line) for line in lines
+            )
+            run = run + [block] if is_prose else []
+            if sum(map(len, run)) > sum(map(len, best)):
+                best = run
+        
+        text = "\n\n".join(best)
+        return text if len(text) > 200 else None
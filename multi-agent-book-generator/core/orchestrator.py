@@ -4,13 +4,22 @@ Manages the multi-agent workflow for book generation
 """
 import os
 import json
-import time
 import logging
 import re
-from typing import Dict, Any, List, Optional
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, List, Optional, Callable
 from datetime import datetime
 from .llm_provider import LLMProvider
 from .agent import Agent
+from .usage_tracker import UsageTracker, usage_context
+from .deadline import deadline_context
+from .task_graph import TaskGraph, submit_in_context
+from .checkpoint import CheckpointStore
+from .artifact_log import ArtifactLog
+from .chapter_store import ChapterStore, ChapterSequence
+from .budget import BudgetController, BudgetExceeded
 
 # Import all agent types
 from agents.plot_architect import PlotArchitectAgent
@@ -26,6 +35,8 @@ from agents.cover_designer import CoverDesignerAgent
 # Import utilities
 from utils.parsing import parse_outline
 from utils.text_processing import chunk_text
+from utils.fix_planning import plan_chapter_fixes
+from utils.story_bible import new_story_bible, apply_bible_delta, render_story_bible
 from utils.epub_builder import create_epub
 
 # Set up logging
@@ -35,12 +46,34 @@ logger = logging.getLogger(__name__)
 class BookGenerationOrchestrator:
     """Main orchestrator for the book generation process"""
     
-    def __init__(self, config: Dict[str, Any]):
+    # Refinement reviews, in the order their fixes are applied
+    REVIEW_TYPES = ["continuity", "style", "pacing", "dialogue"]
+    REVIEW_AGENTS = {
+        "continuity": "continuity_checker",
+        "style": "style_reviewer",
+        "pacing": "pacing_advisor",
+        "dialogue": "dialogue_expert"
+    }
+    
+    # Settings that change how a run executes but not what it generates; changing
+    # them does not invalidate the work of an earlier build
+    OPERATIONAL_LLM_SETTINGS = ("concurrency", "rate_limit", "timeouts", "routing", "cache", "coalesce_requests")
+    OPERATIONAL_AGENT_SETTINGS = ("timeout", "image_timeout", "stream")
+    
+    # Task outputs that hold the chapters of the book
+    CHAPTER_ARTIFACTS = ("draft_chapters", "refined_chapters", "final_chapters")
+    
+    # Agents moved to the budget's economy provider by the economy_models step
+    ANALYSIS_AGENTS = ("continuity_checker", "style_reviewer", "pacing_advisor", "dialogue_expert", "quality_analyst")
+    
+    def __init__(self, config: Dict[str, Any], llm_provider: Optional[LLMProvider] = None):
         """
         Initialize the book generation orchestrator
         
         Args:
             config: Configuration dictionary with book generation parameters
+            llm_provider: Provider shared with other books (a batch); by default
+                the orchestrator creates its own from the configuration
         """
         self.config = config
         self.book_data = {
@@ -61,24 +94,67 @@ class BookGenerationOrchestrator:
         }
         
         # Initialize the LLM provider
-        self.llm_provider = LLMProvider(config)
+        self.llm_provider = llm_provider or LLMProvider(config)
         
         # Initialize agents
         self.agents = self._initialize_agents()
         
-        # Set the workflow phases
-        self.phases = ["planning", "creation", "refinement", "qa", "publishing"]
-        self.current_phase = 0
+        # Optional token, cost and time budget; the run degrades in steps when
+        # projected to exceed it, and calls that could overshoot it are refused
+        self.budget = BudgetController.from_config(config, self.llm_provider._get_model_name, self._degrade)
+        
+        # The workflow runs as a graph of tasks; independent tasks overlap
+        self.max_parallel_tasks = config.get("system_settings", {}).get("max_parallel_tasks", 4)
+        
+        # Apply the fixes of all reviews to a chapter in one revision instead of one per review
+        self.combined_refinement = config.get("system_settings", {}).get("combined_refinement", True)
+        
+        # Give the writer a story bible, updated after each chapter, instead of
+        # the character profiles and excerpts of the previous chapters
+        self.use_story_bible = config.get("system_settings", {}).get("story_bible", True)
         
         # Create output directory
         self.output_dir = config.get("output_settings", {}).get("output_directory", "./output")
         os.makedirs(self.output_dir, exist_ok=True)
         
+        # Crash-safe checkpoints of the run state, used to resume interrupted runs
+        self.checkpoint_enabled = config.get("system_settings", {}).get("checkpoints", True)
+        self.checkpoints = CheckpointStore(self.output_dir)
+        self._checkpoint_lock = threading.RLock()
+        
+        # Chapter text lives in a versioned store on disk; the book data, task
+        # outputs and checkpoints only reference revisions of it
+        self.chapter_store = ChapterStore(
+            os.path.join(self.output_dir, "chapters.sqlite3") if self.checkpoint_enabled else ":memory:",
+            cache_size=config.get("system_settings", {}).get("chapter_cache_size", 16)
+        )
+        self.book_data["chapters"] = ChapterSequence(self.chapter_store)
+        
+        # Intermediate files are appended to a log in the background and
+        # written out as files at the end of the run, or later on demand
+        self.intermediates = ArtifactLog(os.path.join(self.output_dir, "intermediates"))
+        self.materialize_intermediates = config.get("output_settings", {}).get("materialize_intermediates", True)
+        
+        # Outputs of completed tasks and progress within the current tasks
+        self.artifacts = {}
+        self.progress = {}
+        
+        # Incremental rebuilds: fingerprints of the tasks behind each artifact,
+        # memoized per-chapter edits and the results of an earlier build
+        self.incremental = config.get("system_settings", {}).get("incremental", True)
+        self.fingerprints = {}
+        self.memo = {}
+        self.previous_build = None
+        self._previous_memo = {}
+        self._resumed = False
+        
         # Track execution metrics
+        self.usage_tracker = UsageTracker()
         self.metrics = {
             "start_time": None,
             "end_time": None,
             "phase_times": {},
+            "task_times": {},
             "token_usage": {
                 "total": 0,
                 "by_agent": {}
@@ -134,45 +210,435 @@ class BookGenerationOrchestrator:
         Returns:
             True if the book generation was successful
         """
-        self.metrics["start_time"] = datetime.now().isoformat()
+        # A resumed run keeps the start time of the original run
+        if not self.metrics["start_time"]:
+            self.metrics["start_time"] = datetime.now().isoformat()
         
         logger.info("Starting book generation process")
         logger.info(f"Genre: {self.config.get('genre', 'fiction')}")
         logger.info(f"Style: {self.config.get('writing_style', 'descriptive')}")
         logger.info(f"Chapters: {self.config.get('num_chapters', 10)}")
         
+        # Optional wall-clock budget for the whole run; every LLM and HTTP call
+        # is cut short rather than allowed to run past it
+        max_runtime = self.config.get("system_settings", {}).get("max_runtime_minutes")
+        deadline_seconds = max_runtime * 60 if max_runtime else None
+        if deadline_seconds:
+            logger.info(f"Run deadline: {max_runtime} minutes")
+        
+        # Reuse unchanged work from an earlier build in the same output directory;
+        # without checkpoints its chapters are not kept on disk
+        if self.incremental and self.checkpoint_enabled and not self._resumed:
+            self._load_previous_build()
+        
+        graph = self._build_task_graph()
+        
         try:
-            # Execute each phase
-            for phase in self.phases:
-                phase_start = time.time()
-                logger.info(f"Beginning {phase} phase")
-                
-                if phase == "planning":
-                    self._execute_planning_phase()
-                elif phase == "creation":
-                    self._execute_creation_phase()
-                elif phase == "refinement":
-                    self._execute_refinement_phase()
-                elif phase == "qa":
-                    self._execute_qa_phase()
-                elif phase == "publishing":
-                    self._execute_publishing_phase()
-                
-                phase_end = time.time()
-                self.metrics["phase_times"][phase] = phase_end - phase_start
-                logger.info(f"Completed {phase} phase in {phase_end - phase_start:.2f} seconds")
+            with deadline_context(deadline_seconds):
+                with usage_context(tracker=self.usage_tracker):
+                    # The budget sees every call of the run and may refuse one
+                    with usage_context(tracker=self.budget):
+                        graph.run()
             
+            self._record_task_times(graph)
             self.metrics["end_time"] = datetime.now().isoformat()
             self._save_metrics()
+            self._finish_intermediates()
+            self._checkpoint("complete")
             
             logger.info(f"Book generation completed successfully!")
             return True
             
         except Exception as e:
             logger.error(f"Error in book generation process: {e}", exc_info=True)
+            self.metrics["error"] = str(e)
+            if graph.failed_task is not None:
+                self.metrics["failed_task"] = graph.failed_task
+            if isinstance(e, BudgetExceeded):
+                logger.error(f"Stopped at task '{graph.failed_task}' to stay within the budget; "
+                             f"raise system_settings.budget and resume to finish the book")
+            
+            # Keep the usage data of the failed run
+            self._record_task_times(graph)
+            self.metrics["end_time"] = datetime.now().isoformat()
+            self._save_metrics()
+            
+            # Keep everything completed so far for --resume
+            try:
+                self._finish_intermediates()
+                self._checkpoint("failed")
+                if self.checkpoint_enabled:
+                    logger.info(f"Progress saved; continue with --resume {self.output_dir}")
+            except Exception as checkpoint_error:
+                logger.error(f"Could not save checkpoint: {checkpoint_error}")
+            return False
+    
+    def close(self) -> None:
+        """
+        Release the run's resources, closing the chapter store
+        
+        Call it once the run has finished or failed and its results have been
+        read, since the chapters are loaded from the store until then.
+        """
+        self.chapter_store.close()
+    
+    def restore_checkpoint(self, state: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Restore a saved run so that run() continues where it stopped
+        
+        Completed tasks are skipped, and partially completed ones pick up
+        after their last finished chapter or review step.
+        
+        Args:
+            state: Checkpoint state (loaded from the output directory if omitted)
+        
+        Returns:
+            True if a checkpoint was restored
+        """
+        state = state or self.checkpoints.load()
+        if state is None:
             return False
+        
+        self.book_data = state["book_data"]
+        self.book_data["chapters"] = self._as_chapters(self.book_data["chapters"], "restored")
+        self.artifacts = self._restore_artifacts(state.get("artifacts", {}))
+        self.progress = state.get("progress", {})
+        self.fingerprints = state.get("fingerprints", {})
+        self.memo = state.get("memo", {})
+        self._resumed = True
+        
+        metrics = state.get("metrics", {})
+        self.usage_tracker.restore(metrics.get("token_usage", {}))
+        if self.budget is not None:
+            # Earlier attempts count against the budget too
+            self.budget.restore(metrics.get("token_usage", {}))
+            self.budget.restore_state(metrics.get("budget", {}))
+        self.metrics.update({key: value for key, value in metrics.items() if key not in ("token_usage", "failed_task")})
+        self.metrics.setdefault("resumed_at", []).append(datetime.now().isoformat())
+        
+        logger.info(f"Resuming run from checkpoint: {len(self.artifacts)} task outputs and "
+                    f"{len(self.book_data['chapters'])} chapters restored")
+        return True
+    
+    def _checkpoint(self, status: str = "running") -> None:
+        """
+        Atomically save the run state so an interrupted run can be resumed
+        
+        Args:
+            status: "running", "failed" or "complete"
+        """
+        if not self.checkpoint_enabled:
+            return
+        
+        with self._checkpoint_lock:
+            self.checkpoints.save({
+                "status": status,
+                "updated": datetime.now().isoformat(),
+                "config": self.config,
+                "book_data": {**self.book_data, "chapters": list(self.book_data["chapters"].refs)},
+                "artifacts": {name: list(value.refs) if isinstance(value, ChapterSequence) else value
+                              for name, value in self.artifacts.copy().items()},
+                "fingerprints": dict(self.fingerprints),
+                "memo": dict(self.memo),
+                "progress": self.progress,
+                "metrics": {**self.metrics, "token_usage": self.usage_tracker.to_dict(),
+                            **({"budget": self.budget.report()} if self.budget else {})}
+            })
+    
+    def _task_completed(self, graph: TaskGraph, task) -> None:
+        """Report a finished task's phase progress to the budget and checkpoint the run"""
+        phase_tasks = [t for t in graph.tasks.values() if t.phase == task.phase]
+        self._report_progress(task.phase, sum(graph.is_complete(t) for t in phase_tasks) / len(phase_tasks))
+        self._checkpoint()
     
-    def _execute_planning_phase(self) -> None:
+    def _report_progress(self, phase: str, fraction: float) -> None:
+        """Tell the budget how far a phase has progressed, so it can project the run's total spend"""
+        if self.budget is not None:
+            self.budget.update_progress(phase, fraction)
+    
+    def _degrade(self, step: str) -> None:
+        """
+        Apply a budget degradation step
+        
+        skip_interim_checks and fewer_reviews are checked where those steps
+        run; economy_models switches the analysis agents to a cheaper provider.
+        
+        Args:
+            step: One of budget.DEGRADATION_STEPS
+        """
+        if step == "economy_models":
+            for key in self.ANALYSIS_AGENTS:
+                agent = self.agents[key]
+                agent.settings = {**agent.settings, "provider": self.budget.economy_provider}
+        # Called from task threads while checkpoints may be serializing the metrics
+        with self._checkpoint_lock:
+            self.metrics.setdefault("budget_degradations", []).append(step)
+    
+    def _update_progress(self, key: str, value: Any, item: Optional[str] = None) -> None:
+        """
+        Record progress within a task and checkpoint it
+        
+        Args:
+            key: Progress entry
+            value: New value
+            item: If given, set this item of a dictionary entry instead
+        """
+        with self._checkpoint_lock:
+            if item is None:
+                self.progress[key] = value
+            else:
+                self.progress.setdefault(key, {})[item] = value
+            self._checkpoint()
+    
+    def _clear_progress(self, *keys: str) -> None:
+        """Drop progress entries of a task that has finished"""
+        with self._checkpoint_lock:
+            for key in keys:
+                self.progress.pop(key, None)
+    
+    def _load_previous_build(self) -> None:
+        """
+        Pick up the results of an earlier run in the same output directory
+        
+        Tasks whose fingerprint is unchanged reuse their earlier outputs.
+        A fingerprint covers the task's inputs, the content settings and the
+        prompt versions of its agents. Chapters edited by hand in
+        intermediates/chapters replace their drafts, so only the work
+        downstream of the edit is redone. If the chapters the earlier build
+        refers to are missing from the chapter store, everything is rebuilt.
+        """
+        state = self.checkpoints.load()
+        if state is None or not state.get("fingerprints"):
+            return
+        
+        try:
+            artifacts = self._restore_artifacts(state.get("artifacts", {}))
+            chapters = self._as_chapters(state["book_data"]["chapters"], "restored")
+            sequences = [chapters] + [artifacts[name] for name in self.CHAPTER_ARTIFACTS if name in artifacts]
+            for chapter_num, revision in (ref for sequence in sequences for ref in sequence.refs):
+                if not self.chapter_store.has(chapter_num, revision):
+                    raise KeyError(f"chapter {chapter_num} has no revision {revision}")
+            
+            # Exported files that have since been deleted are written again
+            for key in ("text_path", "epub_path", "cover_image_path", "metadata_path"):
+                if artifacts.get(key) and not os.path.exists(artifacts[key]):
+                    del artifacts[key]
+            if "draft_chapters" in artifacts and "structured_outline" in artifacts:
+                artifacts["draft_chapters"] = self._read_chapter_edits(
+                    artifacts["draft_chapters"], artifacts["structured_outline"])
+        except KeyError as e:
+            logger.warning(f"Cannot reuse the previous build in {self.output_dir} ({e}); rebuilding everything")
+            return
+        
+        self.previous_build = {"fingerprints": state["fingerprints"], "artifacts": artifacts}
+        self._previous_memo = state.get("memo", {})
+        
+        # Reused tasks keep their side effects (reviews, scores, revisions) from
+        # the earlier book; the metadata is rebuilt from the current config
+        self.book_data = {**state["book_data"], "metadata": self.book_data["metadata"], "chapters": chapters}
+        logger.info(f"Found a previous build in {self.output_dir}; unchanged work will be reused")
+    
+    def _read_chapter_edits(self, draft_chapters: ChapterSequence,
+                            structured_outline: List[Dict[str, Any]]) -> ChapterSequence:
+        """Return the drafts with chapters edited by hand in intermediates/chapters applied"""
+        chapters = self._as_chapters(draft_chapters)
+        for i, chapter in enumerate(draft_chapters):
+            chapter_path = self._chapter_path(i + 1)
+            if not os.path.exists(chapter_path):
+                continue
+            with open(chapter_path, "r") as f:
+                text = f.read()
+            
+            header = f"Chapter {i+1}: {structured_outline[i]['title']}\n\n"
+            if text.startswith(header):
+                text = text[len(header):]
+            if text.strip() != chapter.strip():
+                logger.info(f"Chapter {i+1} was edited since the last build")
+                chapters.set(i, text.strip(), "edit")
+                # The artifact log holds the edited chapter from now on
+                self.intermediates.write(f"chapters/chapter_{i+1:02d}.txt", [header, text.strip()])
+        return chapters
+    
+    def _as_chapters(self, chapters: Any, stage: Optional[str] = None) -> ChapterSequence:
+        """
+        Return chapters as a new sequence backed by the chapter store
+        
+        Args:
+            chapters: A sequence, its saved revision references, or chapter
+                texts (as in checkpoints of earlier versions)
+            stage: What produced the texts, if they have to be stored
+        
+        Returns:
+            A sequence that can be changed without affecting the argument
+        """
+        if isinstance(chapters, ChapterSequence):
+            return chapters.copy()
+        chapters = list(chapters)
+        if chapters and not isinstance(chapters[0], str):
+            return ChapterSequence(self.chapter_store, chapters)
+        return ChapterSequence.from_texts(self.chapter_store, chapters, stage)
+    
+    def _restore_artifacts(self, artifacts: Dict[str, Any]) -> Dict[str, Any]:
+        """Turn the chapter revision references of saved task outputs back into sequences"""
+        return {name: self._as_chapters(value, "restored") if name in self.CHAPTER_ARTIFACTS else value
+                for name, value in artifacts.items()}
+    
+    def _fingerprint_data(self, phase: str, agent_keys: List[str]) -> Dict[str, Any]:
+        """
+        Collect the settings that affect a task's outputs besides its inputs
+        
+        Args:
+            phase: The task's phase (output settings only matter for publishing)
+            agent_keys: Agents the task uses
+        
+        Returns:
+            JSON-serializable settings
+        """
+        agent_settings = self.config.get("agent_settings", {})
+        data = {
+            "book": {key: value for key, value in self.config.items()
+                     if key not in ("output_settings", "system_settings", "llm_settings", "agent_settings")},
+            "llm": {key: value for key, value in self.config.get("llm_settings", {}).items()
+                    if key not in self.OPERATIONAL_LLM_SETTINGS},
+            "agents": {
+                key: {
+                    "settings": {k: v for k, v in agent_settings.get(key, {}).items()
+                                 if k not in self.OPERATIONAL_AGENT_SETTINGS},
+                    "prompt_version": self.agents[key].PROMPT_VERSION
+                }
+                for key in agent_keys
+            }
+        }
+        if "writer" in agent_keys:
+            data["parallel_chapters"] = self.config.get("system_settings", {}).get("parallel_chapters", False)
+            data["story_bible"] = self.use_story_bible
+        if phase == "refinement":
+            data["combined_refinement"] = self.combined_refinement
+        if phase == "publishing":
+            data["output_settings"] = self.config.get("output_settings", {})
+        return data
+    
+    def _memoized(self, kind: str, key_data: Any, compute: Callable[[], str], chapter_num: int) -> str:
+        """
+        Reuse the result of a per-chapter edit whose inputs are unchanged
+        
+        Results are kept in the chapter store; the memo holds their revisions.
+        
+        Args:
+            kind: Kind of edit (part of the key)
+            key_data: Everything the result depends on
+            compute: Produces the result on a miss
+            chapter_num: The edited chapter
+        
+        Returns:
+            The memoized or newly computed result
+        """
+        digest = hashlib.sha256(json.dumps(key_data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        key = f"{kind}:{digest}"
+        if key in self.memo:
+            result = self.memo[key]
+        else:
+            if key in self._previous_memo:
+                result = self._previous_memo[key]
+            else:
+                result = [chapter_num, self.chapter_store.save(chapter_num, compute(), kind)]
+            self.memo[key] = result
+        # Memos of earlier versions hold the text itself
+        return result if isinstance(result, str) else self.chapter_store.load(*result)
+    
+    def _build_task_graph(self) -> TaskGraph:
+        """
+        Build the workflow as tasks with declared input and output artifacts
+        
+        A task starts as soon as its inputs exist, so the four refinement
+        reviews, which only read the drafted chapters, run concurrently, and
+        the title and cover are generated while QA runs.
+        
+        Returns:
+            The task graph for this run
+        """
+        # Restored outputs of a resumed run let their tasks be skipped, and
+        # tasks unchanged since a previous build reuse its outputs
+        graph = TaskGraph(max_workers=self.max_parallel_tasks, artifacts=self.artifacts,
+                          on_task_complete=lambda task: self._task_completed(graph, task),
+                          fingerprints=self.fingerprints, previous_build=self.previous_build,
+                          lock=self._checkpoint_lock)
+        self.artifacts = graph.artifacts
+        self.fingerprints = graph.fingerprints
+        
+        def add(name, func, inputs=(), outputs=(), phase=None, agents=()):
+            phase = phase or name
+            
+            def run_task(**artifacts):
+                with usage_context(phase=phase):
+                    return func(**artifacts)
+            
+            graph.add(name, run_task, inputs, outputs, phase, self._fingerprint_data(phase, list(agents)))
+        
+        add("planning", self._execute_planning_phase,
+            outputs=["outline", "structured_outline", "character_profiles"],
+            agents=["plot_architect", "character_designer"])
+        add("creation", self._execute_creation_phase,
+            inputs=["structured_outline", "character_profiles"],
+            outputs=["draft_chapters"],
+            agents=["writer", "plot_architect", "continuity_checker"])
+        
+        for review_type in self.REVIEW_TYPES:
+            add(f"{review_type}_review",
+                lambda review_type=review_type, **artifacts: self._run_review(review_type, **artifacts),
+                inputs=["draft_chapters", "structured_outline", "character_profiles"],
+                outputs=[f"{review_type}_report"],
+                phase="refinement",
+                agents=[self.REVIEW_AGENTS[review_type]])
+        add("refinement", self._execute_refinement_phase,
+            inputs=["draft_chapters"] + [f"{review_type}_report" for review_type in self.REVIEW_TYPES],
+            outputs=["refined_chapters"],
+            agents=list(self.REVIEW_AGENTS.values()))
+        
+        add("qa", self._execute_qa_phase,
+            inputs=["refined_chapters", "outline", "character_profiles"], outputs=["final_chapters"],
+            agents=["quality_analyst"])
+        # The title only reads the outline and the opening of the book, so it is
+        # chosen from the refined chapters and the cover can be generated during QA
+        add("title", self._generate_title,
+            inputs=["refined_chapters", "outline"], outputs=["title"], phase="qa",
+            agents=["quality_analyst"])
+        
+        # Publishing: each output format is its own task
+        formats = self.config.get("output_settings", {}).get("formats", ["txt", "epub"])
+        exports = []
+        if "txt" in formats:
+            add("text_export", self._export_text,
+                inputs=["final_chapters", "title"], outputs=["text_path"], phase="publishing")
+            exports.append("text_path")
+        if "epub" in formats:
+            add("cover", self._generate_cover,
+                inputs=["title", "outline"], outputs=["cover_image_path"], phase="publishing",
+                agents=["cover_designer"])
+            add("epub_export", self._export_epub,
+                inputs=["final_chapters", "title", "cover_image_path"], outputs=["epub_path"], phase="publishing")
+            exports.append("epub_path")
+        add("publishing", self._execute_publishing_phase, inputs=["final_chapters", "title"] + exports,
+            outputs=["metadata_path"])
+        
+        return graph
+    
+    def _record_task_times(self, graph: TaskGraph) -> None:
+        """Record each task's duration and the wall-clock span of each phase"""
+        phase_spans = {}
+        for name, (start, end) in sorted(graph.task_spans.items(), key=lambda item: item[1][0]):
+            self.metrics["task_times"][name] = end - start
+            phase = graph.tasks[name].phase
+            first, last = phase_spans.get(phase, (start, end))
+            phase_spans[phase] = (min(first, start), max(last, end))
+        
+        for phase, (start, end) in phase_spans.items():
+            self.metrics["phase_times"][phase] = end - start
+        
+        if graph.reused:
+            self.metrics["reused_tasks"] = list(graph.reused)
+    
+    def _execute_planning_phase(self) -> Dict[str, Any]:
         """Execute the planning phase to create the book outline and character profiles"""
         logger.info("Planning Phase: Generating book outline and character profiles")
         
@@ -198,128 +664,385 @@ class BookGenerationOrchestrator:
         # Save intermediate results if configured
         if self.config.get("output_settings", {}).get("save_intermediates", True):
             self._save_intermediate_results("planning")
+        
+        return {
+            "outline": self.book_data["outline"],
+            "structured_outline": self.book_data["structured_outline"],
+            "character_profiles": self.book_data["character_profiles"]
+        }
     
-    def _execute_creation_phase(self) -> None:
+    def _execute_creation_phase(self, structured_outline: List[Dict[str, Any]],
+                                character_profiles: str) -> Dict[str, Any]:
         """Execute the creation phase to write the chapters"""
         logger.info("Creation Phase: Writing chapters based on outline")
         
+        if not any(key in self.progress for key in ("drafted_chapters", "interim_checks", "chapter_states",
+                                                    "drafts", "seams")):
+            # Starting afresh; an incremental rebuild may have restored an earlier book
+            self.book_data["chapters"] = ChapterSequence(self.chapter_store)
+            self.book_data["reviews"] = [review for review in self.book_data["reviews"]
+                                         if review["type"] != "interim_continuity"]
+            self.book_data.pop("story_bible", None)
+        
+        if self.use_story_bible and "story_bible" not in self.book_data:
+            self._seed_story_bible(character_profiles)
+        
+        if self.config.get("system_settings", {}).get("parallel_chapters", False):
+            self._write_chapters_in_parallel(structured_outline, character_profiles)
+        else:
+            self._write_chapters_in_order(structured_outline, character_profiles)
+        
+        # Save all chapters together
+        self._save_intermediate_results("creation")
+        self._clear_progress("drafted_chapters", "interim_checks", "chapter_states", "drafts", "seams")
+        
+        return {"draft_chapters": self.book_data["chapters"].copy()}
+    
+    def _write_chapters_in_order(self, structured_outline: List[Dict[str, Any]],
+                                 character_profiles: str) -> None:
+        """
+        Write the chapters one at a time, each with the end of the previous ones as context
+        
+        Interim continuity checks run in the background while the following
+        chapters are written, and are collected once the last chapter is done.
+        """
         writer = self.agents["writer"]
-        structured_outline = self.book_data["structured_outline"]
         
-        for i, chapter_info in enumerate(structured_outline):
-            chapter_num = i + 1
-            logger.info(f"Writing chapter {chapter_num}: {chapter_info['title']}")
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="interim-check") as checks:
+            # Checks that had not finished when a resumed run was interrupted
+            pending = {}
+            for chapter_num in range(3, len(self.book_data["chapters"]) + 1, 3):
+                if str(chapter_num) not in self.progress.get("interim_checks", {}):
+                    pending[chapter_num] = self._start_interim_check(checks, chapter_num)
             
-            # Add chapter number to the info
-            chapter_info["chapter_num"] = chapter_num
-            
-            # Get previous chapters for context (limit to prevent token issues)
-            prev_chapters = self.book_data["chapters"][-2:] if self.book_data["chapters"] else []
+            for i, chapter_info in enumerate(structured_outline):
+                chapter_num = i + 1
+                if i < len(self.book_data["chapters"]):
+                    # Written before the run was interrupted
+                    continue
+                logger.info(f"Writing chapter {chapter_num}: {chapter_info['title']}")
+                
+                # Add chapter number to a copy of the info, leaving the shared
+                # outline unchanged while checkpoints serialize it
+                chapter_info = {**chapter_info, "chapter_num": chapter_num}
+                
+                # Get previous chapters for context (limit to prevent token issues)
+                prev_chapters = self.book_data["chapters"][-2:] if self.book_data["chapters"] else []
+                
+                # Bring the story bible up to date with the chapters written so far
+                self._fold_story_bible()
+                
+                # Stream the chapter into its intermediate file while it is generated
+                output_path = None
+                if self.config.get("output_settings", {}).get("save_intermediates", True) and \
+                        self.materialize_intermediates:
+                    output_path = self._chapter_path(chapter_num)
+                
+                with usage_context(chapter=chapter_num):
+                    # Generate the chapter content
+                    chapter = writer.write_chapter(
+                        chapter_info=chapter_info,
+                        previous_chapters=prev_chapters,
+                        character_profiles=character_profiles,
+                        writing_style=self.config.get("writing_style", "descriptive"),
+                        output_path=output_path,
+                        story_context=self._story_context(chapter_info)
+                    )
+                    
+                    self.book_data["chapters"].append(chapter, "draft")
+                
+                # Quick continuity check every few chapters, overlapping the next chapter
+                if len(self.book_data["chapters"]) > 1 and chapter_num % 3 == 0:
+                    pending[chapter_num] = self._start_interim_check(checks, chapter_num)
+                
+                # Save progress periodically
+                if self.config.get("output_settings", {}).get("save_intermediates", True):
+                    self._save_chapter(chapter_num, chapter)
+                self._update_progress("drafted_chapters", chapter_num)
+                self._report_progress("creation", chapter_num / len(structured_outline))
             
-            # Generate the chapter content
-            chapter = writer.write_chapter(
-                chapter_info=chapter_info,
-                previous_chapters=prev_chapters,
-                character_profiles=self.book_data["character_profiles"],
-                writing_style=self.config.get("writing_style", "descriptive")
-            )
+            self._fold_story_bible()
             
-            self.book_data["chapters"].append(chapter)
+            # Refinement must see every check's results
+            for future in pending.values():
+                if future is not None:
+                    future.result()
+        
+        # Record issues for later refinement, in chapter order
+        for chapter_num, check_results in sorted(self.progress.get("interim_checks", {}).items(),
+                                                 key=lambda item: int(item[0])):
+            if check_results.get("issues", []):
+                self.book_data["reviews"].append({
+                    "type": "interim_continuity",
+                    "chapter": int(chapter_num),
+                    "results": check_results
+                })
+    
+    def _write_chapters_in_parallel(self, structured_outline: List[Dict[str, Any]],
+                                    character_profiles: str) -> None:
+        """
+        Draft all chapters concurrently, then smooth the boundaries between them
+        
+        Instead of the text of the previous chapters, each chapter gets a
+        precomputed summary of the story state at its start, derived from the
+        outline and character profiles. Interim continuity checks are skipped
+        since no chapter has its predecessors available while it is written.
+        The story bible is built from the finished chapters afterwards.
+        
+        Args:
+            structured_outline: Structured chapter outline
+            character_profiles: Character profiles
+        """
+        max_workers = self.config.get("system_settings", {}).get("max_parallel_chapters", 4)
+        plot_architect = self.agents["plot_architect"]
+        chapter_nums = list(range(1, len(structured_outline) + 1))
+        logger.info(f"Writing {len(chapter_nums)} chapters in parallel ({max_workers} at a time)")
+        
+        # Progress is keyed by chapter number, with drafts and seams as revisions
+        # in the chapter store; a resumed run only does what is missing
+        states = self.progress.get("chapter_states", {})
+        drafts = self.progress.get("drafts", {})
+        seams = self.progress.get("seams", {})
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chapter") as executor:
+            # Expected story state at the start of each chapter, planned in batches
+            batch_size = 10
+            missing = [num for num in chapter_nums if str(num) not in states]
+            futures = [
+                submit_in_context(executor, plot_architect.plan_chapter_states,
+                                  structured_outline, character_profiles, missing[i:i + batch_size])
+                for i in range(0, len(missing), batch_size)
+            ]
+            for future in futures:
+                states = {**states, **{str(num): state for num, state in future.result().items()}}
+                self._update_progress("chapter_states", states)
             
-            # Quick continuity check every few chapters
-            if len(self.book_data["chapters"]) > 1 and chapter_num % 3 == 0:
-                self._perform_interim_check(chapter_num)
+            # Draft the chapters
+            futures = {
+                chapter_num: submit_in_context(executor, self._draft_chapter, chapter_info, chapter_num,
+                                               character_profiles, states[str(chapter_num)])
+                for chapter_num, chapter_info in zip(chapter_nums, structured_outline)
+                if str(chapter_num) not in drafts
+            }
+            chapters = ChapterSequence(self.chapter_store, [
+                [num, drafts[str(num)] if num not in futures else futures[num].result()] for num in chapter_nums
+            ])
             
-            # Save progress periodically
-            if self.config.get("output_settings", {}).get("save_intermediates", True):
-                self._save_chapter(chapter_num, chapter)
+            # Rewrite each chapter's opening to follow on from the previous chapter's ending
+            futures = {
+                chapter_num: submit_in_context(executor, self._smooth_seam, chapters[chapter_num - 1],
+                                               chapters[chapter_num - 2], chapter_num)
+                for chapter_num in chapter_nums[1:]
+                if str(chapter_num) not in seams
+            }
+            for chapter_num in chapter_nums[1:]:
+                revision = seams[str(chapter_num)] if chapter_num not in futures else futures[chapter_num].result()
+                chapters.refs[chapter_num - 1] = [chapter_num, revision]
         
-        # Save all chapters together
-        self._save_intermediate_results("creation")
+        self.book_data["chapters"] = chapters
+        self._fold_story_bible()
     
-    def _execute_refinement_phase(self) -> None:
-        """Execute the refinement phase to improve the generated content"""
-        logger.info("Refinement Phase: Checking and improving story quality")
+    def _draft_chapter(self, chapter_info: Dict[str, Any], chapter_num: int,
+                       character_profiles: str, chapter_context: str) -> int:
+        """Write one chapter from its outline-derived context and return its revision"""
+        logger.info(f"Writing chapter {chapter_num}: {chapter_info['title']}")
+        chapter_info = {**chapter_info, "chapter_num": chapter_num}
+        
+        output_path = None
+        if self.config.get("output_settings", {}).get("save_intermediates", True) and \
+                self.materialize_intermediates:
+            output_path = self._chapter_path(chapter_num)
         
-        # Store original versions before refinement
-        original_chapters = self.book_data["chapters"].copy()
+        # The story bible holds only the character sketches until the drafts
+        # are done, so the writer gets the full profiles instead
+        with usage_context(chapter=chapter_num):
+            chapter = self.agents["writer"].write_chapter(
+                chapter_info=chapter_info,
+                previous_chapters=[],
+                character_profiles=character_profiles,
+                writing_style=self.config.get("writing_style", "descriptive"),
+                output_path=output_path,
+                chapter_context=chapter_context
+            )
+        
+        if self.config.get("output_settings", {}).get("save_intermediates", True):
+            self._save_chapter(chapter_num, chapter)
+        revision = self.chapter_store.save(chapter_num, chapter, "draft")
+        self._update_progress("drafts", revision, item=str(chapter_num))
+        self._report_progress("creation", len(self.progress["drafts"]) / len(self.book_data["structured_outline"]))
+        return revision
+    
+    def _seed_story_bible(self, character_profiles: str) -> None:
+        """Start the story bible from sketches of the characters"""
+        logger.info("Starting the story bible from the character profiles")
+        sketches = self.agents["continuity_checker"].sketch_characters(character_profiles)
+        if not sketches:
+            logger.warning("Could not condense the character profiles; the writer falls back to the full profiles")
+        self.book_data["story_bible"] = new_story_bible(sketches)
+    
+    def _fold_story_bible(self) -> None:
+        """
+        Update the story bible with each chapter written since its last update
+        
+        Each chapter costs one small call that reports only what it changes.
+        Chapters restored by a resumed run are folded in as well.
+        """
+        bible = self.book_data.get("story_bible")
+        if bible is None:
+            return
         
-        # Check for continuity issues
         continuity_checker = self.agents["continuity_checker"]
-        continuity_report = continuity_checker.check_story_continuity(
-            chapters=self.book_data["chapters"],
-            character_profiles=self.book_data["character_profiles"],
-            structured_outline=self.book_data["structured_outline"]
-        )
+        for chapter_num in range(bible["chapters"] + 1, len(self.book_data["chapters"]) + 1):
+            with usage_context(chapter=chapter_num):
+                delta = continuity_checker.update_story_bible(bible, self.book_data["chapters"][chapter_num - 1],
+                                                              chapter_num)
+            bible = apply_bible_delta(bible, delta, chapter_num)
+            self.book_data["story_bible"] = bible
+    
+    def _story_context(self, chapter_info: Dict[str, Any]) -> Optional[str]:
+        """
+        Render the story bible for work on a chapter
         
-        self.book_data["reviews"].append({
-            "type": "continuity",
-            "report": continuity_report
-        })
+        Args:
+            chapter_info: Outline entry of the chapter; its title and summary
+                decide which characters and places are relevant
         
-        # Check for style consistency
-        style_reviewer = self.agents["style_reviewer"]
-        style_report = style_reviewer.review_style_consistency(
-            chapters=self.book_data["chapters"],
-            writing_style=self.config.get("writing_style", "descriptive")
-        )
+        Returns:
+            The rendered view, or None without a usable story bible
+        """
+        bible = self.book_data.get("story_bible")
+        if not bible or not bible["characters"]:
+            return None
+        focus = f"{chapter_info.get('title', '')}\n{chapter_info.get('summary', '')}"
+        return render_story_bible(bible, focus=focus)
+    
+    def _smooth_seam(self, chapter: str, previous_chapter: str, chapter_num: int) -> int:
+        """Smooth the transition into a chapter drafted without its predecessor and return its revision"""
+        chapter_summary = self.book_data["structured_outline"][chapter_num - 1].get("summary", "")
+        previous_ending = " ".join(previous_chapter.split()[-300:])
         
-        self.book_data["reviews"].append({
-            "type": "style",
-            "report": style_report
-        })
+        with usage_context(chapter=chapter_num):
+            smoothed = self.agents["writer"].smooth_chapter_opening(
+                chapter=chapter,
+                previous_ending=previous_ending,
+                chapter_summary=chapter_summary
+            )
         
-        # Check for pacing issues
-        pacing_advisor = self.agents["pacing_advisor"]
-        pacing_report = pacing_advisor.analyze_pacing(
-            chapters=self.book_data["chapters"],
-            structured_outline=self.book_data["structured_outline"]
-        )
+        if smoothed != chapter and self.config.get("output_settings", {}).get("save_intermediates", True):
+            self._save_chapter(chapter_num, smoothed)
+        revision = self.chapter_store.save(chapter_num, smoothed, "seam")
+        self._update_progress("seams", revision, item=str(chapter_num))
+        return revision
+    
+    def _run_review(self, review_type: str, draft_chapters: List[str],
+                    structured_outline: List[Dict[str, Any]], character_profiles: str) -> Dict[str, Any]:
+        """
+        Run one of the refinement reviews over the drafted chapters
         
-        self.book_data["reviews"].append({
-            "type": "pacing",
-            "report": pacing_report
-        })
+        Reviews only read the chapters, so all of them can run at the same time.
         
-        # Refine dialogue
-        dialogue_expert = self.agents["dialogue_expert"]
-        dialogue_report = dialogue_expert.refine_dialogue(
-            chapters=self.book_data["chapters"],
-            character_profiles=self.book_data["character_profiles"]
-        )
+        Args:
+            review_type: One of REVIEW_TYPES
+            draft_chapters: The chapters written in the creation phase
+            structured_outline: Structured chapter outline
+            character_profiles: Character profiles
+        
+        Returns:
+            Dictionary with the review's report
+        """
+        logger.info(f"Refinement Phase: Running {review_type} review")
+        
+        if self.budget is not None and self.budget.is_active("fewer_reviews") and \
+                review_type in self.budget.optional_reviews:
+            logger.warning(f"Skipping the {review_type} review to stay within the budget")
+            return {f"{review_type}_report": {"chapter_fixes": {}, "total_fixes": 0, "skipped": "budget"}}
+        
+        if review_type == "continuity":
+            # Check for continuity issues
+            report = self.agents["continuity_checker"].check_story_continuity(
+                chapters=draft_chapters,
+                character_profiles=character_profiles,
+                structured_outline=structured_outline
+            )
+        elif review_type == "style":
+            # Check for style consistency
+            report = self.agents["style_reviewer"].review_style_consistency(
+                chapters=draft_chapters,
+                writing_style=self.config.get("writing_style", "descriptive")
+            )
+        elif review_type == "pacing":
+            # Check for pacing issues
+            report = self.agents["pacing_advisor"].analyze_pacing(
+                chapters=draft_chapters,
+                structured_outline=structured_outline
+            )
+        elif review_type == "dialogue":
+            # Refine dialogue
+            report = self.agents["dialogue_expert"].refine_dialogue(
+                chapters=draft_chapters,
+                character_profiles=character_profiles
+            )
+        else:
+            raise ValueError(f"Unknown review type: {review_type}")
+        
+        return {f"{review_type}_report": report}
+    
+    def _execute_refinement_phase(self, draft_chapters: List[str],
+                                  continuity_report: Dict[str, Any],
+                                  style_report: Dict[str, Any],
+                                  pacing_report: Dict[str, Any],
+                                  dialogue_report: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute the refinement phase to apply the review fixes to each chapter"""
+        logger.info("Refinement Phase: Checking and improving story quality")
+        
+        # A resumed run continues after the last refined chapter
+        refined = self.progress.get("refined_chapters")
+        if refined is None:
+            # Record the reviews in a fixed order, whichever finished first,
+            # replacing those of an earlier build
+            self.book_data["reviews"] = [review for review in self.book_data["reviews"]
+                                         if review["type"] not in self.REVIEW_TYPES]
+            for review_type, report in (("continuity", continuity_report), ("style", style_report),
+                                        ("pacing", pacing_report), ("dialogue", dialogue_report)):
+                self.book_data["reviews"].append({
+                    "type": review_type,
+                    "report": report
+                })
+            self.book_data["chapters"] = self._as_chapters(draft_chapters)
+            refined = 0
+            self._update_progress("refined_chapters", refined)
         
-        self.book_data["reviews"].append({
-            "type": "dialogue",
-            "report": dialogue_report
-        })
+        reports = {"continuity": continuity_report, "style": style_report,
+                   "pacing": pacing_report, "dialogue": dialogue_report}
         
         # Apply refinements
         for i, chapter in enumerate(self.book_data["chapters"]):
             chapter_num = i + 1
-            logger.info(f"Refining chapter {chapter_num}")
+            if i < refined:
+                continue
             
-            # Apply continuity fixes
-            continuity_fixes = continuity_report.get("chapter_fixes", {}).get(str(chapter_num), [])
-            if continuity_fixes:
-                chapter = continuity_checker.apply_fixes(chapter, continuity_fixes)
-            
-            # Apply style improvements
-            style_fixes = style_report.get("chapter_fixes", {}).get(str(chapter_num), [])
-            if style_fixes:
-                chapter = style_reviewer.apply_fixes(chapter, style_fixes)
-            
-            # Apply pacing improvements
-            pacing_fixes = pacing_report.get("chapter_fixes", {}).get(str(chapter_num), [])
-            if pacing_fixes:
-                chapter = pacing_advisor.apply_fixes(chapter, pacing_fixes)
-            
-            # Apply dialogue improvements
-            dialogue_fixes = dialogue_report.get("chapter_fixes", {}).get(str(chapter_num), [])
-            if dialogue_fixes:
-                chapter = dialogue_expert.apply_fixes(chapter, dialogue_fixes)
+            fixes = {review_type: reports[review_type].get("chapter_fixes", {}).get(str(chapter_num), [])
+                     for review_type in self.REVIEW_TYPES}
+            if self.budget is not None and self.budget.is_active("fewer_reviews"):
+                fixes = {review_type: ([] if review_type in self.budget.optional_reviews else review_fixes)
+                         for review_type, review_fixes in fixes.items()}
+            if any(fixes.values()):
+                logger.info(f"Refining chapter {chapter_num}")
+                # Chapters whose text and fixes are unchanged since the previous build are not redone
+                settings = self._fingerprint_data("refinement", list(self.REVIEW_AGENTS.values()))
+                chapter = self._memoized(
+                    "refinement",
+                    {"chapter": chapter, "fixes": fixes, "agents": settings["agents"],
+                     "combined": settings["combined_refinement"]},
+                    lambda: self._apply_review_fixes(chapter, chapter_num, fixes),
+                    chapter_num
+                )
             
             # Update the chapter
-            self.book_data["chapters"][i] = chapter
+            self.book_data["chapters"].set(i, chapter, "refinement")
+            self._update_progress("refined_chapters", chapter_num)
+            # The four reviews make up most of the phase before refinement starts
+            self._report_progress("refinement", 0.8 + 0.2 * chapter_num / len(self.book_data["chapters"]))
         
         # Save refined chapters
         self._save_intermediate_results("refinement")
@@ -331,28 +1054,67 @@ class BookGenerationOrchestrator:
             "pacing_fixes": pacing_report.get("total_fixes", 0),
             "dialogue_fixes": dialogue_report.get("total_fixes", 0)
         }
+        self._clear_progress("refined_chapters")
+        
+        return {"refined_chapters": self.book_data["chapters"].copy()}
+    
+    def _apply_review_fixes(self, chapter: str, chapter_num: int, fixes: Dict[str, List[Any]]) -> str:
+        """
+        Apply the fixes from each review to a chapter
+        
+        By default the issues of all reviews are merged into one plan
+        (duplicates removed, ordered by position) and applied in a single
+        revision. With combined_refinement off, each review applies its own
+        fixes in REVIEW_TYPES order, rewriting the chapter up to four times.
+        
+        Args:
+            chapter: The chapter content
+            chapter_num: Chapter number (1-based)
+            fixes: Fixes for this chapter keyed by review type
+        
+        Returns:
+            The refined chapter
+        """
+        with usage_context(chapter=chapter_num):
+            if self.combined_refinement:
+                plan = plan_chapter_fixes(chapter, fixes)
+                logger.info(f"Applying {len(plan)} merged fixes to chapter {chapter_num} "
+                            f"({sum(len(f) for f in fixes.values())} reported)")
+                return self.agents["continuity_checker"].apply_fix_plan(chapter, plan)
+            
+            for review_type in self.REVIEW_TYPES:
+                if fixes[review_type]:
+                    chapter = self.agents[self.REVIEW_AGENTS[review_type]].apply_fixes(chapter, fixes[review_type])
+        return chapter
     
-    def _execute_qa_phase(self) -> None:
+    def _execute_qa_phase(self, refined_chapters: List[str], outline: str,
+                          character_profiles: str) -> Dict[str, Any]:
         """Execute the quality assurance phase for final checks"""
         logger.info("QA Phase: Performing final quality checks")
         
-        # Final quality check
+        # Final quality check (already done if the run is being resumed)
         quality_analyst = self.agents["quality_analyst"]
-        qa_report = quality_analyst.evaluate_book_quality(
-            chapters=self.book_data["chapters"],
-            character_profiles=self.book_data["character_profiles"],
-            outline=self.book_data["outline"],
-            genre=self.config.get("genre", "fiction"),
-            writing_style=self.config.get("writing_style", "descriptive")
-        )
-        
-        self.book_data["reviews"].append({
-            "type": "quality",
-            "report": qa_report
-        })
-        
-        # Store final quality score
-        self.book_data["final_score"] = qa_report.get("scores", {})
+        qa_report = self.progress.get("qa_report")
+        if qa_report is None:
+            self.book_data["chapters"] = self._as_chapters(refined_chapters)
+            self.book_data["reviews"] = [review for review in self.book_data["reviews"]
+                                         if review["type"] != "quality"]
+            qa_report = quality_analyst.evaluate_book_quality(
+                chapters=self.book_data["chapters"],
+                character_profiles=character_profiles,
+                outline=outline,
+                genre=self.config.get("genre", "fiction"),
+                writing_style=self.config.get("writing_style", "descriptive")
+            )
+            
+            self.book_data["reviews"].append({
+                "type": "quality",
+                "report": qa_report
+            })
+            
+            # Store final quality score
+            self.book_data["final_score"] = qa_report.get("scores", {})
+            self._update_progress("qa_report", qa_report)
         
         # If quality score is too low, attempt improvements
         overall_score = qa_report.get("scores", {}).get("overall", 0)
@@ -362,35 +1124,38 @@ class BookGenerationOrchestrator:
             # Apply critical improvements
             critical_issues = qa_report.get("critical_issues", [])
             if critical_issues:
-                for i, chapter in enumerate(self.book_data["chapters"]):
+                fixed = self.progress.get("qa_fixed_chapters", 0)
+                for i in range(len(self.book_data["chapters"])):
                     chapter_issues = [issue for issue in critical_issues if issue.get("chapter") == i+1]
-                    if chapter_issues:
-                        self.book_data["chapters"][i] = quality_analyst.fix_critical_issues(
-                            chapter=chapter,
-                            issues=chapter_issues
-                        )
-        
-        # Generate a book title if not already set
-        if not self.book_data["metadata"]["title"]:
-            self.book_data["metadata"]["title"] = quality_analyst.generate_title(
-                chapters=self.book_data["chapters"],
-                outline=self.book_data["outline"],
-                genre=self.config.get("genre", "fiction")
-            )
+                    if chapter_issues and i >= fixed:
+                        chapter = self.book_data["chapters"][i]
+                        with usage_context(chapter=i+1):
+                            fixed_chapter = self._memoized(
+                                "qa_fix",
+                                {"chapter": chapter, "issues": chapter_issues,
+                                 "agents": self._fingerprint_data("qa", ["quality_analyst"])["agents"]},
+                                lambda: quality_analyst.fix_critical_issues(
+                                    chapter=chapter,
+                                    issues=chapter_issues
+                                ),
+                                i + 1
+                            )
+                        self.book_data["chapters"].set(i, fixed_chapter, "qa")
+                        self._update_progress("qa_fixed_chapters", i + 1)
         
         # Save QA results
         self._save_intermediate_results("qa")
-    
-    def _execute_publishing_phase(self) -> None:
-        """Execute the publishing phase to create the final book files"""
-        logger.info("Publishing Phase: Creating final book files")
+        self._clear_progress("qa_report", "qa_fixed_chapters")
         
-        # If we don't have a title yet, generate one
+        return {"final_chapters": self.book_data["chapters"].copy()}
+    
+    def _generate_title(self, refined_chapters: List[str], outline: str) -> Dict[str, Any]:
+        """Generate a book title if not already set"""
         if not self.book_data["metadata"]["title"]:
             quality_analyst = self.agents["quality_analyst"]
             self.book_data["metadata"]["title"] = quality_analyst.generate_title(
-                chapters=self.book_data["chapters"][:1],  # Just use first chapter for speed
-                outline=self.book_data["outline"],
+                chapters=refined_chapters,
+                outline=outline,
                 genre=self.config.get("genre", "fiction")
             )
         title = self.book_data["metadata"]["title"]
@@ -402,128 +1167,163 @@ class BookGenerationOrchestrator:
             self.book_data["metadata"]["title"] = title
             logger.info(f"Extracted title string: {title}")
         
-        # Create output formats
-        formats = self.config.get("output_settings", {}).get("formats", ["txt", "epub"])
-        if "txt" in formats:
-            # Save as plain text
-            self._save_as_text(title)
+        return {"title": title}
+    
+    def _export_text(self, final_chapters: List[str], title: str) -> Dict[str, Any]:
+        """Save the finished book as a plain text file"""
+        return {"text_path": self._save_as_text(title, final_chapters)}
+    
+    def _generate_cover(self, title: str, outline: str) -> Dict[str, Any]:
+        """Generate the cover image if configured; failures leave the book without a cover"""
+        cover_image_path = None
+        if self.config.get("output_settings", {}).get("generate_cover", True):
+            cover_designer = self.agents["cover_designer"]
+            try:
+                genre = self.config.get("genre", "fiction")
+                
+                cover_dir = os.path.join(self.output_dir, "images")
+                os.makedirs(cover_dir, exist_ok=True)
+                cover_image_path = os.path.join(cover_dir, "cover.png")
+                
+                logger.info(f"Generating cover image for '{title}'")
+                cover_image_path = cover_designer.generate_cover_image(
+                    title=title,
+                    genre=genre,
+                    outline=outline,
+                    output_path=cover_image_path,
+                    orientation=self.config.get("output_settings", {}).get("cover_defaults", {}).get("orientation", "portrait")
+                )
+                
+                if cover_image_path:
+                    logger.info(f"Cover image created: {cover_image_path}")
+                else:
+                    logger.warning("Failed to generate cover image")
+            except Exception as e:
+                logger.error(f"Error generating cover image: {e}")
+                cover_image_path = None
+        
+        return {"cover_image_path": cover_image_path}
+    
+    def _export_epub(self, final_chapters: List[str], title: str,
+                     cover_image_path: Optional[str]) -> Dict[str, Any]:
+        """Save the finished book as an EPUB file"""
+        return {"epub_path": self._save_as_epub(title, cover_image_path, final_chapters)}
+    
+    def _execute_publishing_phase(self, final_chapters: List[str], title: str, **exports) -> Dict[str, Any]:
+        """Finish publishing once every output format has been written"""
+        # The final text and title, also when they were reused from a previous build
+        self.book_data["chapters"] = self._as_chapters(final_chapters)
+        self.book_data["metadata"]["title"] = title
         
-        if "epub" in formats:
-            # Generate cover image if configured
-            cover_image_path = None
-            if self.config.get("output_settings", {}).get("generate_cover", True):
-                cover_designer = self.agents["cover_designer"]
-                try:
-                    title = self.book_data["metadata"]["title"]
-                    genre = self.config.get("genre", "fiction")
-                    outline = self.book_data["outline"]
-                    
-                    cover_dir = os.path.join(self.output_dir, "images")
-                    os.makedirs(cover_dir, exist_ok=True)
-                    cover_image_path = os.path.join(cover_dir, "cover.png")
-                    
-                    logger.info(f"Generating cover image for '{title}'")
-                    cover_image_path = cover_designer.generate_cover_image(
-                        title=title,
-                        genre=genre,
-                        outline=outline,
-                        output_path=cover_image_path,
-                        orientation=self.config.get("output_settings", {}).get("cover_defaults", {}).get("orientation", "portrait")
-                    )
-                    
-                    if cover_image_path:
-                        logger.info(f"Cover image created: {cover_image_path}")
-                    else:
-                        logger.warning("Failed to generate cover image")
-                except Exception as e:
-                    logger.error(f"Error generating cover image: {e}")
-                    cover_image_path = None
-            
-            # Create EPUB
-            self._save_as_epub(title, cover_image_path)
         # Save final metadata
         metadata_path = os.path.join(self.output_dir, "book_metadata.json")
         with open(metadata_path, "w") as f:
             json.dump(self.book_data["metadata"], f, indent=2)
         
         logger.info(f"Book generation complete. Files saved to {self.output_dir}")
+        return {"metadata_path": metadata_path}
+    
+    def _start_interim_check(self, executor: ThreadPoolExecutor, chapter_num: int) -> Optional[Future]:
+        """
+        Start a quick continuity check of the chapters written so far in the background
+        
+        The check sees the chapters and story bible as they are now, so the
+        next chapter can be written while it runs.
+        
+        Args:
+            executor: Executor for the checks
+            chapter_num: Last chapter covered by the check
+        
+        Returns:
+            The check's future, or None if the check is skipped
+        """
+        if self.budget is not None and self.budget.is_active("skip_interim_checks"):
+            logger.info(f"Skipping the interim continuity check after chapter {chapter_num} to stay within the budget")
+            return None
+        
+        chapters = self.book_data["chapters"][:chapter_num]
+        story_context = self._story_context(self.book_data["structured_outline"][chapter_num - 1])
+        with usage_context(chapter=chapter_num):
+            return submit_in_context(executor, self._perform_interim_check, chapter_num, chapters, story_context)
     
-    def _perform_interim_check(self, chapter_num: int) -> None:
+    def _perform_interim_check(self, chapter_num: int, chapters: List[str],
+                               story_context: Optional[str] = None) -> None:
         """Perform a quick continuity check during chapter creation"""
         logger.info(f"Performing interim continuity check after chapter {chapter_num}")
         
         continuity_checker = self.agents["continuity_checker"]
         check_results = continuity_checker.quick_check(
-            chapters=self.book_data["chapters"],
-            character_profiles=self.book_data["character_profiles"]
+            chapters=chapters,
+            character_profiles=self.book_data["character_profiles"],
+            story_context=story_context
         )
         
         if check_results.get("issues", []):
-            logger.warning(f"Found {len(check_results['issues'])} continuity issues")
-            
-            # Record issues for later refinement
-            self.book_data["reviews"].append({
-                "type": "interim_continuity",
-                "chapter": chapter_num,
-                "results": check_results
-            })
+            logger.warning(f"Found {len(check_results['issues'])} continuity issues after chapter {chapter_num}")
+        self._update_progress("interim_checks", check_results, item=str(chapter_num))
     
     def _save_intermediate_results(self, phase: str) -> None:
-        """Save intermediate results from the current phase"""
+        """
+        Save intermediate results from the current phase
+        
+        The results are only queued for the artifact log; chapters already
+        in the log are referenced rather than written again.
+        """
         if not self.config.get("output_settings", {}).get("save_intermediates", True):
             return
-            
-        os.makedirs(os.path.join(self.output_dir, "intermediates"), exist_ok=True)
-        phase_dir = os.path.join(self.output_dir, "intermediates", phase)
-        os.makedirs(phase_dir, exist_ok=True)
         
         # Save relevant data based on phase
         if phase == "planning":
-            # Save outline
-            outline_path = os.path.join(phase_dir, "outline.txt")
-            with open(outline_path, "w") as f:
-                f.write(self.book_data["outline"])
-            
-            # Save character profiles
-            profiles_path = os.path.join(phase_dir, "character_profiles.txt")
-            with open(profiles_path, "w") as f:
-                f.write(self.book_data["character_profiles"])
+            # Save outline and character profiles
+            self.intermediates.write("planning/outline.txt", self.book_data["outline"])
+            self.intermediates.write("planning/character_profiles.txt", self.book_data["character_profiles"])
             
         elif phase == "creation":
             # Save all chapters
-            combined_path = os.path.join(phase_dir, "all_chapters.txt")
-            with open(combined_path, "w") as f:
-                for i, chapter in enumerate(self.book_data["chapters"]):
-                    f.write(f"Chapter {i+1}: {self.book_data['structured_outline'][i]['title']}\n\n")
-                    f.write(chapter)
-                    f.write("\n\n---\n\n")
+            self.intermediates.write("creation/all_chapters.txt", self._chapter_parts())
+            
+            # Save the story bible
+            if "story_bible" in self.book_data:
+                self.intermediates.write_json("creation/story_bible.json", self.book_data["story_bible"])
         
         elif phase == "refinement" or phase == "qa":
-            # Save reviews
-            reviews_path = os.path.join(phase_dir, f"{phase}_reviews.json")
-            with open(reviews_path, "w") as f:
-                json.dump(self.book_data["reviews"], f, indent=2)
+            # Save reviews (a copy, since later phases add to the list)
+            self.intermediates.write_json(f"{phase}/{phase}_reviews.json", list(self.book_data["reviews"]))
             
             # Save refined chapters
-            refined_path = os.path.join(phase_dir, "refined_chapters.txt")
-            with open(refined_path, "w") as f:
-                for i, chapter in enumerate(self.book_data["chapters"]):
-                    f.write(f"Chapter {i+1}: {self.book_data['structured_outline'][i]['title']}\n\n")
-                    f.write(chapter)
-                    f.write("\n\n---\n\n")
+            self.intermediates.write(f"{phase}/refined_chapters.txt", self._chapter_parts())
+    
+    def _chapter_parts(self) -> List[str]:
+        """Return the current chapters with their headings as parts of an intermediate file"""
+        parts = []
+        for i, chapter in enumerate(self.book_data["chapters"]):
+            parts.extend([f"Chapter {i+1}: {self.book_data['structured_outline'][i]['title']}\n\n",
+                          chapter, "\n\n---\n\n"])
+        return parts
+    
+    def _chapter_path(self, chapter_num: int) -> str:
+        """Return the intermediate file path for a chapter"""
+        return os.path.join(self.output_dir, "intermediates", "chapters", f"chapter_{chapter_num:02d}.txt")
     
     def _save_chapter(self, chapter_num: int, content: str) -> None:
-        """Save an individual chapter file"""
-        chapters_dir = os.path.join(self.output_dir, "intermediates", "chapters")
-        os.makedirs(chapters_dir, exist_ok=True)
+        """Save an individual chapter to the artifact log"""
+        chapter_title = self.book_data["structured_outline"][chapter_num-1]["title"]
+        self.intermediates.write(f"chapters/chapter_{chapter_num:02d}.txt",
+                                 [f"Chapter {chapter_num}: {chapter_title}\n\n", content])
+    
+    def _finish_intermediates(self) -> None:
+        """
+        Wait for the queued intermediate results and write them out as files
         
-        chapter_path = os.path.join(chapters_dir, f"chapter_{chapter_num:02d}.txt")
-        with open(chapter_path, "w") as f:
-            chapter_title = self.book_data["structured_outline"][chapter_num-1]["title"]
-            f.write(f"Chapter {chapter_num}: {chapter_title}\n\n")
-            f.write(content)
+        Only the files this run changed are written, so chapters edited by
+        hand for an incremental rebuild are left alone. A resumed run writes
+        all of them, including those of the attempts before it.
+        """
+        if self.materialize_intermediates:
+            self.intermediates.materialize(None if self._resumed else set(self.intermediates.written))
+        self.intermediates.close()
     
-    def _save_as_text(self, title: str) -> None:
+    def _save_as_text(self, title: str, chapters: Optional[List[str]] = None) -> str:
         """Save the book as a plain text file"""
         sanitized_title = self._sanitize_filename(title)
         text_path = os.path.join(self.output_dir, f"{sanitized_title}.txt")
@@ -532,15 +1332,17 @@ class BookGenerationOrchestrator:
             f.write(f"{title}\n")
             f.write(f"by {self.book_data['metadata']['author']}\n\n")
             
-            for i, chapter in enumerate(self.book_data["chapters"]):
+            for i, chapter in enumerate(chapters or self.book_data["chapters"]):
                 chapter_title = self.book_data["structured_outline"][i]["title"]
                 f.write(f"Chapter {i+1}: {chapter_title}\n\n")
                 f.write(chapter)
                 f.write("\n\n")
         
         logger.info(f"Book saved as text file: {text_path}")
+        return text_path
     
-    def _save_as_epub(self, title: str, cover_image_path: Optional[str] = None) -> None:
+    def _save_as_epub(self, title: str, cover_image_path: Optional[str] = None,
+                      chapters: Optional[List[str]] = None) -> str:
         """Save the book as an EPUB file"""
         sanitized_title = self._sanitize_filename(title)
         epub_path = os.path.join(self.output_dir, f"{sanitized_title}.epub")
@@ -549,13 +1351,14 @@ class BookGenerationOrchestrator:
         create_epub(
             title=title,
             author=self.book_data["metadata"]["author"],
-            chapters=self.book_data["chapters"],
+            chapters=chapters or self.book_data["chapters"],
             chapter_titles=[chapter["title"] for chapter in self.book_data["structured_outline"]],
             cover_image_path=cover_image_path,
             output_path=epub_path
         )
         
         logger.info(f"Book saved as EPUB file: {epub_path}")
+        return epub_path
     
     def _save_metrics(self) -> None:
         """Save execution metrics to a file"""
@@ -566,6 +1369,17 @@ class BookGenerationOrchestrator:
         end_time = datetime.fromisoformat(self.metrics["end_time"])
         self.metrics["total_time"] = (end_time - start_time).total_seconds()
         
+        # Token usage reported by the providers during this run
+        self.metrics["token_usage"] = self.usage_tracker.to_dict()
+        self.metrics["provider_health"] = self.llm_provider.router.stats()
+        if self.budget is not None:
+            self.metrics["budget"] = self.budget.report()
+            if self.budget.refused_calls:
+                # A refused call fails its task, which stops the run
+                stopped_at = self.metrics.get("failed_task")
+                logger.warning(f"The budget refused {self.budget.refused_calls} calls"
+                               + (f"; the run stopped at task '{stopped_at}'" if stopped_at else ""))
+        
         with open(metrics_path, "w") as f:
             json.dump(self.metrics, f, indent=2)
     
@@ -0,0 +1,203 @@
+"""
+Provider Router
+Tracks rolling latency and error statistics for each LLM provider, trips a
+circuit breaker on repeated failures and decides when a slow request should
+be hedged with a duplicate on another provider.
+"""
+import time
+import math
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class ProviderHealth:
+    """Rolling statistics and circuit breaker state for one provider"""
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, window_size: int = 50):
+        """
+        Initialize the statistics
+        
+        Args:
+            window_size: Number of recent calls kept for latency and error rates
+        """
+        self.latencies = deque(maxlen=window_size)
+        self.outcomes = deque(maxlen=window_size)
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.last_error = None
+    
+    def percentile(self, percent: float) -> Optional[float]:
+        """Return the given latency percentile, or None without samples"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+        return ordered[index]
+    
+    def error_rate(self) -> float:
+        """Return the fraction of failed calls in the window"""
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class ProviderRouter:
+    """Health-aware ordering, circuit breaking and hedging decisions for providers"""
+    
+    def __init__(self, config: Dict[str, Any]):
+        """
+        Initialize the router from llm_settings.routing
+        
+        The provider event loop records outcomes while other threads read
+        stats(), so all health state is guarded by one lock.
+        
+        Args:
+            config: The global configuration dictionary
+        """
+        settings = config.get("llm_settings", {}).get("routing", {})
+        self.window_size = settings.get("window_size", 50)
+        self.failure_threshold = settings.get("failure_threshold", 5)
+        self.cooldown_seconds = settings.get("cooldown_seconds", 30)
+        
+        hedging = settings.get("hedging", {})
+        self.hedging_enabled = hedging.get("enabled", True)
+        self.hedge_percentile = hedging.get("percentile", 95)
+        self.hedge_min_samples = hedging.get("min_samples", 10)
+        self.hedge_min_delay = hedging.get("min_delay", 2)
+        
+        self._health: Dict[str, ProviderHealth] = {}
+        self._lock = threading.RLock()
+    
+    def health(self, provider: str) -> ProviderHealth:
+        """Return the statistics for a provider, creating them on first use"""
+        with self._lock:
+            if provider not in self._health:
+                self._health[provider] = ProviderHealth(self.window_size)
+            return self._health[provider]
+    
+    def is_available(self, provider: str) -> bool:
+        """
+        Check whether a request may be sent to a provider
+        
+        An open circuit rejects requests until the cooldown has passed, then
+        lets a single trial request through (half-open) to probe recovery.
+        
+        Args:
+            provider: Provider name
+        
+        Returns:
+            True if the provider should be tried now
+        """
+        with self._lock:
+            health = self.health(provider)
+            if health.state == ProviderHealth.CLOSED:
+                return True
+            if health.state == ProviderHealth.OPEN and time.monotonic() - health.opened_at >= self.cooldown_seconds:
+                health.state = ProviderHealth.HALF_OPEN
+                logger.info(f"Circuit for {provider} half-open, sending a trial request")
+                return True
+            return False
+    
+    def order(self, providers: List[str]) -> List[str]:
+        """
+        Order providers for a request, keeping preference order among available ones
+        
+        Providers with an open circuit go last so they are still used as a last
+        resort when everything else fails.
+        
+        Args:
+            providers: Providers in order of preference
+        
+        Returns:
+            The providers to try, in order
+        """
+        with self._lock:
+            available = [p for p in providers if self.is_available(p)]
+            return available + [p for p in providers if p not in available]
+    
+    def record_success(self, provider: str, latency: Optional[float] = None) -> None:
+        """
+        Record a successful call and close the provider's circuit
+        
+        Args:
+            provider: Provider name
+            latency: Request latency in seconds, or None if it should not
+                count towards the hedging percentile (e.g. streamed calls)
+        """
+        with self._lock:
+            health = self.health(provider)
+            health.outcomes.append(True)
+            if latency is not None:
+                health.latencies.append(latency)
+            health.consecutive_failures = 0
+            if health.state != ProviderHealth.CLOSED:
+                logger.info(f"Circuit for {provider} closed")
+                health.state = ProviderHealth.CLOSED
+    
+    def record_failure(self, provider: str, error: Exception) -> None:
+        """
+        Record a failed call, opening the circuit after repeated failures
+        
+        Args:
+            provider: Provider name
+            error: The exception raised by the call
+        """
+        with self._lock:
+            health = self.health(provider)
+            health.outcomes.append(False)
+            health.consecutive_failures += 1
+            health.last_error = str(error)
+            
+            if health.state == ProviderHealth.HALF_OPEN or (
+                    health.state == ProviderHealth.CLOSED and health.consecutive_failures >= self.failure_threshold):
+                health.state = ProviderHealth.OPEN
+                health.opened_at = time.monotonic()
+                logger.warning(f"Circuit for {provider} opened after {health.consecutive_failures} "
+                               f"consecutive failures; retrying in {self.cooldown_seconds}s")
+    
+    def hedge_delay(self, provider: str) -> Optional[float]:
+        """
+        Return how long to wait on a provider before hedging, or None to not hedge
+        
+        The delay is the provider's observed latency percentile, once enough
+        samples exist.
+        
+        Args:
+            provider: Provider name
+        
+        Returns:
+            Delay in seconds or None
+        """
+        if not self.hedging_enabled:
+            return None
+        with self._lock:
+            health = self.health(provider)
+            if len(health.latencies) < self.hedge_min_samples:
+                return None
+            return max(self.hedge_min_delay, health.percentile(self.hedge_percentile))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return a JSON-serializable summary of provider health"""
+        with self._lock:
+            summary = {}
+            for provider, health in self._health.items():
+                p50 = health.percentile(50)
+                p95 = health.percentile(95)
+                summary[provider] = {
+                    "state": health.state,
+                    "calls": len(health.outcomes),
+                    "error_rate": round(health.error_rate(), 3),
+                    "p50_latency": round(p50, 3) if p50 is not None else None,
+                    "p95_latency": round(p95, 3) if p95 is not None else None,
+                    "consecutive_failures": health.consecutive_failures,
+                    "last_error": health.last_error
+                }
+            return summary
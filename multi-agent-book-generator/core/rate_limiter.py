@@ -0,0 +1,204 @@
+"""
+Rate Limiter
+Proactive token-bucket limiting of requests and tokens per minute for each
+provider/model pair, shared by every agent using the same LLMProvider.
+"""
+import time
+import asyncio
+import logging
+from typing import Callable, Dict, Any, Optional, Tuple
+
+from utils.text_processing import get_token_counter
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Async token bucket that serves waiters in FIFO order"""
+    
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        Initialize the bucket
+        
+        Args:
+            per_minute: Refill rate in units per minute
+            capacity: Maximum burst size (defaults to one minute of refill)
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = None
+    
+    def _refill(self) -> None:
+        """Add tokens for the time elapsed since the last update"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    async def acquire(self, amount: float = 1) -> float:
+        """
+        Wait until the requested amount is available and consume it
+        
+        The lock is FIFO, so callers are served in arrival order and a large
+        request cannot be starved by a stream of small ones.
+        
+        Args:
+            amount: Units to consume (capped at the bucket capacity)
+        
+        Returns:
+            Seconds spent sleeping for refill
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+    
+    def refund(self, amount: float) -> None:
+        """Return unused units, e.g. when actual usage was below the estimate"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+    
+    def drain(self) -> None:
+        """Empty the bucket so queued callers back off together after a 429"""
+        self._refill()
+        self.tokens = min(self.tokens, 0)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits keyed by provider and model"""
+    
+    def __init__(self, config: Dict[str, Any], count_tokens: Optional[Callable[[str], int]] = None):
+        """
+        Initialize the rate limiter from llm_settings.rate_limit
+        
+        Args:
+            config: The global configuration dictionary
+            count_tokens: Token counter for prompts (defaults to the one
+                configured by llm_settings.tokenizer)
+        """
+        self.settings = config.get("llm_settings", {}).get("rate_limit", {})
+        self.count_tokens = count_tokens or get_token_counter(config.get("llm_settings", {}).get("tokenizer"))
+        self._buckets: Dict[Tuple[str, str], Tuple[Optional[TokenBucket], Optional[TokenBucket]]] = {}
+    
+    def _get_limits(self, provider: str, model: str) -> Tuple[Optional[float], Optional[float]]:
+        """Resolve RPM/TPM limits, preferring provider/model over provider over global settings"""
+        provider_limits = self.settings.get("providers", {})
+        candidates = [
+            provider_limits.get(f"{provider}/{model}", {}),
+            provider_limits.get(provider, {}),
+            self.settings
+        ]
+        
+        rpm = next((c["requests_per_minute"] for c in candidates if c.get("requests_per_minute")), None)
+        tpm = next((c["tokens_per_minute"] for c in candidates if c.get("tokens_per_minute")), None)
+        return rpm, tpm
+    
+    def _get_buckets(self, provider: str, model: str) -> Tuple[Optional[TokenBucket], Optional[TokenBucket]]:
+        """Return the (requests, tokens) buckets for a provider/model pair"""
+        key = (provider, model)
+        if key not in self._buckets:
+            rpm, tpm = self._get_limits(provider, model)
+            self._buckets[key] = (
+                TokenBucket(rpm) if rpm else None,
+                TokenBucket(tpm) if tpm else None
+            )
+            if rpm or tpm:
+                logger.info(f"Rate limiting {provider}/{model}: {rpm or 'unlimited'} RPM, {tpm or 'unlimited'} TPM")
+        return self._buckets[key]
+    
+    async def acquire(self, provider: str, model: str, estimated_tokens: int) -> float:
+        """
+        Wait for capacity for one request of the estimated size
+        
+        Args:
+            provider: Provider name
+            model: Model name
+            estimated_tokens: Estimated prompt plus completion tokens
+        
+        Returns:
+            Seconds spent waiting
+        """
+        request_bucket, token_bucket = self._get_buckets(provider, model)
+        started = time.monotonic()
+        if request_bucket is not None:
+            await request_bucket.acquire(1)
+        if token_bucket is not None:
+            try:
+                await token_bucket.acquire(estimated_tokens)
+            except asyncio.CancelledError:
+                # A timed-out or cancelled caller never sends its request
+                if request_bucket is not None:
+                    request_bucket.refund(1)
+                raise
+        waited = time.monotonic() - started
+        
+        if waited > 1:
+            logger.info(f"Rate limiter delayed {provider}/{model} request by {waited:.2f} seconds")
+        return waited
+    
+    def refund(self, provider: str, model: str, unused_tokens: int) -> None:
+        """
+        Return tokens reserved by an estimate that turned out too high
+        
+        Args:
+            provider: Provider name
+            model: Model name
+            unused_tokens: Difference between the estimate and actual usage
+        """
+        _, token_bucket = self._get_buckets(provider, model)
+        if token_bucket is not None and unused_tokens > 0:
+            token_bucket.refund(unused_tokens)
+    
+    def reset_locks(self) -> None:
+        """Drop the bucket locks so they are recreated on the next event loop"""
+        for buckets in self._buckets.values():
+            for bucket in buckets:
+                if bucket is not None:
+                    bucket._lock = None
+    
+    def penalize(self, provider: str, model: str) -> None:
+        """
+        Drain the buckets after the provider reported a rate limit error
+        
+        Args:
+            provider: Provider name
+            model: Model name
+        """
+        for bucket in self._get_buckets(provider, model):
+            if bucket is not None:
+                bucket.drain()
+    
+    def estimate_tokens(self, prompt: str, max_tokens: int) -> int:
+        """
+        Estimate the tokens a request counts against TPM limits
+        
+        Providers reserve max_tokens for the completion up front, so the
+        estimate is the counted prompt tokens plus max_tokens.
+        
+        Args:
+            prompt: The prompt text
+            max_tokens: Maximum output tokens requested
+        
+        Returns:
+            Estimated token count
+        """
+        return self.count_tokens(prompt) + max_tokens
+    
+    @staticmethod
+    def is_rate_limit_error(error: Exception) -> bool:
+        """Check whether an exception is a provider rate limit (HTTP 429) error"""
+        if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+            return True
+        if type(error).__name__ in ("RateLimitError", "ResourceExhausted"):
+            return True
+        return "429" in str(error)
@@ -0,0 +1,240 @@
+"""
+Response Cache
+Persistent, content-addressed cache for LLM responses backed by SQLite.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import weakref
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """Disk-backed LRU cache keyed by a hash of the full request"""
+    
+    def __init__(self, path: str, max_size_mb: float = 512, max_age_days: float = 30,
+                 deterministic_reruns: bool = False, replay_only: bool = False):
+        """
+        Initialize the response cache
+        
+        Args:
+            path: Path to the SQLite database file
+            max_size_mb: Maximum total size of cached responses before LRU eviction
+            max_age_days: Entries older than this are evicted (0 disables age eviction)
+            deterministic_reruns: Key repeated identical requests by occurrence so a
+                rerun replays each response in its original order
+            replay_only: Raise on cache misses instead of calling the provider
+        """
+        self.path = path
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self.deterministic_reruns = deterministic_reruns
+        self.replay_only = replay_only
+        
+        self.hits = 0
+        self.misses = 0
+        # Occurrence counts per run, so runs sharing a provider (batch and
+        # service mode) each number their requests from zero
+        self._occurrences = weakref.WeakKeyDictionary()
+        self._unscoped_occurrences = {}
+        self._writes_since_eviction = 0
+        self._lock = threading.Lock()
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_accessed ON responses(last_accessed)")
+        self._conn.commit()
+        
+        self.evict()
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["ResponseCache"]:
+        """
+        Build a cache from llm_settings.cache, or return None if caching is disabled
+        
+        Args:
+            config: The global configuration dictionary
+        
+        Returns:
+            A ResponseCache instance or None
+        """
+        cache_config = config.get("llm_settings", {}).get("cache", {})
+        if not cache_config.get("enabled", False):
+            return None
+        
+        return cls(
+            path=cache_config.get("path", "./.llm_cache/responses.sqlite3"),
+            max_size_mb=cache_config.get("max_size_mb", 512),
+            max_age_days=cache_config.get("max_age_days", 30),
+            deterministic_reruns=cache_config.get("deterministic_reruns", False),
+            replay_only=cache_config.get("replay_only", False)
+        )
+    
+    def make_key(self, provider: str, model: str, prompt: str,
+                 temperature: float, max_tokens: int) -> str:
+        """
+        Compute the content address for a request
+        
+        Args:
+            provider: Provider name
+            model: Model name
+            prompt: The full prompt
+            temperature: Sampling temperature
+            max_tokens: Maximum output tokens
+        
+        Returns:
+            Hex digest identifying the request
+        """
+        payload = json.dumps({
+            "provider": provider,
+            "model": model,
+            "prompt": prompt,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def resolve_key(self, key: str, run: Optional[Any] = None) -> str:
+        """
+        Resolve a content key to the storage key for this call
+        
+        In deterministic rerun mode the n-th identical request in a run maps to
+        its own entry, so sampled responses replay exactly rather than collapsing
+        into one.
+        
+        Args:
+            key: Content key from make_key
+            run: Object identifying the run making the request (e.g. its usage
+                tracker); occurrences are counted separately for each run and
+                forgotten with it. Requests without one share a single count.
+        
+        Returns:
+            The key to read and write
+        """
+        if not self.deterministic_reruns:
+            return key
+        
+        with self._lock:
+            occurrences = self._unscoped_occurrences if run is None else self._occurrences.setdefault(run, {})
+            occurrence = occurrences.get(key, 0)
+            occurrences[key] = occurrence + 1
+        return f"{key}:{occurrence}"
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response and refresh its LRU position
+        
+        Args:
+            key: Storage key from resolve_key
+        
+        Returns:
+            The cached response, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            
+            if row is None or (self.max_age_seconds and now - row[1] > self.max_age_seconds):
+                self.misses += 1
+                return None
+            
+            self._conn.execute("UPDATE responses SET last_accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+    
+    def put(self, key: str, response: str) -> None:
+        """
+        Store a response
+        
+        Args:
+            key: Storage key from resolve_key
+            response: The generated text
+        """
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self._conn.commit()
+            self._writes_since_eviction += 1
+            should_evict = self._writes_since_eviction >= 50
+        
+        if should_evict:
+            self.evict()
+    
+    def evict(self) -> int:
+        """
+        Remove expired entries, then least recently used entries until under the size limit
+        
+        Returns:
+            Number of entries removed
+        """
+        removed = 0
+        with self._lock:
+            self._writes_since_eviction = 0
+            
+            if self.max_age_seconds:
+                cutoff = time.time() - self.max_age_seconds
+                removed += self._conn.execute(
+                    "DELETE FROM responses WHERE created_at < ?", (cutoff,)
+                ).rowcount
+            
+            total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total_size > self.max_size_bytes:
+                excess = total_size - self.max_size_bytes
+                stale_keys = []
+                for key, size in self._conn.execute(
+                        "SELECT key, size FROM responses ORDER BY last_accessed ASC"):
+                    if excess <= 0:
+                        break
+                    stale_keys.append((key,))
+                    excess -= size
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+                removed += len(stale_keys)
+            
+            self._conn.commit()
+        
+        if removed:
+            logger.info(f"Evicted {removed} entries from response cache")
+        return removed
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current cache size"""
+        with self._lock:
+            entries, total_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "size_bytes": total_size
+        }
+    
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,380 @@
+"""
+Book Generation Service
+Long-running local daemon that generates books submitted over an HTTP API.
+Jobs are kept in a persistent SQLite queue and run by a pool of worker
+threads that share one LLMProvider, so provider clients, the response cache,
+rate limits and provider health stay warm from one book to the next.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from typing import Dict, Any, List, Optional, Tuple
+from .llm_provider import LLMProvider
+from .orchestrator import BookGenerationOrchestrator
+from .usage_tracker import UsageTracker, CallRefused, usage_context
+from .job_queue import JobQueue, JobExistsError, JOB_STATES
+from .batch import merge_book_config
+
+logger = logging.getLogger(__name__)
+
+# Settings every book needs, from the service configuration or the job
+REQUIRED_BOOK_SETTINGS = ["writing_style", "description", "num_chapters", "genre"]
+
+class JobCancelled(CallRefused):
+    """Raised instead of sending a call once the job that issued it has been cancelled"""
+    pass
+
+class JobControl(UsageTracker):
+    """Per-job tracker that stops the job at its next LLM call once it is cancelled"""
+    
+    def __init__(self, job_id: str):
+        """
+        Initialize the control
+        
+        Args:
+            job_id: ID of the controlled job
+        """
+        super().__init__()
+        self.job_id = job_id
+        self.stop_reason = None
+    
+    def stop(self, reason: str) -> None:
+        """
+        Ask the job to stop
+        
+        Args:
+            reason: "cancelled", or "shutdown" to continue the job when the service restarts
+        """
+        self.stop_reason = self.stop_reason or reason
+    
+    def reserve(self, provider: str, prompt_tokens: int, max_tokens: int) -> None:
+        """Refuse the call if the job has been asked to stop"""
+        if self.stop_reason is not None:
+            raise JobCancelled(f"Job {self.job_id} stopped ({self.stop_reason})")
+
+class BookService:
+    """Runs queued book jobs on a pool of workers sharing one provider"""
+    
+    def __init__(self, base_config: Dict[str, Any], output_root: str,
+                 db_path: Optional[str] = None, workers: Optional[int] = None):
+        """
+        Initialize the service
+        
+        Args:
+            base_config: Configuration shared by every job; its llm_settings
+                configure the shared provider
+            output_root: Directory that holds one output directory per job
+            db_path: SQLite job database (defaults to jobs.sqlite3 in output_root)
+            workers: Number of books generated at the same time
+        """
+        service_settings = base_config.get("system_settings", {}).get("service", {})
+        self.base_config = base_config
+        self.output_root = output_root
+        os.makedirs(output_root, exist_ok=True)
+        self.workers = max(1, workers or service_settings.get("workers", 2))
+        # Idle workers check the queue at least this often
+        self.poll_interval = service_settings.get("poll_interval", 1.0)
+        
+        self.queue = JobQueue(db_path or service_settings.get("db_path") or
+                              os.path.join(output_root, "jobs.sqlite3"))
+        self.llm_provider = LLMProvider(base_config)
+        
+        # Jobs running in this process, with their controls and orchestrators
+        self._running: Dict[str, Tuple[JobControl, Optional[BookGenerationOrchestrator]]] = {}
+        self._running_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.started = None
+    
+    def start(self) -> None:
+        """Requeue jobs interrupted by an earlier shutdown and start the workers"""
+        self.queue.requeue_interrupted()
+        self.started = datetime.now().isoformat()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"book-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Book service started with {self.workers} workers")
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the workers
+        
+        Running jobs stop before their next LLM call and are continued from
+        their checkpoints when the service starts again.
+        
+        Args:
+            timeout: Seconds to wait for each worker
+        """
+        self._stopping.set()
+        with self._running_lock:
+            for control, _ in self._running.values():
+                control.stop("shutdown")
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.llm_provider.close()
+        self.queue.close()
+        logger.info("Book service stopped")
+    
+    def submit(self, settings: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue a book
+        
+        Args:
+            settings: The book's settings (description, genre, num_chapters, ...)
+                and an optional "id"; they override the service configuration
+        
+        Returns:
+            The queued job
+        
+        Raises:
+            JobExistsError: If the ID is taken
+            ValueError: If the settings are incomplete or the ID is invalid
+        """
+        settings = dict(settings)
+        job_id = settings.pop("id", None)
+        if job_id is not None:
+            job_id = str(job_id)
+            if not re.fullmatch(r"[A-Za-z0-9_.-]{1,64}", job_id) or job_id.startswith("."):
+                raise ValueError(f"Invalid job ID: {job_id!r}")
+        else:
+            job_id = uuid.uuid4().hex[:12]
+        
+        config = merge_book_config(self.base_config, settings, os.path.join(self.output_root, job_id))
+        missing = [key for key in REQUIRED_BOOK_SETTINGS if key not in config]
+        if missing:
+            raise ValueError(f"Missing required settings: {', '.join(missing)}")
+        
+        job = self.queue.submit(settings, config["output_settings"]["output_directory"], job_id)
+        logger.info(f"Queued job {job_id}")
+        with self._wakeup:
+            self._wakeup.notify()
+        return job
+    
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a queued or running job
+        
+        Args:
+            job_id: Job ID
+        
+        Returns:
+            The job, or None if it does not exist
+        """
+        job = self.queue.request_cancel(job_id)
+        with self._running_lock:
+            running = self._running.get(job_id)
+        if running is not None:
+            running[0].stop("cancelled")
+            logger.info(f"Cancelling job {job_id}; it stops before its next LLM call")
+        return self.describe(job) if job else None
+    
+    def describe(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Add the live progress of a running job to its record"""
+        with self._running_lock:
+            running = self._running.get(job["id"])
+        orchestrator = running[1] if running else None
+        if orchestrator is not None:
+            job = {**job, "progress": {
+                "chapters": len(orchestrator.book_data["chapters"]),
+                "completed_outputs": sorted(orchestrator.artifacts),
+                "total_tokens": orchestrator.usage_tracker.totals["total_tokens"],
+                **({"budget": orchestrator.budget.report()} if orchestrator.budget else {})
+            }}
+        return job
+    
+    def status(self) -> Dict[str, Any]:
+        """Return the state of the service, its queue and the shared provider"""
+        with self._running_lock:
+            running = list(self._running)
+        return {
+            "started": self.started,
+            "workers": self.workers,
+            "running": running,
+            "jobs": self.queue.counts(),
+            "cache": self.llm_provider.cache.stats() if self.llm_provider.cache else None,
+            "provider_health": self.llm_provider.router.stats()
+        }
+    
+    def _work(self) -> None:
+        """Worker loop: run queued jobs until the service stops"""
+        while not self._stopping.is_set():
+            job = self.queue.claim()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+            try:
+                self._run_job(job)
+            except Exception as e:
+                logger.error(f"Job {job['id']} failed: {e}", exc_info=True)
+                self.queue.finish(job["id"], "failed", error=str(e))
+    
+    def _run_job(self, job: Dict[str, Any]) -> None:
+        """Generate the book of a claimed job and record the outcome"""
+        job_id = job["id"]
+        control = JobControl(job_id)
+        with self._running_lock:
+            self._running[job_id] = (control, None)
+        # A cancellation that arrived between claiming and registering the job
+        if self.queue.get(job_id)["cancel_requested"]:
+            control.stop("cancelled")
+        started = time.time()
+        
+        orchestrator = None
+        try:
+            try:
+                config = merge_book_config(self.base_config, job["settings"], job["output_directory"])
+                orchestrator = BookGenerationOrchestrator(config, llm_provider=self.llm_provider)
+                # A job interrupted by a shutdown continues where it stopped
+                state = orchestrator.checkpoints.load()
+                if state is not None and state.get("status") != "complete":
+                    orchestrator.restore_checkpoint(state)
+                with self._running_lock:
+                    self._running[job_id] = (control, orchestrator)
+                
+                logger.info(f"Starting job {job_id} (attempt {job['attempts']}) in {job['output_directory']}")
+                with usage_context(tracker=control):
+                    success = orchestrator.run()
+            finally:
+                with self._running_lock:
+                    self._running.pop(job_id, None)
+            
+            if control.stop_reason == "shutdown":
+                # Left running in the queue, so the next start requeues it
+                logger.info(f"Job {job_id} interrupted by shutdown; it continues when the service restarts")
+                return
+            
+            chapters = orchestrator.book_data["chapters"]
+            result = {
+                "title": orchestrator.book_data["metadata"]["title"],
+                "chapters": len(chapters),
+                "words": sum(len(chapter.split()) for chapter in chapters),
+                "wall_time_seconds": round(time.time() - started, 3),
+                "total_tokens": orchestrator.usage_tracker.totals["total_tokens"],
+                "reused_tasks": len(orchestrator.metrics.get("reused_tasks", []))
+            }
+            if control.stop_reason == "cancelled":
+                status = "cancelled"
+            else:
+                status = "completed" if success else "failed"
+            self.queue.finish(job_id, status, result, orchestrator.metrics.get("error") if not success else None)
+            logger.info(f"Job {job_id} {status} in {result['wall_time_seconds']:.1f} seconds")
+        finally:
+            # The result has been read from the book's chapter store
+            if orchestrator is not None:
+                orchestrator.close()
+
+class _ServiceRequestHandler(BaseHTTPRequestHandler):
+    """JSON API of the book service"""
+    
+    server_version = "BookService/1.0"
+    
+    @property
+    def service(self) -> BookService:
+        return self.server.service
+    
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+    
+    def _send(self, status: int, data: Any) -> None:
+        """Send a JSON response"""
+        body = json.dumps(data, indent=2).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _route(self) -> Tuple[List[str], Dict[str, List[str]]]:
+        """Split the request path into segments and query parameters"""
+        url = urlparse(self.path)
+        return [part for part in url.path.split("/") if part], parse_qs(url.query)
+    
+    def do_GET(self) -> None:
+        parts, query = self._route()
+        if parts == ["health"]:
+            self._send(200, self.service.status())
+        elif parts == ["jobs"]:
+            status = query.get("status", [None])[0]
+            if status is not None and status not in JOB_STATES:
+                self._send(400, {"error": f"Unknown status: {status}"})
+                return
+            limit = query.get("limit", ["100"])[0]
+            if not limit.isdigit() or int(limit) < 1:
+                self._send(400, {"error": f"limit must be a positive integer, got {limit!r}"})
+                return
+            limit = int(limit)
+            self._send(200, {"jobs": self.service.queue.list(status, limit)})
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self.service.queue.get(parts[1])
+            if job is None:
+                self._send(404, {"error": f"No job {parts[1]}"})
+            else:
+                self._send(200, self.service.describe(job))
+        else:
+            self._send(404, {"error": "Not found"})
+    
+    def do_POST(self) -> None:
+        parts, _ = self._route()
+        if parts == ["jobs"]:
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                settings = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(settings, dict):
+                    raise ValueError("Expected a JSON object with the book's settings")
+                self._send(201, self.service.submit(settings))
+            except JobExistsError as e:
+                self._send(409, {"error": str(e)})
+            except (json.JSONDecodeError, ValueError) as e:
+                self._send(400, {"error": str(e)})
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+            self._cancel(parts[1])
+        else:
+            self._send(404, {"error": "Not found"})
+    
+    def do_DELETE(self) -> None:
+        parts, _ = self._route()
+        if len(parts) == 2 and parts[0] == "jobs":
+            self._cancel(parts[1])
+        else:
+            self._send(404, {"error": "Not found"})
+    
+    def _cancel(self, job_id: str) -> None:
+        job = self.service.cancel(job_id)
+        if job is None:
+            self._send(404, {"error": f"No job {job_id}"})
+        else:
+            self._send(200, job)
+
+def serve(service: BookService, host: str = "127.0.0.1", port: int = 8765) -> None:
+    """
+    Start the service and answer API requests until interrupted
+    
+    Args:
+        service: The book service
+        host: Address to listen on (local only by default)
+        port: Port to listen on
+    """
+    server = ThreadingHTTPServer((host, port), _ServiceRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    service.start()
+    logger.info(f"Book service listening on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down the book service")
+    finally:
+        server.server_close()
+        service.stop()
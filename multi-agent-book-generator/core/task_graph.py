@@ -0,0 +1,267 @@
+"""
+Task Graph
+Dependency-driven scheduler for the generation workflow. Each task declares
+the artifacts it reads and writes; a task starts as soon as all of its inputs
+exist, so independent tasks run concurrently on a worker pool.
+"""
+import time
+import json
+import hashlib
+import logging
+import threading
+import contextvars
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Callable, Optional, Iterable, Tuple, List
+
+logger = logging.getLogger(__name__)
+
+def submit_in_context(executor: Executor, func: Callable, *args, **kwargs) -> Future:
+    """
+    Submit a call to an executor, running it in a copy of the caller's context
+    
+    Worker threads do not inherit context variables, so without this LLM calls
+    made by the worker would lose their usage attribution and run deadline.
+    
+    Args:
+        executor: The executor to submit to
+        func: The callable
+        *args, **kwargs: Arguments for the callable
+    
+    Returns:
+        The future of the call
+    """
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+class TaskGraphError(Exception):
+    """Raised when a task graph is malformed (missing inputs, duplicate outputs or cycles)"""
+    pass
+
+class Task:
+    """A unit of work with declared input and output artifacts"""
+    
+    def __init__(self, name: str, func: Callable[..., Optional[Dict[str, Any]]],
+                 inputs: Iterable[str] = (), outputs: Iterable[str] = (),
+                 phase: Optional[str] = None, fingerprint_data: Any = None):
+        """
+        Initialize the task
+        
+        Args:
+            name: Unique task name
+            func: Callable receiving the input artifacts as keyword arguments
+                and returning a dictionary with a value for every output
+            inputs: Names of the artifacts the task reads
+            outputs: Names of the artifacts the task produces
+            phase: Workflow phase the task belongs to (defaults to the name)
+            fingerprint_data: JSON-serializable settings that affect the outputs
+                besides the inputs, e.g. configuration and prompt versions
+        """
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.phase = phase or name
+        self.fingerprint_data = fingerprint_data
+
+
+class TaskGraph:
+    """Runs tasks in dependency order on a thread pool"""
+    
+    def __init__(self, max_workers: int = 4, artifacts: Optional[Dict[str, Any]] = None,
+                 on_task_complete: Optional[Callable[[Task], None]] = None,
+                 fingerprints: Optional[Dict[str, str]] = None,
+                 previous_build: Optional[Dict[str, Any]] = None,
+                 lock: Optional[threading.RLock] = None):
+        """
+        Initialize an empty graph
+        
+        Args:
+            max_workers: Maximum number of tasks running at the same time
+            artifacts: Artifacts that already exist, e.g. from a resumed run;
+                tasks whose outputs are all present are skipped
+            on_task_complete: Called with each task after its outputs have been
+                added to the artifacts
+            fingerprints: Fingerprints of the tasks that produced the existing artifacts
+            previous_build: "fingerprints" and "artifacts" of an earlier build;
+                a task whose fingerprint is unchanged reuses its earlier outputs
+            lock: Held while the artifacts and fingerprints are updated, so a
+                caller that saves them under the same lock sees no partial update
+        """
+        self.max_workers = max(1, max_workers)
+        self.tasks: Dict[str, Task] = {}
+        self.artifacts: Dict[str, Any] = dict(artifacts or {})
+        self.on_task_complete = on_task_complete
+        self.fingerprints: Dict[str, str] = dict(fingerprints or {})
+        self.previous_build = previous_build or {}
+        self.reused: List[str] = []
+        # (start, end) wall-clock times of each finished task
+        self.task_spans: Dict[str, Tuple[float, float]] = {}
+        # Name of the task whose error stopped the run
+        self.failed_task: Optional[str] = None
+        self._lock = lock or threading.RLock()
+    
+    def add(self, name: str, func: Callable[..., Optional[Dict[str, Any]]],
+            inputs: Iterable[str] = (), outputs: Iterable[str] = (),
+            phase: Optional[str] = None, fingerprint_data: Any = None) -> Task:
+        """
+        Add a task to the graph
+        
+        Args:
+            name: Unique task name
+            func: Callable receiving the input artifacts as keyword arguments
+            inputs: Names of the artifacts the task reads
+            outputs: Names of the artifacts the task produces
+            phase: Workflow phase the task belongs to
+            fingerprint_data: Settings that affect the outputs besides the inputs
+        
+        Returns:
+            The new task
+        """
+        if name in self.tasks:
+            raise TaskGraphError(f"Duplicate task name: {name}")
+        task = Task(name, func, inputs, outputs, phase, fingerprint_data)
+        self.tasks[name] = task
+        return task
+    
+    def is_complete(self, task: Task) -> bool:
+        """Return True if all of a task's outputs already exist (tasks without outputs always run)"""
+        return bool(task.outputs) and all(o in self.artifacts for o in task.outputs)
+    
+    def _pending_tasks(self) -> Dict[str, Task]:
+        """Return the tasks that still have to run"""
+        return {name: task for name, task in self.tasks.items() if not self.is_complete(task)}
+    
+    def _producers(self) -> Dict[str, str]:
+        """Map each artifact to the task producing it, validating the pending tasks"""
+        pending = self._pending_tasks()
+        producers = {}
+        for task in pending.values():
+            for output in task.outputs:
+                if output in producers:
+                    raise TaskGraphError(f"Artifact '{output}' is produced more than once")
+                producers[output] = task.name
+        
+        for task in pending.values():
+            missing = [i for i in task.inputs if i not in producers and i not in self.artifacts]
+            if missing:
+                raise TaskGraphError(f"Task '{task.name}' needs artifacts nobody produces: {', '.join(missing)}")
+        
+        # Kahn's algorithm; anything left over is part of a cycle
+        dependencies = {name: {producers[i] for i in task.inputs if i in producers}
+                        for name, task in pending.items()}
+        remaining = dict(dependencies)
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps & remaining.keys()]
+            if not ready:
+                raise TaskGraphError(f"Dependency cycle between tasks: {', '.join(sorted(remaining))}")
+            for name in ready:
+                del remaining[name]
+        return producers
+    
+    def fingerprint(self, task: Task) -> str:
+        """
+        Hash everything a task's outputs depend on: its inputs and its fingerprint data
+        
+        Args:
+            task: A task whose inputs are available
+        
+        Returns:
+            Hex digest
+        """
+        payload = json.dumps({
+            "task": task.name,
+            "inputs": {name: self.artifacts[name] for name in task.inputs},
+            "data": task.fingerprint_data
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _reuse_previous(self, task: Task) -> bool:
+        """Take a task's outputs from the previous build if its fingerprint is unchanged"""
+        fingerprint = self.fingerprint(task)
+        with self._lock:
+            self.fingerprints[task.name] = fingerprint
+        
+        previous_artifacts = self.previous_build.get("artifacts", {})
+        if (self.previous_build.get("fingerprints", {}).get(task.name) != fingerprint or
+                not all(o in previous_artifacts for o in task.outputs)):
+            return False
+        
+        with self._lock:
+            self.artifacts.update({o: previous_artifacts[o] for o in task.outputs})
+        self.reused.append(task.name)
+        logger.info(f"Reusing outputs of task {task.name} (inputs unchanged)")
+        if self.on_task_complete is not None:
+            self.on_task_complete(task)
+        return True
+    
+    def _run_task(self, task: Task) -> Dict[str, Any]:
+        """Execute one task and check that it produced its declared outputs"""
+        started = time.time()
+        logger.info(f"Starting task {task.name}")
+        result = task.func(**{name: self.artifacts[name] for name in task.inputs}) or {}
+        
+        missing = [o for o in task.outputs if o not in result]
+        if missing:
+            raise TaskGraphError(f"Task '{task.name}' did not produce: {', '.join(missing)}")
+        
+        finished = time.time()
+        self.task_spans[task.name] = (started, finished)
+        logger.info(f"Completed task {task.name} in {finished - started:.2f} seconds")
+        return {name: result[name] for name in task.outputs}
+    
+    def run(self) -> Dict[str, Any]:
+        """
+        Run every task, starting each one as soon as its inputs are available
+        
+        Each task runs in a copy of the caller's context, so context variables
+        such as the usage attribution and the run deadline carry over to the
+        worker threads. If a task fails, no new tasks are started, running ones
+        are allowed to finish and the first error is re-raised. Tasks whose
+        outputs already exist are skipped, and tasks whose fingerprint matches
+        the previous build reuse its outputs.
+        
+        Returns:
+            All artifacts, keyed by name
+        """
+        self._producers()
+        pending = self._pending_tasks()
+        skipped = len(self.tasks) - len(pending)
+        if skipped:
+            logger.info(f"Skipping {skipped} completed tasks")
+        running = {}
+        error = None
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="task") as executor:
+            while pending or running:
+                # Reused outputs can make further tasks ready, so scan until nothing changes
+                scan = error is None
+                while scan:
+                    scan = False
+                    for name, task in list(pending.items()):
+                        if all(i in self.artifacts for i in task.inputs):
+                            del pending[name]
+                            if self._reuse_previous(task):
+                                scan = True
+                            else:
+                                running[submit_in_context(executor, self._run_task, task)] = task
+                
+                if not running:
+                    break
+                
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = running.pop(future)
+                    try:
+                        result = future.result()
+                        with self._lock:
+                            self.artifacts.update(result)
+                        if self.on_task_complete is not None:
+                            self.on_task_complete(task)
+                    except Exception as e:
+                        logger.error(f"Task {task.name} failed: {e}")
+                        if error is None:
+                            error = e
+                            self.failed_task = task.name
+        
+        if error is not None:
+            raise error
+        return self.artifacts
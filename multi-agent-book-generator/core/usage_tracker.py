@@ -0,0 +1,149 @@
+"""
+Usage Tracker
+Aggregates token usage, latency and retry statistics reported by LLM providers,
+attributed to the agent, phase and chapter that issued each call.
+"""
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple
+
+# Attribution tags and trackers for the code currently issuing LLM calls
+_usage_tags = contextvars.ContextVar("llm_usage_tags", default={})
+_usage_trackers = contextvars.ContextVar("llm_usage_trackers", default=())
+
+@contextmanager
+def usage_context(tracker: Optional["UsageTracker"] = None, **tags):
+    """
+    Attribute LLM calls made inside this block
+    
+    Contexts nest: tags are merged with the enclosing context and every
+    tracker in the chain receives the calls.
+    
+    Args:
+        tracker: Optional tracker that should also record these calls
+        **tags: Attribution tags such as agent, phase or chapter
+    """
+    tags_token = _usage_tags.set({**_usage_tags.get(), **tags})
+    trackers_token = None
+    if tracker is not None:
+        trackers_token = _usage_trackers.set(_usage_trackers.get() + (tracker,))
+    try:
+        yield
+    finally:
+        _usage_tags.reset(tags_token)
+        if trackers_token is not None:
+            _usage_trackers.reset(trackers_token)
+
+def capture_usage_context() -> Tuple[Dict[str, Any], Tuple["UsageTracker", ...]]:
+    """Return the attribution tags and trackers active in the caller's context"""
+    return dict(_usage_tags.get()), _usage_trackers.get()
+
+class CallRefused(Exception):
+    """Raised by a tracker's reserve() to refuse a call; the call is not retried on another provider"""
+    pass
+
+def empty_usage() -> Dict[str, Any]:
+    """Return a zeroed usage record"""
+    return {
+        "calls": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cached_tokens": 0,
+        "total_tokens": 0,
+        "latency_seconds": 0.0,
+        "retries": 0,
+        "cache_hits": 0,
+        "coalesced": 0
+    }
+
+class UsageTracker:
+    """Thread-safe accumulator of per-call usage records"""
+    
+    def __init__(self):
+        """Initialize an empty tracker"""
+        self._lock = threading.Lock()
+        self.totals = empty_usage()
+        self.by_agent = {}
+        self.by_phase = {}
+        self.by_chapter = {}
+        self.by_provider = {}
+    
+    def record(self, usage: Dict[str, Any], tags: Dict[str, Any]) -> None:
+        """
+        Add one call's usage to the totals and to each attribution bucket
+        
+        Cache hits and coalesced responses are counted under cache_hits and
+        coalesced; only requests sent to a provider count as calls.
+        
+        Args:
+            usage: Usage record with keys from empty_usage (missing keys count as 0)
+            tags: Attribution tags (agent, phase, chapter, provider)
+        """
+        with self._lock:
+            buckets = [self.totals]
+            for tag, table in (("agent", self.by_agent), ("phase", self.by_phase),
+                               ("chapter", self.by_chapter), ("provider", self.by_provider)):
+                if tags.get(tag) is not None:
+                    buckets.append(table.setdefault(str(tags[tag]), empty_usage()))
+            
+            upstream = not (usage.get("cache_hits") or usage.get("coalesced"))
+            for bucket in buckets:
+                bucket["calls"] += 1 if upstream else 0
+                for key in ("prompt_tokens", "completion_tokens", "cached_tokens", "total_tokens",
+                            "latency_seconds", "retries", "cache_hits", "coalesced"):
+                    bucket[key] += usage.get(key, 0) or 0
+    
+    def reserve(self, provider: str, prompt_tokens: int, max_tokens: int) -> None:
+        """
+        Called before a call is sent with its worst-case usage
+        
+        Plain trackers accept every call; budget-enforcing trackers may raise
+        CallRefused to refuse it.
+        
+        Args:
+            provider: Provider the call goes to
+            prompt_tokens: Estimated prompt tokens
+            max_tokens: Maximum completion tokens
+        """
+        pass
+    
+    def release(self, provider: str, prompt_tokens: int, max_tokens: int) -> None:
+        """Called once a call passed to reserve has finished or failed"""
+        pass
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return a JSON-serializable summary
+        
+        The top-level "total" is the total token count, matching the original
+        generation_metrics.json layout.
+        """
+        def rounded(bucket):
+            return {**bucket, "latency_seconds": round(bucket["latency_seconds"], 3)}
+        
+        with self._lock:
+            summary = rounded(self.totals)
+            summary["total"] = self.totals["total_tokens"]
+            summary["by_agent"] = {k: rounded(v) for k, v in self.by_agent.items()}
+            summary["by_phase"] = {k: rounded(v) for k, v in self.by_phase.items()}
+            summary["by_chapter"] = {k: rounded(v) for k, v in self.by_chapter.items()}
+            summary["by_provider"] = {k: rounded(v) for k, v in self.by_provider.items()}
+            return summary
+    
+    def restore(self, summary: Dict[str, Any]) -> None:
+        """
+        Continue counting from a summary produced by to_dict, e.g. when a run is resumed
+        
+        Args:
+            summary: Output of to_dict
+        """
+        def bucket(data):
+            return {key: data.get(key, value) for key, value in empty_usage().items()}
+        
+        with self._lock:
+            self.totals = bucket(summary)
+            self.by_agent = {k: bucket(v) for k, v in summary.get("by_agent", {}).items()}
+            self.by_phase = {k: bucket(v) for k, v in summary.get("by_phase", {}).items()}
+            self.by_chapter = {k: bucket(v) for k, v in summary.get("by_chapter", {}).items()}
+            self.by_provider = {k: bucket(v) for k, v in summary.get("by_provider", {}).items()}
@@ -10,6 +10,7 @@ import argparse
 import logging
 from typing import Dict, Any
 from core.orchestrator import BookGenerationOrchestrator
+from core.checkpoint import CheckpointStore
 
 # Set up logging
 logging.basicConfig(
@@ -52,8 +53,243 @@ def load_config(config_path: str = None) -> Dict[str, Any]:
         logger.warning("Using empty config.")
         return {}
 
+def run_benchmarks(argv) -> int:
+    """
+    Run the throughput benchmark suite against the offline mock provider
+    
+    Args:
+        argv: Command line arguments after 'bench'
+    
+    Returns:
+        Exit code
+    """
+    from benchmarks import run_suite
+    
+    parser = argparse.ArgumentParser(prog="main.py bench", description="Benchmark book generation throughput")
+    parser.add_argument("--sizes", default="5,20,100", help="Comma-separated chapter counts to benchmark")
+    parser.add_argument("--config", help="Configuration file to benchmark with (e.g. concurrency settings)")
+    parser.add_argument("--output", help="Path of the results JSON file")
+    parser.add_argument("--latency", type=float, help="Mock provider base latency in seconds")
+    parser.add_argument("--tokens-per-second", type=float, help="Mock provider output throughput")
+    parser.add_argument("--rate-limit-error-rate", type=float, help="Fraction of mock calls failing with 429")
+    parser.add_argument("--server-error-rate", type=float, help="Fraction of mock calls failing with 5xx")
+    parser.add_argument("--seed", type=int, help="Mock provider random seed")
+    parser.add_argument("--keep-output", help="Keep the generated books in this directory")
+    
+    args = parser.parse_args(argv)
+    
+    mock_settings = {
+        key: value for key, value in {
+            "latency_seconds": args.latency,
+            "tokens_per_second": args.tokens_per_second,
+            "rate_limit_error_rate": args.rate_limit_error_rate,
+            "server_error_rate": args.server_error_rate,
+            "seed": args.seed
+        }.items() if value is not None
+    }
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    base_config = load_config(args.config) if args.config else {}
+    
+    results = run_suite(
+        sizes=sizes,
+        output_path=args.output,
+        base_config=base_config,
+        mock_settings=mock_settings,
+        keep_output=args.keep_output
+    )
+    
+    print("\n=== Benchmark Results ===")
+    print(f"{'Chapters':>8} {'Wall (s)':>9} {'Calls':>6} {'Prompt tok':>11} {'Compl. tok':>11} {'Peak RSS':>9}")
+    for run in results["runs"]:
+        print(f"{run['chapters']:>8} {run['wall_time_seconds']:>9.1f} {run['calls']:>6} "
+              f"{run['prompt_tokens']:>11} {run['completion_tokens']:>11} {str(run['peak_rss_mb']) + ' MB':>9}")
+    print(f"\nResults written to {results['output_path']}")
+    
+    return 0 if all(run["success"] for run in results["runs"]) else 1
+
+def run_batch(argv) -> int:
+    """
+    Generate every book of a JSONL manifest concurrently in this process
+    
+    Args:
+        argv: Command line arguments after 'batch'
+    
+    Returns:
+        Exit code
+    """
+    from core.batch import BatchRunner, load_manifest
+    
+    parser = argparse.ArgumentParser(prog="main.py batch", description="Generate the books of a manifest")
+    parser.add_argument("manifest", help="JSONL file with one book's settings per line")
+    parser.add_argument("--config", help="Configuration shared by all books (LLM settings, limits, cache)")
+    parser.add_argument("--output", default="./output/batch", help="Directory for the books' output directories")
+    parser.add_argument("--max-active", type=int, help="Maximum number of books generated at the same time")
+    
+    args = parser.parse_args(argv)
+    
+    try:
+        entries = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    if not entries:
+        print(f"Error: No books in {args.manifest}")
+        return 1
+    
+    try:
+        runner = BatchRunner(load_config(args.config), entries, args.output, args.max_active)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    
+    print(f"\n=== Batch of {len(entries)} books, {runner.max_active_books} at a time ===\n")
+    report = runner.run()
+    
+    print("\n=== Batch Results ===")
+    print(f"{'Book':<20} {'Status':<8} {'Wall (s)':>9} {'Chapters':>9} {'Tokens':>9}")
+    for result in report["results"]:
+        print(f"{result['id'][:20]:<20} {'ok' if result['success'] else 'failed':<8} "
+              f"{result['wall_time_seconds']:>9.1f} {result['chapters']:>9} {result['total_tokens']:>9}")
+    throughput = report["throughput"]
+    print(f"\n{report['completed']}/{report['books']} books in {report['wall_time_seconds']:.1f} s: "
+          f"{throughput['books_per_hour']} books/hour, {throughput['chapters_per_hour']} chapters/hour, "
+          f"{throughput['tokens_per_second']} tokens/s ({throughput['concurrency_gain']}x concurrency gain)")
+    print(f"Report written to {report['report_path']}")
+    
+    return 0 if report["failed"] == 0 else 1
+
+def run_service(argv) -> int:
+    """
+    Run the book generation service: a local HTTP API over a persistent job queue
+    
+    Args:
+        argv: Command line arguments after 'serve'
+    
+    Returns:
+        Exit code
+    """
+    from core.service import BookService, serve
+    
+    parser = argparse.ArgumentParser(prog="main.py serve", description="Run the book generation service")
+    parser.add_argument("--config", help="Configuration shared by all jobs (LLM settings, limits, cache)")
+    parser.add_argument("--output", default="./output/service", help="Directory for the jobs' output directories")
+    parser.add_argument("--db", help="SQLite job database (default: jobs.sqlite3 in the output directory)")
+    parser.add_argument("--workers", type=int, help="Number of books generated at the same time")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    
+    args = parser.parse_args(argv)
+    
+    service = BookService(load_config(args.config), args.output, args.db, args.workers)
+    print(f"\n=== Book service on http://{args.host}:{args.port} with {service.workers} workers ===\n")
+    serve(service, args.host, args.port)
+    return 0
+
+def run_materialize(argv) -> int:
+    """
+    Write out the intermediate files of a run from its artifact log
+    
+    Args:
+        argv: Command line arguments after 'materialize'
+    
+    Returns:
+        Exit code
+    """
+    from core.artifact_log import ArtifactLog
+    
+    parser = argparse.ArgumentParser(prog="main.py materialize",
+                                     description="Write the intermediate files of a run from its artifact log")
+    parser.add_argument("run_dir", help="Output directory of the run")
+    parser.add_argument("--to", help="Directory to write the files to (default: the run's intermediates directory)")
+    
+    args = parser.parse_args(argv)
+    
+    artifacts = ArtifactLog(os.path.join(args.run_dir, "intermediates"))
+    if not os.path.exists(artifacts.path):
+        print(f"Error: No artifact log found in {args.run_dir}")
+        return 1
+    paths = artifacts.materialize(directory=args.to)
+    print(f"Wrote {len(paths)} intermediate files to {args.to or artifacts.directory}")
+    return 0
+
+def apply_budget_args(config: Dict[str, Any], args: argparse.Namespace) -> None:
+    """
+    Set the budget options given on the command line in system_settings.budget
+    
+    Args:
+        config: Configuration dictionary to update
+        args: Parsed command line arguments
+    """
+    budget = {
+        key: value for key, value in {
+            "max_tokens": args.budget_tokens,
+            "max_cost": args.budget_cost,
+            "target_minutes": args.target_minutes
+        }.items() if value is not None
+    }
+    if budget:
+        config["system_settings"] = config.get("system_settings", {})
+        config["system_settings"]["budget"] = {**config["system_settings"].get("budget", {}), **budget}
+
+def resume_run(run_dir: str, max_runtime: float = None, args: argparse.Namespace = None) -> int:
+    """
+    Resume an interrupted book run from the checkpoint in its output directory
+    
+    Args:
+        run_dir: Output directory of the interrupted run
+        max_runtime: Optional new deadline in minutes for the resumed run
+        args: Command line arguments; budget options raise or set the run's budget
+    
+    Returns:
+        Process exit code
+    """
+    state = CheckpointStore(run_dir).load()
+    if state is None:
+        print(f"Error: No checkpoint found in {run_dir}")
+        return 1
+    if state.get("status") == "complete":
+        print(f"The run in {run_dir} has already completed.")
+        return 0
+    
+    # Continue with the configuration of the original run, in the same directory
+    config = state["config"]
+    config["output_settings"] = config.get("output_settings", {})
+    config["output_settings"]["output_directory"] = run_dir
+    if max_runtime:
+        config["system_settings"] = config.get("system_settings", {})
+        config["system_settings"]["max_runtime_minutes"] = max_runtime
+    if args is not None:
+        apply_budget_args(config, args)
+    
+    orchestrator = BookGenerationOrchestrator(config)
+    orchestrator.restore_checkpoint(state)
+    
+    print(f"\n=== Resuming run in {run_dir} ===\n")
+    try:
+        if orchestrator.run():
+            print("\n✅ Book generation completed successfully!")
+            print(f"Output files are in: {run_dir}")
+            return 0
+        print("\n❌ Book generation failed. Check the logs for details.")
+        return 1
+    except KeyboardInterrupt:
+        print("\n⚠️ Book generation interrupted by user.")
+        return 130
+    finally:
+        orchestrator.close()
+        orchestrator.llm_provider.close()
+
 def main():
     """Main entry point for the book generation system"""
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        return run_benchmarks(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        return run_batch(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        return run_service(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "materialize":
+        return run_materialize(sys.argv[2:])
+    
     parser = argparse.ArgumentParser(description="Generate a book using an AI multi-agent system")
     
     # Configuration and book parameters
@@ -67,6 +303,16 @@ def main():
     parser.add_argument("--interactive", action="store_true", help="Enable interactive mode")
     parser.add_argument("--output", default="./output", help="Output directory")
     parser.add_argument("--verbose", action="store_true", help="Enable verbose logging")
+    parser.add_argument("--max-runtime", type=float, help="Abort the run after this many minutes")
+    parser.add_argument("--parallel-chapters", action="store_true",
+                        help="Write chapters concurrently from outline-derived context")
+    parser.add_argument("--resume", metavar="RUN_DIR",
+                        help="Resume an interrupted run from its output directory")
+    parser.add_argument("--budget-tokens", type=int, help="Token budget for the run")
+    parser.add_argument("--budget-cost", type=float, help="Cost budget for the run (needs budget prices in the config)")
+    parser.add_argument("--target-minutes", type=float, help="Wall-clock target; the run degrades to meet it")
+    parser.add_argument("--full-rebuild", action="store_true",
+                        help="Regenerate everything instead of reusing unchanged work from a previous run")
     
     args = parser.parse_args()
     
@@ -74,6 +320,9 @@ def main():
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
+    if args.resume:
+        return resume_run(args.resume, args.max_runtime, args)
+    
     # Load configuration
     config = load_config(args.config)
     
@@ -89,6 +338,16 @@ def main():
     if args.interactive:
         config["system_settings"] = config.get("system_settings", {})
         config["system_settings"]["interactive_mode"] = True
+    if args.max_runtime:
+        config["system_settings"] = config.get("system_settings", {})
+        config["system_settings"]["max_runtime_minutes"] = args.max_runtime
+    apply_budget_args(config, args)
+    if args.parallel_chapters:
+        config["system_settings"] = config.get("system_settings", {})
+        config["system_settings"]["parallel_chapters"] = True
+    if args.full_rebuild:
+        config["system_settings"] = config.get("system_settings", {})
+        config["system_settings"]["incremental"] = False
     if args.output:
         config["output_settings"] = config.get("output_settings", {})
         config["output_settings"]["output_directory"] = args.output
@@ -133,6 +392,9 @@ def main():
         logger.exception("Unhandled exception during book generation")
         print(f"\n❌ Error: {e}")
         return 1
+    finally:
+        orchestrator.close()
+        orchestrator.llm_provider.close()
 
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
@@ -3,7 +3,8 @@ Utility functions for the multi-agent book generation system.
 """
 
 from utils.parsing import parse_outline, extract_character_profiles, parse_feedback
-from utils.text_processing import chunk_text, extract_dialogue, identify_scene_breaks, calculate_reading_statistics
+from utils.text_processing import (chunk_text, excerpt_text, get_token_counter, TextChunk, TokenEstimator,
+                                   extract_dialogue, identify_scene_breaks, calculate_reading_statistics)
 from utils.epub_builder import create_epub, create_chapter_previews, create_book_description
 
 __all__ = [
@@ -11,6 +12,10 @@ __all__ = [
     'extract_character_profiles',
     'parse_feedback',
     'chunk_text',
+    'excerpt_text',
+    'get_token_counter',
+    'TextChunk',
+    'TokenEstimator',
     'extract_dialogue',
     'identify_scene_breaks',
     'calculate_reading_statistics',
@@ -0,0 +1,169 @@
+"""
+Fix planning utilities for merging the issues reported by the refinement reviews.
+"""
+import re
+import logging
+from typing import List, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Reviews in priority order: when issues from several reviews target the same
+# passage, the fix of the earliest review wins and the others become notes
+REVIEW_PRIORITY = ["continuity", "dialogue", "pacing", "style"]
+
+def _as_text(value: Any) -> str:
+    """Return the text of a report field, which reviews sometimes return as a dictionary"""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        for key in ['text', 'dialogue', 'content', 'original', 'value']:
+            if key in value:
+                return _as_text(value[key])
+        for item in value.values():
+            if isinstance(item, str):
+                return item.strip()
+    return str(value).strip() if value is not None else ""
+
+def _normalize(text: str) -> str:
+    """Normalize text for comparisons (case and whitespace)"""
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+def normalize_fix(review_type: str, fix: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert an issue from any review report to a common shape
+    
+    Args:
+        review_type: The review that reported the issue (continuity, style, pacing or dialogue)
+        fix: The issue as it appears in the report's chapter_fixes
+    
+    Returns:
+        Dictionary with type, description, anchor (text the issue refers to),
+        fix (instruction or replacement) and replacement (exact replacement
+        text for the anchor, if the review provided one)
+    """
+    if review_type == "dialogue":
+        anchor = _as_text(fix.get("original", ""))
+        improved = _as_text(fix.get("improved", ""))
+        return {
+            "type": review_type,
+            "description": _as_text(fix.get("issue", "")),
+            "anchor": anchor,
+            "fix": f"Rewrite as: \"{improved}\"" if improved else "",
+            "replacement": improved
+        }
+    
+    if review_type == "pacing":
+        # Pacing locations are "start ... end" excerpts; the start anchors the issue
+        anchor = _as_text(fix.get("location", "")).split("...")[0].strip()
+        if anchor.lower() in ("unknown location", "unspecified"):
+            anchor = ""
+    else:
+        anchor = _as_text(fix.get("text", ""))
+    return {
+        "type": review_type,
+        "description": _as_text(fix.get("description", "")),
+        "anchor": anchor,
+        "fix": _as_text(fix.get("fix", "")),
+        "replacement": ""
+    }
+
+def plan_chapter_fixes(chapter: str, fixes_by_type: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Merge the issues that several reviews reported for one chapter into a single edit plan
+    
+    Issues that target the same passage are merged, keeping the fix of the
+    highest-priority review and the other descriptions as notes. Repeated
+    issues without a passage are dropped. The plan is ordered by where each
+    passage appears in the chapter, with chapter-wide issues last.
+    
+    Args:
+        chapter: The chapter content
+        fixes_by_type: Issues for this chapter keyed by review type
+    
+    Returns:
+        List of planned fixes; each has type, description, anchor, fix,
+        replacement, position (-1 when the anchor is not in the chapter) and notes
+    """
+    rank = {review_type: i for i, review_type in enumerate(REVIEW_PRIORITY)}
+    normalized_chapter = chapter.lower()
+    
+    issues = []
+    for review_type, fixes in fixes_by_type.items():
+        for fix in fixes or []:
+            if not isinstance(fix, dict):
+                continue
+            issue = normalize_fix(review_type, fix)
+            if issue["description"] or issue["fix"]:
+                issues.append(issue)
+    issues.sort(key=lambda issue: rank.get(issue["type"], len(rank)))
+    
+    merged: Dict[str, Dict[str, Any]] = {}
+    for issue in issues:
+        if issue["anchor"]:
+            key = "anchor:" + _normalize(issue["anchor"])
+        else:
+            key = "issue:" + _normalize(issue["description"] + " " + issue["fix"])
+        
+        if key in merged:
+            planned = merged[key]
+            note = f"{issue['type']}: {issue['description'] or issue['fix']}"
+            if issue["description"] != planned["description"] and note not in planned["notes"]:
+                planned["notes"].append(note)
+            continue
+        
+        position = chapter.find(issue["anchor"]) if issue["anchor"] else -1
+        if position < 0 and issue["anchor"]:
+            position = normalized_chapter.find(issue["anchor"].lower())
+        merged[key] = {**issue, "position": position, "notes": []}
+    
+    # Stable sort, so chapter-wide issues stay in priority order
+    plan = sorted(merged.values(), key=lambda planned: (planned["position"] < 0, max(planned["position"], 0)))
+    if len(plan) < len(issues):
+        logger.debug(f"Merged {len(issues)} review issues into {len(plan)} planned fixes")
+    return plan
+
+def format_fix_plan(plan: List[Dict[str, Any]]) -> str:
+    """
+    Format an edit plan as a numbered list for a revision prompt
+    
+    Args:
+        plan: Planned fixes from plan_chapter_fixes
+    
+    Returns:
+        The formatted list
+    """
+    lines = []
+    for i, planned in enumerate(plan):
+        lines.append(f"{i+1}. [{planned['type']}] {planned['description']}")
+        if planned["anchor"]:
+            lines.append(f"   Text: \"{planned['anchor']}\"")
+        else:
+            lines.append("   Text: (applies to the whole chapter)")
+        if planned["fix"]:
+            lines.append(f"   Fix: {planned['fix']}")
+        for note in planned["notes"]:
+            lines.append(f"   Also: {note}")
+    return "\n".join(lines)
+
+def apply_exact_replacements(chapter: str, plan: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Apply planned fixes that come with an exact replacement for text found in the chapter
+    
+    The text must occur exactly once; a fix whose text is repeated is left
+    for the revision, which can tell the occurrences apart.
+    
+    Args:
+        chapter: The chapter content
+        plan: Planned fixes from plan_chapter_fixes
+    
+    Returns:
+        Tuple of the updated chapter and the planned fixes that still need a revision
+    """
+    remaining = []
+    for planned in plan:
+        anchor = planned["anchor"]
+        if planned["replacement"] and anchor and not planned["notes"] and chapter.count(anchor) == 1:
+            chapter = chapter.replace(anchor, planned["replacement"], 1)
+        else:
+            remaining.append(planned)
+    return chapter, remaining
@@ -0,0 +1,132 @@
+"""
+Edit operations for revising chapters without regenerating their full text.
+
+The model returns a list of anchored search/replace operations; the applier
+checks that every anchor matches exactly one place in the text and that no
+two operations overlap before changing anything.
+"""
+import re
+import json
+import logging
+from typing import List, Dict, Tuple, Optional
+
+logger = logging.getLogger(__name__)
+
+EDIT_INSTRUCTIONS = """Do not return the whole text. Return only the changes, as JSON in this format:
+        {"edits": [{"find": "exact passage from the text", "replace": "revised passage"}]}
+        Each "find" must be copied exactly from the text and long enough to occur only once
+        (a full sentence or more). Edits must not overlap. To insert text, include the
+        neighbouring sentence in "find" and in "replace". Return {"edits": []} if nothing needs to change."""
+
+def parse_edit_operations(response: str) -> Optional[List[Dict[str, str]]]:
+    """
+    Parse the edit operations in a model response
+    
+    Args:
+        response: Response containing {"edits": [...]} or a bare list, optionally in a ```json block
+    
+    Returns:
+        List of operations with "find" and "replace" keys, or None if the
+        response does not contain valid edit operations
+    """
+    if not response:
+        return None
+    
+    candidates = re.findall(r'```(?:json)?\s*\n(.*?)\n\s*```', response, re.DOTALL)
+    candidates.append(response)
+    # Models sometimes wrap the JSON in prose
+    start = min([i for i in (response.find("{"), response.find("[")) if i >= 0], default=-1)
+    if start >= 0:
+        candidates.append(response[start:response.rfind("]" if response[start] == "[" else "}") + 1])
+    
+    for candidate in candidates:
+        try:
+            data = json.loads(candidate.strip())
+        except (json.JSONDecodeError, ValueError):
+            continue
+        
+        if isinstance(data, dict):
+            data = data.get("edits")
+        if not isinstance(data, list):
+            continue
+        
+        operations = []
+        for op in data:
+            if (isinstance(op, dict) and isinstance(op.get("find"), str) and
+                    isinstance(op.get("replace"), str)):
+                operations.append({"find": op["find"], "replace": op["replace"]})
+        if len(operations) == len(data):
+            return operations
+    
+    return None
+
+def _locate(text: str, anchor: str) -> List[Tuple[int, int]]:
+    """Return the spans where an anchor matches, exactly or else ignoring whitespace differences"""
+    # Overlapping occurrences count too, or a self-overlapping anchor would look unique
+    spans = []
+    start = text.find(anchor)
+    while start >= 0:
+        spans.append((start, start + len(anchor)))
+        start = text.find(anchor, start + 1)
+    if spans:
+        return spans
+    
+    # Models often reflow whitespace when quoting
+    words = anchor.split()
+    if not words:
+        return []
+    pattern = r'\s+'.join(re.escape(word) for word in words)
+    # A zero-width lookahead finds overlapping matches; the group gives each span's end
+    return [(m.start(), m.end(1)) for m in re.finditer(f"(?=({pattern}))", text)]
+
+def apply_edit_operations(text: str, operations: List[Dict[str, str]]
+                          ) -> Tuple[str, List[Dict[str, str]], List[Tuple[Dict[str, str], str]]]:
+    """
+    Validate edit operations and apply the valid ones
+    
+    An operation is rejected if its anchor is empty, does not occur in the
+    text, occurs more than once, or overlaps an earlier accepted operation.
+    All anchors are located in the original text, so the result does not
+    depend on the order in which the operations are applied.
+    
+    Args:
+        text: The text to edit
+        operations: Operations with "find" and "replace" keys
+    
+    Returns:
+        Tuple of the edited text, the applied operations and the rejected
+        operations with the reason for each
+    """
+    accepted: List[Tuple[int, int, Dict[str, str]]] = []
+    rejected: List[Tuple[Dict[str, str], str]] = []
+    
+    for op in operations:
+        anchor = op.get("find", "")
+        if not anchor.strip():
+            rejected.append((op, "empty anchor"))
+            continue
+        
+        spans = _locate(text, anchor)
+        if not spans:
+            rejected.append((op, "anchor not found"))
+            continue
+        if len(spans) > 1:
+            rejected.append((op, f"anchor occurs {len(spans)} times"))
+            continue
+        
+        start, end = spans[0]
+        if any(start < other_end and other_start < end for other_start, other_end, _ in accepted):
+            rejected.append((op, "overlaps another edit"))
+            continue
+        accepted.append((start, end, op))
+    
+    # Apply from the end so earlier offsets stay valid
+    edited = text
+    for start, end, op in sorted(accepted, key=lambda item: item[0], reverse=True):
+        edited = edited[:start] + op["replace"] + edited[end:]
+    
+    for op, reason in rejected:
+        logger.debug(f"Rejected edit ({reason}): {op.get('find', '')[:60]!r}")
+    
+    applied = [op for _, _, op in sorted(accepted, key=lambda item: item[0])]
+    return edited, applied, rejected
@@ -0,0 +1,224 @@
+"""
+Story bible utilities: a structured record of the story so far (characters,
+plot threads, places, timeline and summaries) that is updated after each
+chapter and rendered as compact context for the agents.
+"""
+import re
+import logging
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+BIBLE_DELTA_FORMAT = """Format your response as JSON with these keys:
+        - "characters": object mapping the name of each character who appears or changes in this chapter
+          to their state at the end of it (where they are, what they know and want, injuries, possessions), one sentence
+        - "threads_opened": array of plot threads, questions or promises the chapter opens, one sentence each
+        - "threads_resolved": array of threads from the open list above that the chapter resolves, copied exactly
+        - "locations": object mapping each new place to a one-sentence description
+        - "events": array of the chapter's key events, one short sentence each
+        - "chapter_summary": summary of the chapter in at most 60 words
+        - "story_so_far": summary of the whole story up to the end of this chapter in at most 150 words"""
+
+def new_story_bible(character_sketches: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Create an empty story bible
+    
+    Args:
+        character_sketches: Short descriptions of the main characters keyed by name
+    
+    Returns:
+        The story bible
+    """
+    characters = {}
+    for name, sketch in (character_sketches or {}).items():
+        if isinstance(name, str) and name.strip():
+            characters[name.strip()] = {"sketch": _text(sketch), "state": "", "last_chapter": 0}
+    return {
+        "characters": characters,
+        "threads": [],
+        "locations": {},
+        "timeline": [],
+        "chapter_summaries": [],
+        "story_so_far": "",
+        "chapters": 0
+    }
+
+def _text(value: Any) -> str:
+    """Return a delta field as a single line of text"""
+    if isinstance(value, dict):
+        value = "; ".join(f"{k}: {v}" for k, v in value.items())
+    elif isinstance(value, list):
+        value = "; ".join(str(item) for item in value)
+    return re.sub(r'\s+', ' ', str(value)).strip() if value is not None else ""
+
+def _normalize(text: str) -> str:
+    """Normalize text for comparisons (case, punctuation and whitespace)"""
+    return re.sub(r'[^a-z0-9]+', ' ', text.lower()).strip()
+
+def _same_thread(open_thread: str, resolved: str) -> bool:
+    """Check whether a resolved thread names an open one, allowing light rewording"""
+    if open_thread == resolved:
+        return True
+    # A fragment must cover most of the thread, or a short phrase like
+    # "the key" would close any thread that mentions it
+    shorter, longer = sorted((open_thread, resolved), key=len)
+    return f" {shorter} " in f" {longer} " and len(shorter.split()) >= len(longer.split()) / 2
+
+def apply_bible_delta(bible: Dict[str, Any], delta: Dict[str, Any], chapter_num: int) -> Dict[str, Any]:
+    """
+    Fold the changes reported for one chapter into the story bible
+    
+    Fields with an unexpected shape are ignored, so a partly malformed delta
+    still updates what it can.
+    
+    Args:
+        bible: The story bible up to the previous chapter
+        delta: Changes in the format of BIBLE_DELTA_FORMAT
+        chapter_num: The chapter the changes come from
+    
+    Returns:
+        A new story bible that includes the chapter
+    """
+    characters = {name: dict(entry) for name, entry in bible.get("characters", {}).items()}
+    locations = dict(bible.get("locations", {}))
+    
+    # A chapter folded again (e.g. on resume) replaces what it added before
+    threads = [dict(thread) for thread in bible.get("threads", []) if thread.get("opened") != chapter_num]
+    for thread in threads:
+        if thread["resolved"] == chapter_num:
+            thread["resolved"] = None
+    timeline = [entry for entry in bible.get("timeline", []) if entry.get("chapter") != chapter_num]
+    summaries = list(bible.get("chapter_summaries", []))
+    
+    if isinstance(delta.get("characters"), dict):
+        known = {_normalize(name): name for name in characters}
+        for name, state in delta["characters"].items():
+            name = _text(name)
+            if not name:
+                continue
+            # Reuse the existing entry when the name differs only in case or punctuation
+            name = known.get(_normalize(name), name)
+            entry = characters.setdefault(name, {"sketch": "", "state": "", "last_chapter": 0})
+            entry["state"] = _text(state)
+            entry["last_chapter"] = chapter_num
+    
+    if isinstance(delta.get("threads_resolved"), list):
+        for resolved in delta["threads_resolved"]:
+            resolved = _normalize(_text(resolved))
+            if not resolved:
+                continue
+            for thread in threads:
+                if thread["resolved"] is None and _same_thread(_normalize(thread["thread"]), resolved):
+                    thread["resolved"] = chapter_num
+                    break
+    
+    if isinstance(delta.get("threads_opened"), list):
+        existing = {_normalize(thread["thread"]) for thread in threads}
+        for opened in delta["threads_opened"]:
+            opened = _text(opened)
+            if opened and _normalize(opened) not in existing:
+                threads.append({"thread": opened, "opened": chapter_num, "resolved": None})
+                existing.add(_normalize(opened))
+    
+    if isinstance(delta.get("locations"), dict):
+        for name, description in delta["locations"].items():
+            if _text(name):
+                locations[_text(name)] = _text(description)
+    
+    if isinstance(delta.get("events"), list):
+        timeline.extend({"chapter": chapter_num, "event": _text(event)} for event in delta["events"] if _text(event))
+    
+    # Summaries are indexed by chapter, so later ones are dropped as well
+    summaries = summaries[:chapter_num - 1]
+    summaries.extend([""] * (chapter_num - 1 - len(summaries)))
+    summaries.append(_text(delta.get("chapter_summary", "")))
+    
+    return {
+        "characters": characters,
+        "threads": threads,
+        "locations": locations,
+        "timeline": timeline,
+        "chapter_summaries": summaries,
+        "story_so_far": _text(delta.get("story_so_far", "")) or bible.get("story_so_far", ""),
+        "chapters": max(bible.get("chapters", 0), chapter_num)
+    }
+
+def _mentioned(name: str, focus: str) -> bool:
+    """Check whether a name, or any part of it, occurs in the focus text"""
+    if not focus:
+        return False
+    parts = [name] + [part for part in re.split(r'[\s,]+', name) if len(part) > 2]
+    return any(re.search(r'\b' + re.escape(part) + r'\b', focus, re.IGNORECASE) for part in parts)
+
+def render_story_bible(bible: Dict[str, Any], focus: str = "", max_characters: int = 6,
+                       max_threads: int = 8, max_locations: int = 4, max_events: int = 6,
+                       recent_chapters: int = 2) -> str:
+    """
+    Render a compact view of the story bible for a prompt
+    
+    Characters and places mentioned in the focus text (typically the summary
+    of the chapter about to be written) come first; the rest of the view is
+    limited to the most recent entries, so its size stays bounded however
+    long the book grows.
+    
+    Args:
+        bible: The story bible
+        focus: Text that decides which entries are relevant
+        max_characters: Characters described in full; others are only named
+        max_threads: Open plot threads shown, most recent first
+        max_locations: Places shown
+        max_events: Most recent timeline events shown
+        recent_chapters: Summaries of the most recent chapters shown
+    
+    Returns:
+        The rendered view
+    """
+    sections = []
+    
+    if bible.get("story_so_far"):
+        sections.append(f"Story so far: {bible['story_so_far']}")
+    
+    summaries = bible.get("chapter_summaries", [])
+    first = max(0, len(summaries) - recent_chapters)
+    recent = [f"- Chapter {first + i + 1}: {summary}" for i, summary in enumerate(summaries[first:]) if summary]
+    if recent:
+        sections.append("Recent chapters:\n" + "\n".join(recent))
+    
+    characters = bible.get("characters", {})
+    if characters:
+        ranked = sorted(characters.items(),
+                        key=lambda item: (not _mentioned(item[0], focus), -item[1].get("last_chapter", 0)))
+        lines = []
+        for name, entry in ranked[:max_characters]:
+            details = [entry.get("sketch", "")]
+            if entry.get("state"):
+                details.append(f"As of chapter {entry['last_chapter']}: {entry['state']}")
+            lines.append(f"- {name}: " + " ".join(detail for detail in details if detail))
+        others = [name for name, _ in ranked[max_characters:]]
+        if others:
+            lines.append(f"- Also in the story: {', '.join(others)}")
+        sections.append("Characters:\n" + "\n".join(lines))
+    
+    open_threads = [thread for thread in bible.get("threads", []) if thread.get("resolved") is None]
+    if open_threads and max_threads > 0:
+        shown = open_threads[-max_threads:]
+        lines = [f"- {thread['thread']} (since chapter {thread['opened']})" for thread in shown]
+        sections.append("Open plot threads:\n" + "\n".join(lines))
+    
+    locations = list(bible.get("locations", {}).items())
+    if locations:
+        relevant = [item for item in locations if _mentioned(item[0], focus)]
+        shown = relevant + [item for item in reversed(locations) if item not in relevant]
+        lines = [f"- {name}: {description}" for name, description in shown[:max_locations]]
+        sections.append("Places:\n" + "\n".join(lines))
+    
+    events = bible.get("timeline", [])[-max_events:]
+    if events:
+        lines = [f"- Chapter {event['chapter']}: {event['event']}" for event in events]
+        sections.append("Recent events:\n" + "\n".join(lines))
+    
+    return "\n\n".join(sections)
+
+def format_open_threads(bible: Dict[str, Any]) -> List[str]:
+    """Return the text of the open plot threads, for a delta prompt to resolve against"""
+    return [thread["thread"] for thread in bible.get("threads", []) if thread.get("resolved") is None]
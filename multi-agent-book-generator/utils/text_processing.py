@@ -2,55 +2,238 @@
 Text processing utilities for manipulating and analyzing text content.
 """
 import re
+import math
 import logging
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional, Callable, Iterator, NamedTuple
 
 logger = logging.getLogger(__name__)
 
-def chunk_text(text: str, max_chunk_size: int = 2000, overlap: int = 200) -> List[str]:
+class TextChunk(NamedTuple):
+    """A chunk of text with its position in the source text"""
+    text: str
+    start: int
+    end: int
+    tokens: int
+
+class TokenEstimator:
+    """
+    Estimates token counts without a tokenizer
+    
+    The estimate is the larger of a character-based and a word-based count,
+    which stays close to BPE tokenizers on prose and does not undercount text
+    made of many short words. The ratios can be calibrated against counts
+    from a real tokenizer or the prompt tokens a provider reports.
+    """
+    
+    def __init__(self, chars_per_token: float = 4.0, tokens_per_word: float = 1.3):
+        """
+        Initialize the estimator
+        
+        Args:
+            chars_per_token: Average characters per token
+            tokens_per_word: Average tokens per word
+        """
+        self.chars_per_token = chars_per_token
+        self.tokens_per_word = tokens_per_word
+    
+    def __call__(self, text: str) -> int:
+        """Estimate the number of tokens in a text"""
+        if not text:
+            return 0
+        words = len(text.split())
+        return max(1, math.ceil(max(len(text) / self.chars_per_token, words * self.tokens_per_word)))
+    
+    def calibrate(self, samples: List[Tuple[str, int]]) -> "TokenEstimator":
+        """
+        Fit the ratios to texts with known token counts
+        
+        Args:
+            samples: (text, token count) pairs
+        
+        Returns:
+            The estimator
+        """
+        characters = sum(len(text) for text, _ in samples)
+        words = sum(len(text.split()) for text, _ in samples)
+        tokens = sum(count for _, count in samples)
+        if tokens > 0 and characters > 0 and words > 0:
+            self.chars_per_token = characters / tokens
+            self.tokens_per_word = tokens / words
+        return self
+
+def get_token_counter(tokenizer: Optional[str] = None) -> Callable[[str], int]:
+    """
+    Return a function that counts the tokens in a text
+    
+    Args:
+        tokenizer: "tiktoken:<encoding>" (e.g. "tiktoken:cl100k_base") to count
+            with a local tiktoken encoding; anything else uses a TokenEstimator
+    
+    Returns:
+        The token counter
+    """
+    if tokenizer and tokenizer.startswith("tiktoken:"):
+        try:
+            import tiktoken
+        except ImportError:
+            raise ImportError("tiktoken not installed. Install with 'pip install tiktoken'")
+        encoding = tiktoken.get_encoding(tokenizer.split(":", 1)[1])
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    return TokenEstimator()
+
+# End of a sentence (terminal punctuation, closing quotes and the whitespace
+# after them) or of a paragraph (a line break)
+_UNIT_BOUNDARY = re.compile(r'[.!?]+["\'\u201d\u2019)\]]*\s+|\s*\n\s*')
+
+def _text_units(text: str) -> Iterator[Tuple[int, int, bool]]:
+    """Yield (start, end, ends_paragraph) of each sentence, including its trailing whitespace"""
+    start = 0
+    for match in _UNIT_BOUNDARY.finditer(text):
+        yield start, match.end(), "\n" in match.group()
+        start = match.end()
+    if start < len(text):
+        yield start, len(text), True
+
+def _split_unit(text: str, start: int, end: int, max_tokens: int,
+                count_tokens: Callable[[str], int]) -> Iterator[Tuple[int, int, int]]:
+    """Split a sentence longer than the budget into (start, end, tokens) pieces, at word boundaries where possible"""
+    pieces = []
+    for word in re.finditer(r'\S+\s*|\s+', text[start:end]):
+        word_start, word_end = start + word.start(), start + word.end()
+        word_tokens = count_tokens(word.group())
+        while word_tokens > max_tokens:
+            cut = word_start + max(1, (word_end - word_start) * max_tokens // word_tokens)
+            while cut > word_start + 1 and count_tokens(text[word_start:cut]) > max_tokens:
+                cut -= max(1, (cut - word_start) // 10)
+            pieces.append((word_start, cut, count_tokens(text[word_start:cut])))
+            word_start = cut
+            word_tokens = count_tokens(text[word_start:word_end])
+        pieces.append((word_start, word_end, word_tokens))
+    
+    piece_start, piece_tokens = start, 0
+    for word_start, word_end, word_tokens in pieces:
+        if piece_tokens and piece_tokens + word_tokens > max_tokens:
+            yield piece_start, word_start, piece_tokens
+            piece_start, piece_tokens = word_start, 0
+        piece_tokens += word_tokens
+    yield piece_start, end, piece_tokens
+
+def chunk_text(text: str, max_tokens: int = 500, overlap_tokens: int = 50,
+               count_tokens: Optional[Callable[[str], int]] = None) -> List[TextChunk]:
     """
-    Split text into overlapping chunks for processing
+    Split text into chunks of at most max_tokens tokens
+    
+    Sentences are packed into each chunk in one pass over the text. A chunk
+    that fills up ends at its last paragraph break if that keeps it at least
+    half full, and otherwise at its last whole sentence; only sentences
+    longer than the budget are split, at word boundaries. Each chunk after
+    the first repeats whole sentences from the end of the previous one, up
+    to overlap_tokens. Each sentence is counted once and chunk sizes are
+    the sums of their sentences' counts.
     
     Args:
         text: The text to split
-        max_chunk_size: Maximum size of each chunk
-        overlap: Number of characters to overlap between chunks
-        
+        max_tokens: Maximum tokens per chunk
+        overlap_tokens: Tokens repeated from the end of the previous chunk
+        count_tokens: Token counter (see get_token_counter; estimated by default)
+    
     Returns:
-        List of text chunks
+        The chunks with their character offsets in the text and token counts
     """
-    if len(text) <= max_chunk_size:
-        return [text]
+    count_tokens = count_tokens or TokenEstimator()
+    max_tokens = max(1, max_tokens)
+    overlap_tokens = min(max(0, overlap_tokens), max_tokens // 2)
     
     chunks = []
-    start = 0
-    
-    while start < len(text):
-        # Find the end of the chunk (try to end at sentence boundary)
-        end = min(start + max_chunk_size, len(text))
-        
-        # If we're not at the end, find the last sentence boundary
-        if end < len(text):
-            # Find the last sentence ending within the chunk
-            last_period = text.rfind('.', start, end)
-            last_question = text.rfind('?', start, end)
-            last_exclamation = text.rfind('!', start, end)
-            
-            # Find the latest sentence boundary
-            sentence_end = max(last_period, last_question, last_exclamation)
-            
-            if sentence_end > start + max_chunk_size // 2:
-                # Use the sentence boundary if it's not too close to the start
-                end = sentence_end + 1
-        
-        # Add the chunk
-        chunks.append(text[start:end])
+    # Sentences of the chunk being filled: (start, end, tokens, ends_paragraph)
+    current = []
+    current_tokens = 0
+    # Sentences of the chunk being filled that repeat the previous chunk
+    repeated = 0
+    
+    def emit(count: int) -> None:
+        """Close the chunk after its first count sentences and start the next one with the overlap"""
+        nonlocal current, current_tokens, repeated
+        emitted, rest = current[:count], current[count:]
+        chunks.append(TextChunk(text[emitted[0][0]:emitted[-1][1]], emitted[0][0], emitted[-1][1],
+                                sum(unit[2] for unit in emitted)))
+        overlap = []
+        overlap_size = 0
+        for unit in reversed(emitted[repeated:]):
+            # Leave out at least the first sentence, so the next chunk starts later
+            if overlap_size + unit[2] > overlap_tokens or len(overlap) == len(emitted) - 1:
+                break
+            overlap.insert(0, unit)
+            overlap_size += unit[2]
+        current = overlap + rest
+        current_tokens = sum(unit[2] for unit in current)
+        repeated = len(overlap)
+    
+    for start, end, ends_paragraph in _text_units(text):
+        tokens = count_tokens(text[start:end])
+        units = [(start, end, tokens, ends_paragraph)]
+        if tokens > max_tokens:
+            units = [(piece_start, piece_end, piece_tokens, ends_paragraph and piece_end == end)
+                     for piece_start, piece_end, piece_tokens in _split_unit(text, start, end, max_tokens, count_tokens)]
         
-        # Move to the next chunk with overlap
-        start = end - overlap if end - overlap > start else end
-    
+        for unit in units:
+            while current_tokens + unit[2] > max_tokens and len(current) > repeated:
+                # Prefer the last paragraph break, if it keeps the chunk at least half full
+                count = len(current)
+                size = current_tokens
+                while count > repeated + 1 and not current[count - 1][3]:
+                    size -= current[count - 1][2]
+                    count -= 1
+                if not current[count - 1][3] or size < max_tokens // 2:
+                    count = len(current)
+                emit(count)
+            if current_tokens + unit[2] > max_tokens:
+                # Only repeated sentences are left; drop them to make room
+                current, current_tokens, repeated = [], 0, 0
+            current.append(unit)
+            current_tokens += unit[2]
+    
+    if len(current) > repeated or not chunks:
+        if current:
+            emit(len(current))
+        else:
+            chunks.append(TextChunk(text, 0, len(text), count_tokens(text)))
     return chunks
 
+def excerpt_text(text: str, max_tokens: int, count_tokens: Optional[Callable[[str], int]] = None,
+                 separator: str = "...") -> str:
+    """
+    Shorten text to its opening and closing sentences within a token budget
+    
+    Half of the budget goes to whole sentences from the start of the text
+    and the rest to whole sentences from its end.
+    
+    Args:
+        text: The text to shorten
+        max_tokens: Maximum tokens of the excerpt
+        count_tokens: Token counter (see get_token_counter; estimated by default)
+        separator: Placed between the opening and the closing
+    
+    Returns:
+        The text itself if it fits, otherwise the excerpt
+    """
+    count_tokens = count_tokens or TokenEstimator()
+    units = [(start, end, count_tokens(text[start:end])) for start, end, _ in _text_units(text)]
+    if sum(tokens for _, _, tokens in units) <= max_tokens:
+        return text
+    
+    head_end, used = 0, 0
+    for _, end, tokens in units:
+        if used + tokens > max_tokens // 2:
+            break
+        head_end, used = end, used + tokens
+    tail_start = len(text)
+    for start, _, tokens in reversed(units):
+        if start < head_end or used + tokens > max_tokens:
+            break
+        tail_start, used = start, used + tokens
+    return text[:head_end].rstrip() + separator + text[tail_start:].lstrip()
+
 def extract_dialogue(text: str) -> List[Dict[str, str]]:
     """
     Extract dialogue from text with speaker attribution
@@ -210,7 +393,7 @@ def analyze_pacing(text: str) -> Dict[str, Any]:
         Dictionary with pacing analysis
     """
     # Split text into chunks of roughly equal size
-    chunks = chunk_text(text, max_chunk_size=1000, overlap=0)
+    chunks = [chunk.text for chunk in chunk_text(text, max_tokens=250, overlap_tokens=0)]
     
     # Analyze each chunk
     chunk_stats = []